@@ -0,0 +1,315 @@
+"""
+Microbenchmarks das funções quentes da pipeline, com os fixtures de src/data/ ampliados
+para 1x, 10x e 100x, comparados com as baselines gravadas em local/bench_baseline.json.
+
+Uso:
+    python local/bench.py                      # roda tudo e falha (exit 1) se algo regredir
+    python local/bench.py --escalas 1,10 --casos clean_csv
+    python local/bench.py --gravar             # grava/atualiza as baselines dos casos rodados (3 rodadas)
+
+Casos (tamanho de 1x entre parênteses):
+    clean_csv_stream / clean_csv_pandas   CSV do export com 500 proposições da data buscada
+    link_teor / dados_pagina              proposicao_individual.html (~50 KB), em bytes como vem da rede
+    pdf_texto                             PDF gerado do inteiro teor de exemplo (~2 páginas)
+    format_posts / reply_payload          200 posts
+    nome_agendamento                      1000 keys de post_data.json (cache do slug zerado)
+
+Os tempos são normalizados por uma carga de calibração (objetos Python, f-strings e
+hashlib, como nos casos), para que a baseline gravada em uma máquina sirva em outra.
+As repetições são intercaladas: cada rodada mede uma vez cada caso, e a calibração, em
+sequência, e o tempo de um caso é o menor entre as rodadas. Assim um período lento da
+máquina (vizinho barulhento, clock) pesa igual para todos e não decide nenhum caso
+sozinho. O coletor de lixo fica desligado durante as medições (gc.collect() antes de
+cada uma), para que uma coleta disparada pelo heap de um caso não caia no tempo de outro.
+
+Com --gravar, a suíte roda --rodadas vezes (3 por padrão) e cada caso grava o maior
+tempo normalizado observado e uma tolerância própria, que cobre a dispersão medida
+entre as rodadas (nunca menor que --tolerancia). Um caso regride quando o tempo
+normalizado passa de baseline * (1 + tolerância do caso).
+"""
+import io
+import gc
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+sys.path.insert(0, os.path.join(RAIZ, "local"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+PASTA_DADOS = os.path.join(RAIZ, "src", "data")
+BASELINE_PADRAO = os.path.join(RAIZ, "local", "bench_baseline.json")
+ESCALAS_PADRAO = (1, 10, 100)
+DATA_BUSCA = date(2025, 10, 13)
+
+
+def ler_dado(nome: str, modo: str = "r"):
+    with open(os.path.join(PASTA_DADOS, nome), modo, **({} if "b" in modo else {"encoding": "utf-8"})) as f:
+        return f.read()
+
+
+def carga_calibracao():
+    """Carga fixa para normalizar os tempos entre máquinas: dicts, f-strings, ordenação e sha256."""
+    dados = b"x" * 4096
+    saida = []
+    for i in range(10000):
+        registro = {"numero": f"PL {i}/2025", "autor": "Deputada Exemplo", "partido": "PX", "indice": i}
+        saida.append(f"{registro['numero']}\n{registro['autor']} ({registro['partido']})".split("\n"))
+        saida[-1].append(hashlib.sha256(dados + i.to_bytes(4, "little")).hexdigest())
+    return sorted(saida)
+
+
+def chamadas_por_medicao(funcao, minimo_seconds: float = 0.2) -> int:
+    """
+    Aquece a função e calcula quantas chamadas somam 'minimo_seconds' (funções muito
+    rápidas são chamadas várias vezes por medição).
+    """
+    gc.collect()
+    inicio = time.perf_counter()
+    funcao()
+    return max(1, int(minimo_seconds / max(time.perf_counter() - inicio, 1e-6)))
+
+
+def medir(funcao, chamadas: int) -> float:
+    """Tempo por chamada de uma medição de 'chamadas' chamadas seguidas."""
+    # Lixo da medição anterior recolhido fora do tempo medido
+    gc.collect()
+    inicio = time.perf_counter()
+    for _ in range(chamadas):
+        funcao()
+    return (time.perf_counter() - inicio) / chamadas
+
+
+# ---------------------------------------------------------------- fixtures sintéticos
+
+def csv_sintetico(pasta: str, escala: int) -> str:
+    """
+    Export no layout original (metadados, cabeçalho, ';'), com 500 * escala linhas na
+    DATA_BUSCA (recicladas do export real) seguidas de linhas antigas para o corte.
+    """
+    caminho = os.path.join(pasta, f"proposicoes_{escala}x.csv")
+    if os.path.exists(caminho):
+        return caminho
+    with open(os.path.join(PASTA_DADOS, "proposicoes.csv"), encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        metadados = [next(reader) for _ in range(3)]
+        cabecalho = next(reader)
+        linhas = [l for l in reader if len(l) == len(cabecalho)]
+    idx = cabecalho.index("Apresentação")
+
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";", quoting=csv.QUOTE_ALL)
+        writer.writerows(metadados)
+        writer.writerow(cabecalho)
+        for i in range(500 * escala):
+            linha = list(linhas[i % len(linhas)])
+            linha[idx] = DATA_BUSCA.strftime("%d/%m/%Y")
+            writer.writerow(linha)
+        for linha in linhas[-100:]:
+            writer.writerow(linha[:idx] + ["01/01/2020"] + linha[idx + 1:])
+    return caminho
+
+
+def html_sintetico(escala: int) -> str:
+    """Página real com o conteúdo antes do link do inteiro teor repetido 'escala' vezes."""
+    html = ler_dado("proposicao_individual.html")
+    inicio_corpo = html.find("<body")
+    inicio_link = html.rfind("<a", 0, html.find("linkDownloadTeor"))
+    trecho = html[html.find(">", inicio_corpo) + 1:inicio_link]
+    return html[:inicio_link] + trecho * (escala - 1) + html[inicio_link:]
+
+
+def pdf_sintetico(pasta: str, escala: int) -> str:
+    from stand_ins import pdf_de_texto
+
+    caminho = os.path.join(pasta, f"teor_{escala}x.pdf")
+    if not os.path.exists(caminho):
+        texto = ler_dado("proposicao_20251014_112450.txt")
+        with open(caminho, "wb") as f:
+            f.write(pdf_de_texto("\n".join([texto] * escala)))
+    return caminho
+
+
+def post_sintetico(i: int) -> dict:
+    return {
+        "numero": f"PL {5000 + i}/2025",
+        "autor": "Deputada Exemplo da Silva",
+        "partido": "PX",
+        "uf": "SP",
+        "link": f"http://www.camara.leg.br/proposicoesWeb/fichadetramitacao?idProposicao={2570000 + i}",
+        "ementa_post": "Altera a lei para prever agravante penal em crimes dolosos que resultem em lesões graves. " * 2,
+        "pontos_post": "- Cria agravante para lesões dolosas\n- Aumenta a pena em um terço\n- Vale para crimes contra menores",
+        "justificativa_post": "A proposta busca proteger vítimas vulneráveis e desestimular a violência.",
+    }
+
+
+# ---------------------------------------------------------------- casos
+
+def casos(pasta: str) -> dict:
+    """nome -> função(escala) que prepara os dados e devolve o callable a ser medido."""
+    from services.clean_csv_service import clean_csv, clean_csv_stream
+    from services.fetch_individual_project_service import encontrar_link_teor, extrair_dados_pagina, extrair_texto_pdf
+    from services.post_tweet_service import format_posts, reply_payload
+    from services.slug_service import nome_agendamento, slug
+
+    def caso_clean_stream(escala):
+        caminho = csv_sintetico(pasta, escala)
+        return lambda: clean_csv_stream(caminho, DATA_BUSCA)
+
+    def caso_clean_pandas(escala):
+        caminho = csv_sintetico(pasta, escala)
+        return lambda: clean_csv(caminho, DATA_BUSCA)
+
+    def caso_link_teor(escala):
+        html = html_sintetico(escala).encode("utf-8")
+        return lambda: encontrar_link_teor(html)
+
+    def caso_dados_pagina(escala):
+        html = html_sintetico(escala).encode("utf-8")
+        return lambda: extrair_dados_pagina(html)
+
+    def caso_pdf(escala):
+        caminho = pdf_sintetico(pasta, escala)
+        return lambda: extrair_texto_pdf(caminho, io.StringIO())
+
+    def caso_format(escala):
+        posts = [post_sintetico(i) for i in range(200 * escala)]
+        return lambda: [format_posts(p) for p in posts]
+
+    def caso_reply(escala):
+        textos = [f"Post {i}" for i in range(200 * escala)]
+        uri, cid = "at://did:plc:bench/app.bsky.feed.post/3kabc", "bafyreigbtj4x7ip5legnfznufuopl4sg4knzc2cof6duas4b3q2fy6swua"
+        return lambda: [reply_payload(t, uri, cid, uri, cid) for t in textos]
+
+    def caso_nome_agendamento(escala):
+        keys = [f"propositions/pl-{i}-2025/post_data.json" for i in range(1000 * escala)]
+
+        def executar():
+            # Cada dia tem keys novas: mede o custo sem acertos no cache do slug
+            slug.cache_clear()
+            return [nome_agendamento(k) for k in keys]
+        return executar
+
+    return {
+        "clean_csv_stream": caso_clean_stream,
+        "clean_csv_pandas": caso_clean_pandas,
+        "link_teor": caso_link_teor,
+        "dados_pagina": caso_dados_pagina,
+        "pdf_texto": caso_pdf,
+        "format_posts": caso_format,
+        "reply_payload": caso_reply,
+        "nome_agendamento": caso_nome_agendamento,
+    }
+
+
+def rodar(args, escalas: list[int], pasta: str) -> tuple[dict, float]:
+    """
+    Uma rodada da suíte: 'repeticoes' medições de cada caso, intercaladas entre os
+    casos e a calibração. Retorna ({caso@escala: (tempo em s, tempo normalizado)}, calibração em s).
+    """
+    funcoes = {"calibracao": carga_calibracao}
+    for nome, preparar in casos(pasta).items():
+        if args.casos and not any(filtro in nome for filtro in args.casos.split(",")):
+            continue
+        for escala in escalas:
+            funcoes[f"{nome}@{escala}x"] = preparar(escala)
+
+    # Os prints dos services (📊...) ficam fora da saída e do tempo de terminal
+    with redirect_stdout(io.StringIO()):
+        chamadas = {chave: chamadas_por_medicao(funcao) for chave, funcao in funcoes.items()}
+        tempos = {chave: [] for chave in funcoes}
+        for _ in range(args.repeticoes):
+            for chave, funcao in funcoes.items():
+                tempos[chave].append(medir(funcao, chamadas[chave]))
+
+    # Menor tempo de cada um: o ruído da máquina só soma tempo
+    calibracao = min(tempos.pop("calibracao"))
+    return {chave: (min(t), min(t) / calibracao) for chave, t in tempos.items()}, calibracao
+
+
+def executar(args) -> int:
+    escalas = [int(e) for e in args.escalas.split(",")]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    rodadas = args.rodadas or (3 if args.gravar else 1)
+    print(f"⏱️ {rodadas} rodada(s) de {args.repeticoes} repetições intercaladas (tolerância mínima {args.tolerancia:.0%})")
+    gc.disable()
+    try:
+        medicoes, calibracoes = {}, []
+        with tempfile.TemporaryDirectory(prefix="xbot-bench-") as pasta:
+            for _ in range(rodadas):
+                resultados, calibracao = rodar(args, escalas, pasta)
+                calibracoes.append(calibracao)
+                for chave, valores in resultados.items():
+                    medicoes.setdefault(chave, []).append(valores)
+    finally:
+        gc.enable()
+    calibracao = min(calibracoes)
+    print(f"⚖️ Calibração: {calibracao * 1000:.1f} ms\n")
+
+    print(f"{'Caso':<28}{'Tempo (ms)':>14}{'Normalizado':>13}{'Baseline':>11}{'Razão':>8}  Status")
+    resultados, regressoes = {}, []
+    for chave, valores in medicoes.items():
+        # Melhor rodada para comparar; pior rodada (e a dispersão) para gravar a baseline
+        tempo, normalizado = min(valores, key=lambda v: v[1])
+        pior = max(v[1] for v in valores)
+        dispersao = pior / normalizado - 1
+        resultados[chave] = {
+            "ms": round(tempo * 1000, 3),
+            "normalizado": float(f"{pior:.4g}"),
+            "tolerancia": round(max(args.tolerancia, 2 * dispersao), 2),
+        }
+
+        referencia = baseline.get("casos", {}).get(chave, {})
+        if "normalizado" not in referencia:
+            status, razao = "sem baseline", "-"
+        else:
+            tolerancia = referencia.get("tolerancia", args.tolerancia)
+            razao = f"{normalizado / referencia['normalizado']:.2f}"
+            if normalizado > referencia["normalizado"] * (1 + tolerancia):
+                status = f"❌ regressão (limite {1 + tolerancia:.2f})"
+                regressoes.append(chave)
+            elif normalizado < referencia["normalizado"] * (1 - tolerancia):
+                status = "🚀 melhorou"
+            else:
+                status = "✅"
+        print(f"{chave:<28}{tempo * 1000:>14.3f}{normalizado:>13.4g}"
+              f"{referencia.get('normalizado', '-'):>11}{razao:>8}  {status}")
+
+    if args.gravar:
+        baseline.setdefault("casos", {}).update(resultados)
+        baseline["calibracao_ms"] = round(calibracao * 1000, 3)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n📝 {len(resultados)} baseline(s) gravada(s) em {args.baseline}")
+        return 0
+
+    if regressoes:
+        print(f"\n❌ {len(regressoes)} caso(s) acima da baseline: {', '.join(regressoes)}")
+        return 1
+    print("\n✅ Nenhuma regressão.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks com baselines e limites de regressão.")
+    parser.add_argument("--escalas", default=",".join(map(str, ESCALAS_PADRAO)), help="Ex: 1,10,100")
+    parser.add_argument("--casos", default="", help="Filtra os casos por nome (lista separada por vírgula).")
+    parser.add_argument("--repeticoes", type=int, default=7, help="Medições intercaladas de cada caso por rodada.")
+    parser.add_argument("--tolerancia", type=float, default=0.30, help="Regressão mínima aceita sobre a baseline (0.30 = 30%%).")
+    parser.add_argument("--rodadas", type=int, default=0, help="Rodadas da suíte (padrão: 3 com --gravar, 1 sem).")
+    parser.add_argument("--baseline", default=BASELINE_PADRAO, help="Arquivo de baselines.")
+    parser.add_argument("--gravar", action="store_true", help="Grava os resultados como novas baselines.")
+    sys.exit(executar(parser.parse_args()))
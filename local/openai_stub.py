@@ -0,0 +1,299 @@
+"""
+Servidor local que imita a API da OpenAI (Files + Batches + Responses) para testes offline.
+
+Uso:
+    python local/openai_stub.py --port 8787
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 OPENAI_API_KEY=teste ...
+
+O SDK da OpenAI lê OPENAI_BASE_URL automaticamente, então as Lambdas e services
+falam com este servidor sem nenhuma mudança de código. Com --rate-limit N, as respostas
+acima de N simultâneas recebem 429 (para exercitar a concorrência adaptativa).
+"""
+import re
+import json
+import time
+import uuid
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as politica_email
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def resposta_simulada(body: dict) -> str:
+    """
+    Gera um JSON determinístico no formato de ThreadFormattedResponse a partir do prompt,
+    respeitando os limites mínimos e máximos de cada campo.
+    """
+    prompt = " ".join(m["content"] for m in body.get("input", []) if m.get("role") == "user")
+    texto = re.sub(r"\s+", " ", prompt).strip() or "Proposição sem texto"
+
+    def campo(prefixo, minimo, maximo):
+        valor = f"{prefixo} {texto}"
+        while len(valor) < minimo:
+            valor += " ."
+        return valor[:maximo]
+
+    return json.dumps({
+        "ementa_post": campo("Proposta:", 50, 200),
+        "pontos_post": campo("- Ponto principal:", 50, 240),
+        "justificativa_post": campo("Justificativa:", 30, 180),
+    }, ensure_ascii=False)
+
+
+def erro_formato(body: dict) -> str | None:
+    """
+    Confere o structured output pedido como a API faz em modo strict: json_schema com
+    nome e schema, e todo objeto com additionalProperties false e todas as propriedades
+    em required. Retorna a mensagem de erro, ou None se o formato é válido.
+    """
+    formato = (body.get("text") or {}).get("format")
+    if not formato:
+        return None
+    if formato.get("type") != "json_schema" or not formato.get("name") or not isinstance(formato.get("schema"), dict):
+        return "text.format deve ser json_schema com 'name' e 'schema'."
+    if not formato.get("strict"):
+        return None
+
+    pendentes = [formato["schema"]]
+    while pendentes:
+        schema = pendentes.pop()
+        if isinstance(schema, list):
+            pendentes.extend(schema)
+            continue
+        if not isinstance(schema, dict):
+            continue
+        if schema.get("type") == "object":
+            if schema.get("additionalProperties") is not False:
+                return "Schema inválido: 'additionalProperties' deve ser false em modo strict."
+            if sorted(schema.get("required", [])) != sorted(schema.get("properties", {})):
+                return "Schema inválido: todas as propriedades devem estar em 'required' em modo strict."
+        pendentes.extend(schema.values())
+    return None
+
+
+def corpo_response(body: dict) -> dict:
+    """Objeto 'response' da Responses API para uma requisição."""
+    texto = resposta_simulada(body)
+    tokens_entrada = sum(len(m.get("content", "")) for m in body.get("input", [])) // 4
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": body.get("model", "gpt-4o-mini"),
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": texto, "annotations": []}],
+        }],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": tokens_entrada,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": len(texto) // 4,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": tokens_entrada + len(texto) // 4,
+        },
+    }
+
+
+class EstadoStub:
+    """Arquivos e batches mantidos em memória."""
+
+    def __init__(self, consultas_ate_concluir: int = 1, limite_concorrencia: int = None, latencia: float = 0.0):
+        self.arquivos = {}
+        self.batches = {}
+        self.consultas = {}
+        self.consultas_ate_concluir = consultas_ate_concluir
+        # Simula o rate limit: acima de N respostas simultâneas, devolve 429
+        self.limite_concorrencia = limite_concorrencia
+        self.latencia = latencia
+        self.em_voo = 0
+        self.respostas = 0
+        self.recusadas = 0
+        self.lock = threading.RLock()
+
+    def criar_arquivo(self, conteudo: bytes, nome: str, proposito: str) -> dict:
+        arquivo = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(conteudo),
+            "created_at": int(time.time()),
+            "filename": nome,
+            "purpose": proposito,
+            "status": "processed",
+        }
+        with self.lock:
+            self.arquivos[arquivo["id"]] = (arquivo, conteudo)
+        return arquivo
+
+    def processar_batch(self, batch: dict):
+        """Executa todas as requisições do arquivo de entrada e gera o arquivo de saída."""
+        _, entrada = self.arquivos[batch["input_file_id"]]
+        linhas, falhas = [], 0
+        for linha in entrada.decode("utf-8").splitlines():
+            if not linha.strip():
+                continue
+            requisicao = json.loads(linha)
+            erro = erro_formato(requisicao["body"])
+            if erro:
+                falhas += 1
+                resposta = {"status_code": 400, "request_id": uuid.uuid4().hex,
+                            "body": {"error": {"message": erro, "type": "invalid_request_error"}}}
+            else:
+                resposta = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": corpo_response(requisicao["body"])}
+            linhas.append(json.dumps({
+                "id": f"batch_req_{uuid.uuid4().hex}",
+                "custom_id": requisicao["custom_id"],
+                "response": resposta,
+                "error": None,
+            }, ensure_ascii=False))
+
+        saida = self.criar_arquivo(("\n".join(linhas) + "\n").encode("utf-8"), "batch_output.jsonl", "batch_output")
+        batch.update({
+            "status": "completed",
+            "output_file_id": saida["id"],
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(linhas), "completed": len(linhas) - falhas, "failed": falhas},
+        })
+
+
+class HandlerStub(BaseHTTPRequestHandler):
+    estado: EstadoStub = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _json(self, corpo: dict, status: int = 200, headers: dict = None):
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (headers or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _corpo(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_POST(self):
+        if self.path == "/v1/files":
+            mensagem = BytesParser(policy=politica_email).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + self._corpo()
+            )
+            campos = {parte.get_param("name", header="content-disposition"): parte for parte in mensagem.iter_parts()}
+            arquivo = campos["file"]
+            return self._json(self.estado.criar_arquivo(
+                arquivo.get_payload(decode=True), arquivo.get_filename(), campos["purpose"].get_content().strip()
+            ))
+
+        if self.path == "/v1/batches":
+            body = json.loads(self._corpo())
+            batch = {
+                "id": f"batch_{uuid.uuid4().hex}",
+                "object": "batch",
+                "endpoint": body["endpoint"],
+                "input_file_id": body["input_file_id"],
+                "completion_window": body["completion_window"],
+                "status": "in_progress",
+                "created_at": int(time.time()),
+                "metadata": body.get("metadata"),
+                "output_file_id": None,
+                "error_file_id": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            with self.estado.lock:
+                self.estado.batches[batch["id"]] = batch
+                self.estado.consultas[batch["id"]] = 0
+            return self._json(batch)
+
+        if self.path == "/v1/responses":
+            return self._responses(json.loads(self._corpo()))
+
+        self._json({"error": {"message": f"Rota não suportada: {self.path}"}}, 404)
+
+    def _responses(self, body: dict):
+        """POST /v1/responses com os headers x-ratelimit-* e 429 acima do limite de concorrência."""
+        estado = self.estado
+        limite = estado.limite_concorrencia
+        with estado.lock:
+            if limite and estado.em_voo >= limite:
+                estado.recusadas += 1
+                return self._json(
+                    {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                    429,
+                    {"retry-after-ms": "50", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "50ms"},
+                )
+            estado.em_voo += 1
+        try:
+            time.sleep(estado.latencia)
+            corpo = corpo_response(body)
+        finally:
+            with estado.lock:
+                estado.em_voo -= 1
+                estado.respostas += 1
+                restantes = (limite or 1000) - estado.em_voo
+
+        self._json(corpo, headers={
+            "x-ratelimit-limit-requests": str(limite or 1000),
+            "x-ratelimit-remaining-requests": str(restantes),
+            "x-ratelimit-reset-requests": "50ms",
+        })
+
+    def do_GET(self):
+        match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+        if match and match.group(1) in self.estado.batches:
+            batch_id = match.group(1)
+            with self.estado.lock:
+                batch = self.estado.batches[batch_id]
+                self.estado.consultas[batch_id] += 1
+                if batch["status"] == "in_progress" and self.estado.consultas[batch_id] >= self.estado.consultas_ate_concluir:
+                    self.estado.processar_batch(batch)
+            return self._json(batch)
+
+        match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+        if match and match.group(1) in self.estado.arquivos:
+            _, conteudo = self.estado.arquivos[match.group(1)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+            return
+
+        self._json({"error": {"message": f"Rota não suportada: {self.path}"}}, 404)
+
+
+def iniciar_servidor(
+    porta: int = 0, consultas_ate_concluir: int = 1, limite_concorrencia: int = None, latencia: float = 0.0
+) -> ThreadingHTTPServer:
+    """
+    Sobe o servidor em uma thread e retorna a instância (server.server_port tem a porta;
+    server.RequestHandlerClass.estado tem os contadores).
+    """
+    handler = type("Handler", (HandlerStub,), {"estado": EstadoStub(consultas_ate_concluir, limite_concorrencia, latencia)})
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in local da API da OpenAI (Files, Batches, Responses).")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--polls", type=int, default=1, help="Consultas até o batch ficar 'completed'.")
+    parser.add_argument("--rate-limit", type=int, default=None, help="Respostas simultâneas antes de devolver 429.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de latência simulada por resposta.")
+    args = parser.parse_args()
+
+    servidor = iniciar_servidor(args.port, args.polls, args.rate_limit, args.latency)
+    print(f"🧪 Stand-in da OpenAI em http://127.0.0.1:{servidor.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
@@ -0,0 +1,291 @@
+"""
+Executa a pipeline inteira localmente, sem deploy: Download → Clean → SaveHistory → FetchIndividual →
+GenerateTweets (Map, assíncrono ou batch) → Scheduler → Poster, chamando os lambda_handler
+no próprio processo, na mesma ordem e com os mesmos eventos da Step Function.
+
+S3, Secrets Manager, EventBridge Scheduler, site da Câmara e Bluesky são stand-ins
+baseados em arquivos (local/stand_ins.py), alimentados com src/data/; a OpenAI é o
+servidor de local/openai_stub.py. Ao final imprime o perfil de cada etapa (tempo de
+parede, CPU, pico de memória e chamadas a cada serviço) e grava em <pasta>/perfil.json.
+
+Uso:
+    python local/run_pipeline.py
+    python local/run_pipeline.py --geracao async --openai-latency 0.2 --limpar
+    python local/run_pipeline.py --geracao batch --limpar   # submit/status/collect contra o stand-in
+    python local/run_pipeline.py --data 13/10/2025 --sem-tracemalloc
+
+Observações:
+    - O pico de memória vem do tracemalloc (alocações Python, zerado a cada etapa), que
+      deixa a execução mais lenta; use --sem-tracemalloc para medir só tempo e CPU.
+    - A CPU é a do processo inteiro (inclui o stand-in da OpenAI, que roda em uma thread).
+    - O X não tem stand-in: a publicação local usa só o Bluesky (POST_PLATFORMS=bluesky).
+    - No modo batch, qualquer proposição sem post (ex: schema recusado pelo stand-in)
+      interrompe a execução com código de saída 1, como o BatchFailed da Step Function.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+import shutil
+import argparse
+import resource
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+sys.path.insert(0, os.path.join(RAIZ, "local"))
+
+BUCKET = "xbot-local"
+# Mesmo MaxConcurrency do GenerateTweetsMap no template.yaml
+MAP_MAX_CONCURRENCY = 5
+
+
+class ContextoLocal:
+    """Imita o context da Lambda (usado pelo modo de drenagem da PosterLambda)."""
+
+    def __init__(self, nome: str, timeout_seconds: int = 900):
+        self.function_name = nome
+        self.aws_request_id = str(uuid.uuid4())
+        self.memory_limit_in_mb = 512
+        self._fim = time.monotonic() + timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._fim - time.monotonic()) * 1000))
+
+
+class Perfil:
+    """Tempo de parede, CPU, pico de memória e chamadas aos stand-ins, por etapa."""
+
+    def __init__(self, chamadas, openai_estado, medir_memoria: bool = True):
+        self.chamadas = chamadas
+        self.openai_estado = openai_estado
+        self.medir_memoria = medir_memoria
+        self.etapas = []
+        if medir_memoria:
+            tracemalloc.start()
+
+    @staticmethod
+    def _cpu() -> float:
+        uso = resource.getrusage(resource.RUSAGE_SELF)
+        return uso.ru_utime + uso.ru_stime
+
+    @contextmanager
+    def etapa(self, nome: str):
+        chamadas_antes = dict(self.chamadas)
+        openai_antes = self.openai_estado.respostas
+        if self.medir_memoria:
+            tracemalloc.reset_peak()
+        cpu_antes, inicio = self._cpu(), time.perf_counter()
+        registro = {"etapa": nome, "ok": True}
+        print(f"\n▶️ {nome}")
+        try:
+            yield registro
+        except Exception as e:
+            registro.update(ok=False, erro=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            chamadas = {k: v - chamadas_antes.get(k, 0) for k, v in self.chamadas.items() if v - chamadas_antes.get(k, 0)}
+            if self.openai_estado.respostas - openai_antes:
+                chamadas["openai.responses"] = self.openai_estado.respostas - openai_antes
+            registro.update(
+                wall_s=round(time.perf_counter() - inicio, 3),
+                cpu_s=round(self._cpu() - cpu_antes, 3),
+                pico_mem_mb=round(tracemalloc.get_traced_memory()[1] / 2**20, 2) if self.medir_memoria else None,
+                # ru_maxrss é o pico do processo desde o início (em KB no Linux), não só da etapa
+                rss_max_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                chamadas=dict(sorted(chamadas.items())),
+            )
+            self.etapas.append(registro)
+
+    def imprimir(self):
+        lenta = max(self.etapas, key=lambda e: e["wall_s"], default=None)
+        print(f"\n{'Etapa':<26}{'Wall (s)':>10}{'CPU (s)':>10}{'Pico mem (MB)':>15}{'RSS máx (MB)':>14}  Chamadas")
+        for e in self.etapas:
+            memoria = f"{e['pico_mem_mb']:.2f}" if e["pico_mem_mb"] is not None else "-"
+            chamadas = ", ".join(f"{k}={v}" for k, v in e["chamadas"].items())
+            marca = " 🐢" if e is lenta else ("" if e["ok"] else " ❌")
+            print(f"{e['etapa']:<26}{e['wall_s']:>10.3f}{e['cpu_s']:>10.3f}{memoria:>15}{e['rss_max_mb']:>14.1f}  {chamadas}{marca}")
+        if lenta:
+            print(f"\n🐢 Gargalo: {lenta['etapa']} ({lenta['wall_s']:.3f}s de parede, {lenta['cpu_s']:.3f}s de CPU).")
+
+
+def data_mais_recente(caminho_csv: str) -> str:
+    """Data de apresentação mais recente do export (dd/mm/yyyy), para a janela do modo incremental."""
+    datas = set()
+    with open(caminho_csv, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        for _ in range(3):
+            next(reader, None)
+        cabecalho = next(reader)
+        idx = cabecalho.index("Apresentação")
+        for linha in reader:
+            if len(linha) == len(cabecalho):
+                try:
+                    datas.add(datetime.strptime(linha[idx], "%d/%m/%Y").date())
+                except ValueError:
+                    continue
+    return max(datas).strftime("%d/%m/%Y")
+
+
+def configurar_ambiente(pasta: str, openai_url: str):
+    """Variáveis do template.yaml apontando para os stand-ins (valores já definidos são mantidos)."""
+    padrao = {
+        "S3_BUCKET_NAME": BUCKET,
+        "OPENAI_API_KEY": "XBot/OpenAIKey",  # nome do segredo, como no template
+        "OPENAI_BASE_URL": openai_url,
+        "X_SECRET_NAME": "XBot/XKeys",
+        "BLUESKY_SECRET_NAME": "XBot/BlueskyKeys",
+        "POSTER_LAMBDA_ARN": "arn:aws:lambda:local:000000000000:function:PosterLambda",
+        "SCHEDULER_ROLE_ARN": "arn:aws:iam::000000000000:role/EventBridgeSchedulerRole",
+        "SCHEDULER_MODE": "schedules",
+        "POST_PLATFORMS": "bluesky",
+        "FETCH_TMP_DIR": os.path.join(pasta, "tmp"),
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
+    for nome, valor in padrao.items():
+        os.environ.setdefault(nome, valor)
+    os.makedirs(os.environ["FETCH_TMP_DIR"], exist_ok=True)
+
+
+def gerar_em_batch(generate_tweet_batch, daily_projects: dict) -> list[dict]:
+    """
+    SubmitBatch → CheckBatch (até um status final) → CollectBatch, com os mesmos eventos
+    da Step Function. Falha se o batch não concluir ou se alguma proposição ficar sem post.
+    """
+    def invocar(evento):
+        return generate_tweet_batch.lambda_handler(evento, ContextoLocal("GenerateTweetBatchFunction"))
+
+    batch = invocar({"action": "submit", **daily_projects})
+    for _ in range(10):
+        if batch["status"] in ("completed", "failed", "expired", "cancelled"):
+            break
+        batch = invocar({"action": "status", "batch_id": batch["batch_id"], "dia_submissao": batch["dia_submissao"]})
+    if batch["status"] != "completed":
+        raise RuntimeError(f"Batch {batch.get('batch_id')} terminou com status '{batch['status']}'.")
+
+    coletado = invocar({"action": "collect", "batch_id": batch["batch_id"], "dia_submissao": batch["dia_submissao"]})
+    if coletado["erros"]:
+        raise RuntimeError(f"Batch {batch['batch_id']}: {coletado['erros']} proposição(ões) sem post.")
+    total = coletado["posts"] + batch.get("reaproveitados", 0)
+    return [{"statusCode": 200}] * total
+
+
+def executar(args) -> int:
+    import stand_ins
+    from openai_stub import iniciar_servidor
+
+    pasta = os.path.abspath(args.dir)
+    if args.limpar and os.path.exists(pasta):
+        shutil.rmtree(pasta)
+
+    servidor_openai = iniciar_servidor(latencia=args.openai_latency)
+    configurar_ambiente(pasta, f"http://127.0.0.1:{servidor_openai.server_port}/v1")
+    stand_ins_criados = stand_ins.instalar(pasta, args.camara_latency, args.bluesky_latency)
+
+    perfil = Perfil(stand_ins.CHAMADAS, servidor_openai.RequestHandlerClass.estado, not args.sem_tracemalloc)
+    data = args.data or data_mais_recente(os.path.join(stand_ins.PASTA_DADOS, "proposicoes.csv"))
+    print(f"🧪 Pipeline local em {pasta} (proposições de {data}, geração: {args.geracao})")
+
+    try:
+        # Imports dentro de uma etapa: o custo de import (cold start) também entra no perfil
+        with perfil.etapa("Imports (cold start)"):
+            from lambdas import fetch_projects_csv, clean_csv, save_history, fetch_individual_project
+            from lambdas import generate_tweet, generate_tweet_batch, schedule_tweet, post_tweet
+            from services.manifest_service import ler_manifesto
+
+        with perfil.etapa("DownloadCSV"):
+            estado = fetch_projects_csv.lambda_handler(
+                {"data_inicio": data, "data_fim": data}, ContextoLocal("DownloadCSVFunction")
+            )
+
+        with perfil.etapa("CleanCSV") as registro:
+            estado["cleanCsv"] = clean_csv.lambda_handler(estado, ContextoLocal("CleanCSVFunction"))
+            registro["itens"] = estado["cleanCsv"]["count"]
+
+        with perfil.etapa("SaveHistory") as registro:
+            try:
+                estado["history"] = save_history.lambda_handler(
+                    {"bucket": estado["cleanCsv"]["bucket"], "manifest_key": estado["cleanCsv"]["manifest_key"]},
+                    ContextoLocal("SaveHistoryFunction")
+                )
+                registro["itens"] = sum(estado["history"]["gravadas"].values())
+            except Exception as e:
+                # Como o Catch da Step Function: o histórico não interrompe a pipeline
+                registro["erros"] = 1
+                print(f"⚠️ Falha ao gravar o histórico: {e}")
+
+        with perfil.etapa("FetchIndividualProject") as registro:
+            estado["dailyProjects"] = fetch_individual_project.lambda_handler(
+                estado, ContextoLocal("FetchIndividualProjectFunction")
+            )
+            registro["itens"] = estado["dailyProjects"]["count"]
+
+        with perfil.etapa(f"GenerateTweets ({args.geracao})") as registro:
+            if args.geracao == "async":
+                resultado = generate_tweet.lambda_handler(
+                    {"bucket": estado["dailyProjects"]["bucket"], "manifest_key": estado["dailyProjects"]["manifest_key"]},
+                    ContextoLocal("GenerateTweetsAsyncFunction")
+                )
+                resultados = resultado["results"]
+            elif args.geracao == "batch":
+                resultados = gerar_em_batch(generate_tweet_batch, estado["dailyProjects"])
+            else:
+                itens = ler_manifesto(estado["dailyProjects"]["bucket"], estado["dailyProjects"]["manifest_key"])
+
+                def gerar(item):
+                    try:
+                        return generate_tweet.lambda_handler(item, ContextoLocal("GenerateTweetFunction"))
+                    except Exception as e:
+                        return {"statusCode": 500, "proposition": item.get("Proposições"), "error": str(e)}
+
+                with ThreadPoolExecutor(max_workers=MAP_MAX_CONCURRENCY) as executor:
+                    resultados = list(executor.map(gerar, itens))
+            registro["itens"] = len(resultados)
+            registro["erros"] = sum(1 for r in resultados if r.get("statusCode") != 200)
+
+        with perfil.etapa("Scheduler") as registro:
+            resultado = schedule_tweet.lambda_handler({}, ContextoLocal("SchedulerLambdaFunction"))
+            registro["itens"] = len(resultado.get("body", {}).get("agendados", []))
+
+        with perfil.etapa("Poster") as registro:
+            # Dispara cada agendamento na ordem dos horários, sem esperar por eles
+            scheduler = stand_ins_criados["scheduler"]
+            agendamentos = sorted(scheduler.listar().items(), key=lambda item: item[1]["ScheduleExpression"])
+            for nome, params in agendamentos:
+                post_tweet.lambda_handler(json.loads(params["Target"]["Input"]), ContextoLocal("PosterLambdaFunction"))
+                if params.get("ActionAfterCompletion") == "DELETE":
+                    scheduler.delete_schedule(Name=nome)
+            registro["itens"] = len(agendamentos)
+
+    except Exception as e:
+        print(f"❌ Pipeline interrompida: {type(e).__name__}: {e}")
+        return_code = 1
+    else:
+        return_code = 0
+    finally:
+        servidor_openai.shutdown()
+
+    perfil.imprimir()
+    with open(os.path.join(pasta, "perfil.json"), "w", encoding="utf-8") as f:
+        json.dump({"data": data, "geracao": args.geracao, "etapas": perfil.etapas}, f, ensure_ascii=False, indent=2)
+    print(f"📝 Perfil salvo em {os.path.join(pasta, 'perfil.json')}; posts em {os.path.join(pasta, 'bluesky', 'posts.jsonl')}")
+    return return_code
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Executa a pipeline localmente com stand-ins e perfil por etapa.")
+    parser.add_argument("--dir", default=os.path.join(RAIZ, "local", ".execucao"), help="Pasta do estado local.")
+    parser.add_argument("--data", default=None, help="Data das proposições (dd/mm/yyyy); padrão: a mais recente de src/data.")
+    parser.add_argument("--geracao", choices=["map", "async", "batch"], default="map",
+                        help="GenerateTweetsMap, modo assíncrono ou Batch API (submit/status/collect).")
+    parser.add_argument("--limpar", action="store_true", help="Apaga o estado local antes (sem idempotência de execuções anteriores).")
+    parser.add_argument("--openai-latency", type=float, default=0.0, help="Latência simulada por resposta da OpenAI (s).")
+    parser.add_argument("--camara-latency", type=float, default=0.0, help="Latência simulada por requisição à Câmara (s).")
+    parser.add_argument("--bluesky-latency", type=float, default=0.0, help="Latência simulada por requisição ao Bluesky (s).")
+    parser.add_argument("--sem-tracemalloc", action="store_true", help="Não mede o pico de memória (execução mais rápida).")
+    sys.exit(executar(parser.parse_args()))
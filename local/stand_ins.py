@@ -0,0 +1,414 @@
+"""
+Stand-ins locais, baseados em arquivos, para os serviços externos da pipeline:
+S3, Secrets Manager, EventBridge Scheduler, site da Câmara e PDS do Bluesky.
+(A OpenAI usa o servidor de local/openai_stub.py.)
+
+Os clients entram no cache de recursos (services.resource_cache_service) antes de as
+Lambdas serem importadas, então cliente_boto3("s3") e sessao_http("camara") devolvem os
+stand-ins sem nenhuma mudança no código das Lambdas. As sessões HTTP são requests.Session
+de verdade com um adapter que responde localmente: streaming, raise_for_status e
+context managers funcionam como em produção.
+
+Tudo é gravado em uma pasta (ex: local/.execucao/): s3/<bucket>/<key>, secrets.json,
+scheduler.json e bluesky/posts.jsonl, para inspecionar o resultado depois da execução.
+"""
+import io
+import os
+import json
+import time
+import base64
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+PASTA_DADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data")
+
+# Chamadas feitas aos stand-ins, por serviço e operação ("s3.put_object", "http.www.camara.leg.br"...)
+CHAMADAS = Counter()
+_lock_chamadas = threading.Lock()
+
+
+def contar(operacao: str):
+    with _lock_chamadas:
+        CHAMADAS[operacao] += 1
+
+
+def erro_cliente(codigo: str, operacao: str, mensagem: str = "") -> ClientError:
+    return ClientError({"Error": {"Code": codigo, "Message": mensagem}}, operacao)
+
+
+class S3Arquivos:
+    """Subconjunto do client S3 usado pelo projeto, gravando em <raiz>/<bucket>/<key>."""
+
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+
+    def _caminho(self, bucket: str, key: str) -> str:
+        return os.path.join(self.raiz, bucket, *key.split("/"))
+
+    def _gravar(self, bucket: str, key: str, dados: bytes):
+        caminho = self._caminho(bucket, key)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(dados)
+        os.replace(temporario, caminho)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        contar("s3.put_object")
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        elif hasattr(Body, "read"):
+            Body = Body.read()
+        self._gravar(Bucket, Key, Body)
+        return {"ETag": f'"{hash(Body) & 0xFFFFFFFF:x}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        contar("s3.get_object")
+        caminho = self._caminho(Bucket, Key)
+        if not os.path.isfile(caminho):
+            raise erro_cliente("NoSuchKey", "GetObject", Key)
+        with open(caminho, "rb") as f:
+            dados = f.read()
+        return {"Body": StreamingBody(io.BytesIO(dados), len(dados)), "ContentLength": len(dados),
+                "LastModified": datetime.fromtimestamp(os.path.getmtime(caminho), timezone.utc)}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, **kwargs):
+        contar("s3.upload_file")
+        with open(Filename, "rb") as f:
+            self._gravar(Bucket, Key, f.read())
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        contar("s3.download_file")
+        caminho = self._caminho(Bucket, Key)
+        if not os.path.isfile(caminho):
+            raise erro_cliente("404", "HeadObject", Key)
+        with open(caminho, "rb") as origem, open(Filename, "wb") as destino:
+            destino.write(origem.read())
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        contar("s3.delete_object")
+        caminho = self._caminho(Bucket, Key)
+        if os.path.isfile(caminho):
+            os.remove(caminho)
+        return {}
+
+    def listar(self, bucket: str, prefixo: str = "") -> list[dict]:
+        base = os.path.join(self.raiz, bucket)
+        objetos = []
+        for pasta, _, arquivos in os.walk(base):
+            for nome in arquivos:
+                if nome.endswith(".tmp"):
+                    continue
+                caminho = os.path.join(pasta, nome)
+                key = os.path.relpath(caminho, base).replace(os.sep, "/")
+                if key.startswith(prefixo):
+                    objetos.append({
+                        "Key": key,
+                        "Size": os.path.getsize(caminho),
+                        "LastModified": datetime.fromtimestamp(os.path.getmtime(caminho), timezone.utc),
+                    })
+        return sorted(objetos, key=lambda o: o["Key"])
+
+    def get_paginator(self, operacao: str):
+        if operacao != "list_objects_v2":
+            raise NotImplementedError(f"Paginator '{operacao}' não suportado pelo stand-in.")
+        s3 = self
+
+        class Paginador:
+            def paginate(self, Bucket, Prefix="", PaginationConfig=None, **kwargs):
+                contar("s3.list_objects_v2")
+                objetos = s3.listar(Bucket, Prefix)
+                for inicio in range(0, max(len(objetos), 1), 1000):
+                    yield {"Contents": objetos[inicio:inicio + 1000], "KeyCount": len(objetos[inicio:inicio + 1000])}
+
+        return Paginador()
+
+
+class SecretsArquivo:
+    """Secrets Manager lido de um JSON {secret_id: {chave: valor}}."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+
+    def get_secret_value(self, SecretId, **kwargs):
+        contar("secretsmanager.get_secret_value")
+        with open(self.caminho, encoding="utf-8") as f:
+            segredos = json.load(f)
+        if SecretId not in segredos:
+            raise erro_cliente("ResourceNotFoundException", "GetSecretValue", SecretId)
+        return {"Name": SecretId, "SecretString": json.dumps(segredos[SecretId])}
+
+
+class SchedulerArquivo:
+    """EventBridge Scheduler com os agendamentos em um JSON {nome: parâmetros}."""
+
+    class ConflictException(ClientError):
+        def __init__(self, nome: str):
+            super().__init__({"Error": {"Code": "ConflictException", "Message": nome}}, "CreateSchedule")
+
+    class ResourceNotFoundException(ClientError):
+        def __init__(self, nome: str):
+            super().__init__({"Error": {"Code": "ResourceNotFoundException", "Message": nome}}, "GetSchedule")
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self.exceptions = type("Excecoes", (), {
+            "ConflictException": self.ConflictException,
+            "ResourceNotFoundException": self.ResourceNotFoundException,
+        })
+        self._lock = threading.Lock()
+
+    def _alterar(self, funcao):
+        with self._lock:
+            agendamentos = self.listar()
+            resultado = funcao(agendamentos)
+            with open(self.caminho, "w", encoding="utf-8") as f:
+                json.dump(agendamentos, f, ensure_ascii=False, indent=2)
+            return resultado
+
+    def listar(self) -> dict:
+        if not os.path.exists(self.caminho):
+            return {}
+        with open(self.caminho, encoding="utf-8") as f:
+            return json.load(f)
+
+    def create_schedule(self, Name, **params):
+        contar("scheduler.create_schedule")
+
+        def criar(agendamentos):
+            if Name in agendamentos:
+                raise self.ConflictException(Name)
+            agendamentos[Name] = params
+        self._alterar(criar)
+        return {"ScheduleArn": f"arn:aws:scheduler:local:000000000000:schedule/default/{Name}"}
+
+    def update_schedule(self, Name, **params):
+        contar("scheduler.update_schedule")
+
+        def atualizar(agendamentos):
+            if Name not in agendamentos:
+                raise self.ResourceNotFoundException(Name)
+            agendamentos[Name] = params
+        self._alterar(atualizar)
+        return {"ScheduleArn": f"arn:aws:scheduler:local:000000000000:schedule/default/{Name}"}
+
+    def delete_schedule(self, Name, **kwargs):
+        contar("scheduler.delete_schedule")
+        self._alterar(lambda agendamentos: agendamentos.pop(Name, None))
+        return {}
+
+
+class AdaptadorLocal(BaseAdapter):
+    """
+    Adapter do requests que responde com uma função local em vez da rede.
+    'responder(request)' devolve (status, headers, corpo em bytes).
+    """
+
+    def __init__(self, responder):
+        super().__init__()
+        self.responder = responder
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        contar(f"http.{urlparse(request.url).hostname}")
+        status, headers, corpo = self.responder(request)
+        resposta = requests.Response()
+        resposta.status_code = status
+        resposta.reason = "OK" if status < 400 else "Error"
+        resposta.headers = CaseInsensitiveDict({"Content-Length": str(len(corpo)), **headers})
+        resposta.encoding = requests.utils.get_encoding_from_headers(resposta.headers)
+        resposta.raw = io.BytesIO(corpo)
+        resposta.url = request.url
+        resposta.request = request
+        return resposta
+
+    def close(self):
+        pass
+
+
+def sessao_local(responder, prefixos: list[str]) -> requests.Session:
+    session = requests.Session()
+    adapter = AdaptadorLocal(responder)
+    for prefixo in prefixos:
+        session.mount(prefixo, adapter)
+    return session
+
+
+def pdf_de_texto(texto: str, linhas_por_pagina: int = 50) -> bytes:
+    """PDF mínimo (Helvetica, WinAnsi) com o texto, para exercitar a extração com o PyPDF2."""
+    linhas = texto.splitlines() or [""]
+    paginas = [linhas[i:i + linhas_por_pagina] for i in range(0, len(linhas), linhas_por_pagina)]
+
+    def escapar(linha: str) -> bytes:
+        dados = linha.encode("cp1252", errors="replace")
+        return dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, preenchido depois de conhecer os ids das páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    ids_paginas = []
+    for pagina in paginas:
+        conteudo = b"BT /F1 10 Tf 14 TL 40 800 Td " + b" ".join(b"(" + escapar(l) + b") Tj T*" for l in pagina) + b" ET"
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream")
+        objetos.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objetos)))
+        ids_paginas.append(len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in ids_paginas), len(ids_paginas))
+
+    saida = io.BytesIO(b"%PDF-1.4\n")
+    offsets = []
+    for numero, objeto in enumerate(objetos, start=1):
+        offsets.append(saida.tell())
+        saida.write(b"%d 0 obj\n" % numero + objeto + b"\nendobj\n")
+    inicio_xref = saida.tell()
+    saida.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+    for offset in offsets:
+        saida.write(b"%010d 00000 n \n" % offset)
+    saida.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+    return saida.getvalue()
+
+
+class CamaraLocal:
+    """
+    Site da Câmara servido a partir de src/data/: o export CSV (página 1 = proposicoes.csv,
+    demais páginas vazias), a página de tramitação (proposicao_individual.html, para
+    qualquer proposição) e o inteiro teor (PDF gerado de proposicao_*.txt).
+    """
+
+    def __init__(self, pasta_dados: str = PASTA_DADOS, latencia: float = 0.0):
+        self.latencia = latencia
+        with open(os.path.join(pasta_dados, "proposicoes.csv"), "rb") as f:
+            self.csv = f.read()
+        # Export sem linhas: só os metadados e o cabeçalho
+        self.csv_vazio = b"\n".join(self.csv.split(b"\n")[:4]) + b"\n"
+        with open(os.path.join(pasta_dados, "proposicao_individual.html"), "rb") as f:
+            self.html = f.read()
+        teor = sorted(n for n in os.listdir(pasta_dados) if n.startswith("proposicao_") and n.endswith(".txt"))[0]
+        with open(os.path.join(pasta_dados, teor), encoding="utf-8") as f:
+            self.pdf = pdf_de_texto(f.read())
+
+    def responder(self, request):
+        time.sleep(self.latencia)
+        caminho = urlparse(request.url).path
+        if caminho.startswith("/busca-download/"):
+            pagina = json.loads(request.body)["data"]["pagina"]
+            return 200, {"Content-Type": "text/csv; charset=utf-8"}, self.csv if pagina == 1 else self.csv_vazio
+        if caminho.endswith("/fichadetramitacao"):
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, self.html
+        if caminho.endswith("/prop_mostrarintegra"):
+            return 200, {"Content-Type": "application/pdf", "ETag": '"teor-local"'}, self.pdf
+        return 404, {}, b"Not Found"
+
+    def sessao(self) -> requests.Session:
+        return sessao_local(self.responder, ["http://www.camara.leg.br", "https://www.camara.leg.br"])
+
+
+def jwt_local(sub: str, validade_seconds: int) -> str:
+    """JWT não assinado, só com o 'exp' que o bluesky_session_service lê."""
+    def b64(dados: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(dados).encode()).decode().rstrip("=")
+    return f"{b64({'alg': 'none'})}.{b64({'sub': sub, 'exp': int(time.time()) + validade_seconds})}.assinatura"
+
+
+class BlueskyLocal:
+    """PDS do Bluesky: sessões, applyWrites e getRecord, com os posts em bluesky/posts.jsonl."""
+
+    def __init__(self, pasta: str, latencia: float = 0.0):
+        os.makedirs(pasta, exist_ok=True)
+        self.caminho = os.path.join(pasta, "posts.jsonl")
+        self.latencia = latencia
+        self.registros = {}
+        self._lock = threading.Lock()
+
+    def _sessao(self, handle: str = "bot.local") -> dict:
+        did = "did:plc:localbot"
+        return {"did": did, "handle": handle,
+                "accessJwt": jwt_local(did, 2 * 3600), "refreshJwt": jwt_local(did, 60 * 86400)}
+
+    def responder(self, request):
+        from services.atproto_service import cid_registro
+
+        time.sleep(self.latencia)
+        url = urlparse(request.url)
+        nsid = url.path.rsplit("/", 1)[1]
+        corpo = json.loads(request.body) if request.body else {}
+
+        if nsid == "com.atproto.server.createSession":
+            return 200, {}, json.dumps(self._sessao(corpo.get("identifier"))).encode()
+        if nsid == "com.atproto.server.refreshSession":
+            return 200, {}, json.dumps(self._sessao()).encode()
+        if nsid == "com.atproto.repo.applyWrites":
+            resultados = []
+            with self._lock, open(self.caminho, "a", encoding="utf-8") as f:
+                for escrita in corpo["writes"]:
+                    uri = f"at://{corpo['repo']}/{escrita['collection']}/{escrita['rkey']}"
+                    cid = cid_registro(escrita["value"])
+                    self.registros[uri] = cid
+                    f.write(json.dumps({"uri": uri, "cid": cid, "record": escrita["value"]}, ensure_ascii=False) + "\n")
+                    resultados.append({"$type": "com.atproto.repo.applyWrites#createResult", "uri": uri, "cid": cid})
+            return 200, {}, json.dumps({"results": resultados}).encode()
+        if nsid == "com.atproto.repo.getRecord":
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            uri = f"at://{params['repo']}/{params['collection']}/{params['rkey']}"
+            if uri not in self.registros:
+                return 400, {}, json.dumps({"error": "RecordNotFound"}).encode()
+            return 200, {}, json.dumps({"uri": uri, "cid": self.registros[uri]}).encode()
+        return 404, {}, json.dumps({"error": "MethodNotImplemented"}).encode()
+
+    def sessao(self, url_pds: str) -> requests.Session:
+        return sessao_local(self.responder, [url_pds])
+
+
+def segredos_padrao() -> dict:
+    """Segredos fictícios com os mesmos nomes e chaves do template.yaml."""
+    return {
+        "XBot/OpenAIKey": {"OPENAI_API_KEY": "sk-local"},
+        "XBot/XKeys": {"X_API_KEY": "local", "X_API_SECRET": "local", "X_ACCESS_TOKEN": "local", "X_ACCESS_SECRET": "local"},
+        "XBot/BlueskyKeys": {"BLUESKY_APP_HANDLE": "bot.local", "BLUESKY_PASSWORD": "local"},
+    }
+
+
+def instalar(pasta: str, latencia_camara: float = 0.0, latencia_bluesky: float = 0.0) -> dict:
+    """
+    Cria os stand-ins em 'pasta' e os registra no cache de recursos.
+    Deve ser chamado antes de importar as Lambdas (elas criam os clients no import).
+    Retorna os stand-ins criados, para inspeção.
+    """
+    # Só o cache de recursos (e as métricas) podem ser importados aqui: os demais services criam clients no import
+    from services.resource_cache_service import _recursos, _lock
+    from services.metrics_service import instrumentar_sessao
+
+    os.makedirs(pasta, exist_ok=True)
+    caminho_segredos = os.path.join(pasta, "secrets.json")
+    if not os.path.exists(caminho_segredos):
+        with open(caminho_segredos, "w", encoding="utf-8") as f:
+            json.dump(segredos_padrao(), f, indent=2)
+
+    stand_ins = {
+        "s3": S3Arquivos(os.path.join(pasta, "s3")),
+        "secretsmanager": SecretsArquivo(caminho_segredos),
+        "scheduler": SchedulerArquivo(os.path.join(pasta, "scheduler.json")),
+        "camara": CamaraLocal(latencia=latencia_camara),
+        "bluesky": BlueskyLocal(os.path.join(pasta, "bluesky"), latencia=latencia_bluesky),
+    }
+    # Sessões com o mesmo hook de latência por host das criadas por sessao_http()
+    camara = instrumentar_sessao(stand_ins["camara"].sessao())
+    # Mesmo formato das entradas do cache: (recurso, criado_em); clients e sessões não têm TTL
+    agora = time.monotonic()
+    with _lock:
+        for servico in ("s3", "secretsmanager", "scheduler"):
+            _recursos[("boto3", servico)] = (stand_ins[servico], agora)
+        _recursos[("http", "camara")] = (camara, agora)
+        _recursos[("http", "camara-csv")] = (camara, agora)
+        pds = os.getenv("BLUESKY_PDS_URL", "https://bsky.social")
+        _recursos[("http", "bluesky")] = (instrumentar_sessao(stand_ins["bluesky"].sessao(pds)), agora)
+    return stand_ins
@@ -1,44 +1,59 @@
 import os
 import json
-import boto3
-import pandas as pd
-from io import BytesIO, StringIO
-from services.clean_csv_service import clean_csv
-
-s3 = boto3.client("s3")
+from io import StringIO
+from datetime import datetime
+from services.clean_csv_service import clean_csv, clean_csv_stream, escrever_csv
+from services.manifest_service import manifesto_key, salvar_manifesto
+from services.resource_cache_service import cliente_boto3, relatar_cache
+from services.metrics_service import metricas_lambda
+
+s3 = cliente_boto3("s3")
 BUCKET = os.getenv("S3_BUCKET_NAME")
+# "stream" usa o leitor sem pandas (menos memória e import mais rápido); "pandas" usa o DataFrame
+CLEAN_CSV_ENGINE = os.getenv("CLEAN_CSV_ENGINE", "stream")
 
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
     """
     Handler da Lambda que lê o CSV bruto do S3, limpa e salva o resultado em outra pasta.
-    Também retorna as linhas limpas (como JSON) para a próxima Lambda.
+    As linhas limpas vão para um manifesto JSON Lines no S3; só a key dele
+    é repassada para a próxima Lambda (e para a SaveHistory, que grava o histórico).
+    Filtra a data "data_busca" (dd/mm/yyyy) do evento, se houver; senão, ontem.
     """
     try:
         bucket = event["bucket"]
         key = event["key"]
+        data_busca = datetime.strptime(event["data_busca"], "%d/%m/%Y").date() if event.get("data_busca") else None
         caminho_local = "/tmp/proposicoes_raw.csv"
 
         # 📥 Baixa o CSV original do S3
         s3.download_file(bucket, key, caminho_local)
 
         # 🧹 Limpa o arquivo com o service existente
-        df_hoje = clean_csv(caminho_local)
+        # Converte linhas em lista de dicionários (para o manifesto)
+        if CLEAN_CSV_ENGINE == "pandas":
+            linhas = clean_csv(caminho_local, data_busca).to_dict(orient="records")
+        else:
+            linhas = clean_csv_stream(caminho_local, data_busca)
 
         # 📤 Salva o arquivo limpo no S3
         output_key = key.replace("raw/", "clean/").replace(".csv", "_clean.csv")
         buffer = StringIO()
-        df_hoje.to_csv(buffer, index=False)
+        escrever_csv(linhas, buffer)
         s3.put_object(Bucket=BUCKET, Key=output_key, Body=buffer.getvalue().encode("utf-8"))
 
         print(f"✅ CSV limpo salvo em s3://{BUCKET}/{output_key}")
 
-        # Converte linhas do DataFrame em lista de dicionários (para passar no evento)
-        linhas = df_hoje.to_dict(orient="records")
+        # 🧾 Manifesto com as proposições do dia (claim-check)
+        manifest_key = manifesto_key("clean_csv")
+        total = salvar_manifesto(BUCKET, manifest_key, linhas)
 
         return {
             "bucket": BUCKET,
             "key": output_key,
-            "propositions": linhas
+            "manifest_key": manifest_key,
+            "count": total
         }
 
     except Exception as e:
@@ -1,83 +1,185 @@
 import os
 import uuid
-import boto3
-from slugify import slugify
-from services.fetch_individual_project_service import fetch_individual_project
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from services.slug_service import slug_proposicao
+from services.fetch_individual_project_service import fetch_individual_project, criar_sessao
+from services.manifest_service import manifesto_key, salvar_manifesto, ler_manifesto
+from services.idempotency_service import ja_processado, marcar_processado, ETAPA_FETCH
+from services.pdf_cache_service import carregar_metadados, salvar_metadados, cache_fresco
+from services.resource_cache_service import cliente_boto3, sessao_http, relatar_cache
+from services.metrics_service import metricas_lambda, etapa
 
-s3 = boto3.client("s3")
+s3 = cliente_boto3("s3")
 BUCKET = os.getenv("S3_BUCKET_NAME")
+# Número de proposições processadas em paralelo (1 = modo sequencial)
+MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))
+# Salva o HTML bruto (page.html) de cada proposição; por padrão só os dados extraídos dele
+SALVAR_HTML = os.getenv("FETCH_SAVE_HTML", "false").lower() == "true"
 
+
+def anotar_pagina(prop: dict, pagina: dict):
+    """
+    Copia para a proposição os dados extraídos da página (autores, situação e apensados).
+    A situação da página é mais recente que a do CSV e a substitui quando presente.
+    """
+    if pagina:
+        prop["Autores"] = pagina.get("autores", [])
+        prop["Apensados"] = pagina.get("apensados", [])
+        if pagina.get("situacao"):
+            prop["Situação"] = pagina["situacao"]
+
+
+@etapa("processar_proposicao")
+def processar_proposicao(prop: dict, bucket: str, session, idx: int, total: int, salvar_html: bool = SALVAR_HTML) -> dict:
+    """
+    Busca uma proposição, salva inteiro_teor.txt (e page.html, se 'salvar_html') no S3,
+    preenche 'inteiro_teor_key' e os dados da página. Erros ficam isolados na própria proposição.
+    """
+    nome = slug_proposicao(prop.get("Proposições", f"desconhecida_{uuid.uuid4()}"))
+    texto_path = None
+
+    try:
+        print(f"({idx}/{total}) ▶️ {nome}")
+
+        # ⏭️ Já processada em uma execução anterior (índice de idempotência). O marcador vale
+        # como o cache: mesma página e dentro do TTL; depois disso a proposição passa pelo
+        # GET condicional abaixo, e um PDF alterado gera texto novo
+        marcador = ja_processado(bucket, ETAPA_FETCH, nome)
+        if cache_fresco(marcador, prop.get("Link")):
+            prop["inteiro_teor_key"] = marcador.get("inteiro_teor_key")
+            anotar_pagina(prop, marcador.get("pagina"))
+            print(f"⏭️ {nome} já processada, pulando.")
+            return prop
+
+        # ♻️ Retry/re-run recente: reaproveita o texto já salvo sem nenhuma requisição
+        cache = carregar_metadados(bucket, nome)
+        if cache_fresco(cache, prop.get("Link")):
+            prop["inteiro_teor_key"] = cache["inteiro_teor_key"]
+            anotar_pagina(prop, cache.get("pagina"))
+            print(f"♻️ {nome} já processado, usando s3://{bucket}/{cache['inteiro_teor_key']}")
+            marcar_processado(bucket, ETAPA_FETCH, nome, {"inteiro_teor_key": cache["inteiro_teor_key"],
+                                                          "pagina": cache.get("pagina"),
+                                                          "link": cache.get("link"),
+                                                          "verificado_em": cache.get("verificado_em")})
+            return prop
+
+        resultado = fetch_individual_project(prop, session=session, cache=cache)
+
+        html_content = resultado.get("html")
+        texto_path = resultado.get("texto_path")
+        anotar_pagina(prop, resultado.get("pagina"))
+
+        # 🔹 HTML bruto só quando pedido (os dados usados já foram extraídos dele)
+        if salvar_html and html_content:
+            s3.put_object(
+                Bucket=bucket,
+                Key=f"propositions/{nome}/page.html",
+                Body=html_content,
+                ContentType="text/html"
+            )
+
+        # 🔹 PDF inalterado desde a última execução: mantém o texto existente
+        if resultado.get("inalterado") and cache.get("inteiro_teor_key"):
+            prop["inteiro_teor_key"] = cache["inteiro_teor_key"]
+            salvar_metadados(bucket, nome, {**resultado["metadados"], "inteiro_teor_key": cache["inteiro_teor_key"],
+                                            "pagina": resultado["pagina"]})
+
+        # 🔹 Salvar texto apenas se existir (upload em streaming a partir do /tmp)
+        elif texto_path and os.path.getsize(texto_path) > 0:
+            txt_key = f"propositions/{nome}/inteiro_teor.txt"
+            s3.upload_file(
+                texto_path,
+                bucket,
+                txt_key,
+                ExtraArgs={"ContentType": "text/plain"}
+            )
+            prop["inteiro_teor_key"] = txt_key
+            salvar_metadados(bucket, nome, {**resultado["metadados"], "inteiro_teor_key": txt_key,
+                                            "pagina": resultado["pagina"]})
+            print(f"✅ Texto salvo em s3://{bucket}/{txt_key} "
+                  f"({resultado['bytes_pdf']} bytes, {resultado['paginas']} páginas)")
+        else:
+            prop["inteiro_teor_key"] = None
+
+        if prop["inteiro_teor_key"]:
+            marcar_processado(bucket, ETAPA_FETCH, nome, {"inteiro_teor_key": prop["inteiro_teor_key"],
+                                                          "pagina": resultado.get("pagina"),
+                                                          "link": prop.get("Link"),
+                                                          "verificado_em": datetime.now(timezone.utc).isoformat()})
+
+    except Exception as e:
+        print(f"❌ Erro ao processar {nome}: {e}")
+        prop["inteiro_teor_key"] = None
+
+    finally:
+        if texto_path and os.path.exists(texto_path):
+            os.remove(texto_path)
+
+    return prop
+
+
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
     """
-    Itera sobre proposições, salva page.html e inteiro_teor.txt no S3
-    e adiciona o campo 'inteiro_teor_key' a cada proposição.
+    Itera sobre proposições, salva inteiro_teor.txt no S3 e adiciona a cada proposição
+    'inteiro_teor_key' e os dados da página ('Autores', 'Situação', 'Apensados').
+    O HTML bruto (page.html) só é salvo com FETCH_SAVE_HTML=true ou "salvarHtml": true no evento.
+    As proposições são processadas em paralelo (FETCH_MAX_WORKERS) e
+    gravadas em um novo manifesto na mesma ordem em que foram recebidas.
     Recebe: {
-            "bucket": BUCKET,
-            "key": output_key,
-            "propositions": linhas
+            "cleanCsv": {
+                "bucket": BUCKET,
+                "key": output_key,
+                "manifest_key": manifest_key
+            },
+            "salvarHtml": false  # opcional, sobrepõe FETCH_SAVE_HTML
         }
+    Retorna: {"bucket": BUCKET, "manifest_key": manifest_key, "count": total}
     """
     try:
         # Acessa o dicionário 'cleanCsv' primeiro
         clean_csv_output = event.get("cleanCsv", {})
-        
+        salvar_html = bool(event.get("salvarHtml", SALVAR_HTML))
+
         # Agora, extrai as variáveis de dentro desse dicionário
         bucket = clean_csv_output.get("bucket", BUCKET)
-        propositions = clean_csv_output.get("propositions", [])
+        if clean_csv_output.get("manifest_key"):
+            propositions = ler_manifesto(bucket, clean_csv_output["manifest_key"])
+        else:
+            # Compatibilidade com execuções que ainda passam a lista no evento
+            propositions = clean_csv_output.get("propositions", [])
+
+        output_key = manifesto_key("propositions")
 
         if not propositions:
             print("⚠️ Nenhuma proposição recebida para processar.")
-            return {"bucket": bucket, "propositions": []}
-
-        print(f"📦 Processando {len(propositions)} proposições...")
-
-        for idx, prop in enumerate(propositions, start=1):
-            nome = slugify(prop.get("Proposições", f"desconhecida_{uuid.uuid4()}"))
-
-            try:
-                print(f"({idx}/{len(propositions)}) ▶️ {nome}")
-                resultado = fetch_individual_project(prop)
-
-                html_content = resultado.get("html")
-                texto = resultado.get("texto")
-
-                # 🔹 Salvar HTML sempre
-                if html_content:
-                    html_key = f"propositions/{nome}/page.html"
-                    s3.put_object(
-                        Bucket=bucket,
-                        Key=html_key,
-                        Body=html_content.encode("utf-8"),
-                        ContentType="text/html"
-                    )
-                else:
-                    html_key = None
-
-                # 🔹 Salvar texto apenas se existir
-                if texto:
-                    txt_key = f"propositions/{nome}/inteiro_teor.txt"
-                    s3.put_object(
-                        Bucket=bucket,
-                        Key=txt_key,
-                        Body=texto.encode("utf-8"),
-                        ContentType="text/plain"
-                    )
-                    prop["inteiro_teor_key"] = txt_key
-                    print(f"✅ Texto salvo em s3://{bucket}/{txt_key}")
-                else:
-                    prop["inteiro_teor_key"] = None
-
-            except Exception as e:
-                print(f"❌ Erro ao processar {nome}: {e}")
-                prop["inteiro_teor_key"] = None
-
-        # ✅ Retorna a mesma lista, mas enriquecida
-        # TODO: CORRIGIR SAIDA
+            salvar_manifesto(bucket, output_key, [])
+            return {"bucket": bucket, "manifest_key": output_key, "count": 0}
+
+        total = len(propositions)
+        workers = max(1, min(MAX_WORKERS, total))
+        print(f"📦 Processando {total} proposições com {workers} worker(s)...")
+
+        # Sessão única com pool de conexões, compartilhada entre as threads e mantida entre invocações
+        session = sessao_http("camara", lambda: criar_sessao(pool_size=MAX_WORKERS))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # executor.map preserva a ordem original das proposições
+            propositions = list(executor.map(
+                lambda args: processar_proposicao(args[1], bucket, session, args[0], total, salvar_html),
+                enumerate(propositions, start=1)
+            ))
+
+        # ✅ Salva a mesma lista, mas enriquecida, e retorna apenas a key do manifesto
+        total = salvar_manifesto(bucket, output_key, propositions)
         return {
             "bucket": bucket,
-            "propositions": propositions
+            "manifest_key": output_key,
+            "count": total
             }
 
     except Exception as e:
         print(f"❌ Erro no handler fetch_individual_project: {e}")
-        raise
\ No newline at end of file
+        raise
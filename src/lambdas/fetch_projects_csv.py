@@ -1,20 +1,37 @@
 import os
 import json
-import boto3
-from services.fetch_projects_csv_service import fetch_projects_csv
+from datetime import datetime
+from services.fetch_projects_csv_service import fetch_projects_csv, fetch_projects_csv_incremental
+from services.resource_cache_service import cliente_boto3, relatar_cache
+from services.metrics_service import metricas_lambda
 
-s3 = boto3.client("s3")
+s3 = cliente_boto3("s3")
 BUCKET = os.getenv("S3_BUCKET_NAME")
+# "incremental" baixa só a janela de datas; "completo" baixa a página 1 inteira do export
+CSV_FETCH_MODE = os.getenv("CSV_FETCH_MODE", "incremental")
 
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
     """
     Handler da Lambda responsável por baixar o CSV da Câmara e salvar no S3.
+    No modo incremental aceita "data_inicio"/"data_fim" (dd/mm/yyyy) no evento;
+    por padrão busca as proposições de ontem.
     """
     try:
         caminho_local = "/tmp/proposicoes.csv"
 
         # 📥 Chama o service para baixar o CSV localmente
-        fetch_projects_csv(caminho_arquivo=caminho_local)
+        if CSV_FETCH_MODE == "incremental":
+            data_inicio = event.get("data_inicio") if isinstance(event, dict) else None
+            data_fim = event.get("data_fim") if isinstance(event, dict) else None
+            fetch_projects_csv_incremental(
+                data_inicio=datetime.strptime(data_inicio, "%d/%m/%Y").date() if data_inicio else None,
+                data_fim=datetime.strptime(data_fim, "%d/%m/%Y").date() if data_fim else None,
+                caminho_arquivo=caminho_local
+            )
+        else:
+            fetch_projects_csv(caminho_arquivo=caminho_local)
 
         # 🔼 Envia para o S3
         s3_key = f"data/raw/proposicoes.csv"
@@ -23,10 +40,14 @@ def lambda_handler(event, context):
         print(f"✅ CSV salvo em s3://{BUCKET}/{s3_key}")
 
         # Retorna para o próximo passo da Step Function
-        return {
+        resultado = {
             "bucket": BUCKET,
             "key": s3_key,
         }
+        # Data explícita (reprocessamento): o CleanCSV filtra a mesma data, e não "ontem"
+        if CSV_FETCH_MODE == "incremental" and data_inicio:
+            resultado["data_busca"] = data_inicio
+        return resultado
 
     except Exception as e:
         print(f"❌ Erro no handler download_csv: {e}")
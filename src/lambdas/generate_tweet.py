@@ -1,30 +1,133 @@
 import os
-import boto3
 import json
-from services.generate_tweet_service import gerar_resumo
+import asyncio
+from datetime import date
+from openai import AsyncOpenAI
+from services.generate_tweet_service import gerar_resumo, gerar_resumo_async
+from services.rate_limit_service import ControleAIMD
+from services.manifest_service import ler_manifesto
+from services.pending_posts_service import registrar_pendente
+from services.slug_service import slug_proposicao
+from services.idempotency_service import ja_processado, marcar_processado, ETAPA_GENERATE
+from services.resource_cache_service import cliente_boto3, obter_segredo, relatar_cache
+from services.metrics_service import metricas_lambda
 
 # CLients
-s3_client = boto3.client("s3")
-secrets_manager_client = boto3.client("secretsmanager")
+s3_client = cliente_boto3("s3")
 # Variables
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 SECRET_NAME = os.getenv("OPENAI_API_KEY")
 
 def get_openai_key() -> str:
-    """Busca a chave da API do Secrets Manager."""
+    """Busca a chave da API do Secrets Manager (em cache entre invocações, com TTL)."""
     try:
-        response = secrets_manager_client.get_secret_value(SecretId=SECRET_NAME)
-        secret = json.loads(response['SecretString'])
-        return secret['OPENAI_API_KEY']
+        return obter_segredo(SECRET_NAME)['OPENAI_API_KEY']
     except Exception as e:
         print(f"Erro ao buscar o segredo '{SECRET_NAME}': {e}")
         raise
 
 
+def ler_texto(proposition_key: str) -> str:
+    s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=proposition_key)
+    return s3_object['Body'].read().decode('utf-8')
+
+
+def salvar_post(proposition_key: str, post_data_json: dict, data: date = None) -> str:
+    """
+    Salva o post_data.json ao lado do inteiro_teor.txt, registra o post no índice
+    de pendentes do dia (lido pelo scheduler) e retorna a key. "data" troca o dia
+    do índice (o modo batch registra no dia da submissão); padrão: hoje.
+    """
+    post_data_key = proposition_key.replace("/inteiro_teor.txt", "/post_data.json")
+    s3_client.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=post_data_key,
+        Body=json.dumps(post_data_json, ensure_ascii=False, indent=2).encode('utf-8'),
+        ContentType="application/json"
+    )
+    registrar_pendente(S3_BUCKET_NAME, post_data_key, data)
+    return post_data_key
+
+
+async def gerar_proposicao_async(prop: dict, client: AsyncOpenAI, controle: ControleAIMD) -> dict:
+    """
+    Mesmo fluxo do modo unitário para uma proposição, dentro do event loop.
+    Erros ficam isolados na própria proposição.
+    """
+    proposition_key = prop.get('inteiro_teor_key')
+    if not proposition_key:
+        return {"statusCode": 400, "proposition": prop.get('Proposições'), "error": "Sem 'inteiro_teor_key'."}
+
+    slug = prop.get('Proposições_slugified') or slug_proposicao(prop.get('Proposições', ''))
+    marcador = await asyncio.to_thread(ja_processado, S3_BUCKET_NAME, ETAPA_GENERATE, slug)
+    if marcador:
+        return {"statusCode": 200, "proposition": prop['Proposições'], "tweet_key": marcador['tweet_key'], "skipped": True}
+
+    try:
+        full_text = await asyncio.to_thread(ler_texto, proposition_key)
+        post_data_json = await gerar_resumo_async(
+            client,
+            controle,
+            text=full_text,
+            numero_pec=prop['Proposições'],
+            autor=prop['Autor'],
+            partido=prop['Partido'],
+            uf=prop['UF'],
+            ementa=prop['Ementa'],
+            link=prop['Link'],
+            bucket=S3_BUCKET_NAME
+        )
+        post_data_key = await asyncio.to_thread(salvar_post, proposition_key, post_data_json)
+        await asyncio.to_thread(marcar_processado, S3_BUCKET_NAME, ETAPA_GENERATE, slug, {"tweet_key": post_data_key})
+        print(f"✅ JSON de {prop['Proposições']} salvo em s3://{S3_BUCKET_NAME}/{post_data_key}")
+        return {"statusCode": 200, "proposition": prop['Proposições'], "tweet_key": post_data_key}
+
+    except Exception as e:
+        print(f"Erro ao processar {prop.get('Proposições', 'proposição desconhecida')}: {str(e)}")
+        return {"statusCode": 500, "proposition": prop.get('Proposições'), "error": str(e)}
+
+
+async def gerar_varias_async(propositions: list[dict]) -> list[dict]:
+    """
+    Gera os posts de todas as proposições concorrentemente com um AsyncOpenAI.
+    A concorrência é ajustada pelo ControleAIMD a partir dos 429 e dos headers de rate limit.
+    O client assíncrono é criado por invocação: ele fica preso ao event loop do asyncio.run.
+    """
+    controle = ControleAIMD()
+    # max_retries=0: os 429 vão para o ControleAIMD em vez de serem repetidos pelo SDK
+    async with AsyncOpenAI(api_key=get_openai_key(), max_retries=0) as client:
+        resultados = await asyncio.gather(*(gerar_proposicao_async(p, client, controle) for p in propositions))
+
+    print(f"📊 Concorrência: pico {controle.estatisticas['pico']}, limite final {controle.limite:.1f}, "
+          f"{controle.estatisticas['throttles']} 429(s).")
+    return resultados
+
+
+def gerar_varias(event: dict) -> dict:
+    """
+    Modo assíncrono: recebe {"propositions": [...]} ou o manifesto {"bucket", "manifest_key"}
+    e gera todas as proposições em uma única invocação.
+    """
+    propositions = event.get("propositions")
+    if propositions is None:
+        propositions = ler_manifesto(event.get("bucket", S3_BUCKET_NAME), event["manifest_key"])
+
+    print(f"📦 Gerando {len(propositions)} proposições no modo assíncrono...")
+    resultados = asyncio.run(gerar_varias_async(propositions))
+    erros = sum(1 for r in resultados if r["statusCode"] != 200)
+    return {"statusCode": 200, "count": len(resultados), "erros": erros, "results": resultados}
+
+
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
     """
-    Lambda handler para gerar um tweet para uma única proposição.
+    Lambda handler para gerar um tweet para uma única proposição (item do Map).
+    Com "propositions" ou "manifest_key" no evento, gera várias proposições no modo assíncrono.
     """
+    if "propositions" in event or "manifest_key" in event:
+        return gerar_varias(event)
+
     print(f"Recebido evento para processamento: {event}")
 
     # Extrai informações da proposição vinda do estado Map
@@ -38,10 +141,22 @@ def lambda_handler(event, context):
             "event": event
         }
 
+    slug = event.get('Proposições_slugified') or slug_proposicao(event.get('Proposições', ''))
+
+    # 0. Pula proposições que já tiveram o post gerado (re-run ou execuções sobrepostas)
+    marcador = ja_processado(S3_BUCKET_NAME, ETAPA_GENERATE, slug)
+    if marcador:
+        print(f"Post de {slug} já gerado em s3://{S3_BUCKET_NAME}/{marcador['tweet_key']}, pulando.")
+        return {
+            "statusCode": 200,
+            "proposition": event.get('Proposições'),
+            "tweet_key": marcador['tweet_key'],
+            "skipped": True
+        }
+
     try:
         # 1. Lê o texto da proposição do S3
-        s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=proposition_key)
-        full_text = s3_object['Body'].read().decode('utf-8')
+        full_text = ler_texto(proposition_key)
 
         # 2. Chama a função para gerar o tweet
         post_data_json = gerar_resumo(
@@ -52,21 +167,16 @@ def lambda_handler(event, context):
             partido=event['Partido'],
             uf=event['UF'],
             ementa=event['Ementa'],
-            link=event['Link']
+            link=event['Link'],
+            bucket=S3_BUCKET_NAME
         )
         
         print(f"JSON gerado com sucesso para {event['Proposições']}")
         # 3 Salvar tweet em s3
-        post_data_key = proposition_key.replace("/inteiro_teor.txt", "/post_data.json")
-
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME, 
-            Key=post_data_key, 
-            Body=json.dumps(post_data_json, ensure_ascii=False, indent=2).encode('utf-8'),
-            ContentType="application/json"
-        )
+        post_data_key = salvar_post(proposition_key, post_data_json)
 
         print(f"JSON salvo em s3://{S3_BUCKET_NAME}/{post_data_key}")
+        marcar_processado(S3_BUCKET_NAME, ETAPA_GENERATE, slug, {"tweet_key": post_data_key})
 
 
         # 4. Retorna o resultado
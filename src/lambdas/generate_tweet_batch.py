@@ -0,0 +1,156 @@
+import os
+import json
+from datetime import date
+from lambdas.generate_tweet import get_openai_key, salvar_post
+from services.generate_tweet_service import MODELO, PROMPT_VERSION, ThreadFormattedResponse, chave_resumo, montar_post
+from services.batch_generate_service import montar_requisicao, submeter_batch, consultar_batch, ler_resultados, STATUS_FINAIS
+from services.llm_cache_service import ler_cache, salvar_cache
+from services.manifest_service import ler_manifesto
+from services.slug_service import slug_proposicao
+from services.pending_posts_service import dia_pendente
+from services.idempotency_service import ja_processado, marcar_processado, ETAPA_GENERATE
+from services.resource_cache_service import cliente_boto3, cliente_openai, relatar_cache
+from services.metrics_service import metricas_lambda
+
+# CLients
+s3_client = cliente_boto3("s3")
+# Variables
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
+
+
+def pendentes_key(batch_id: str) -> str:
+    """Key com as proposições aguardando o resultado de um batch."""
+    return f"batches/{batch_id}/pendentes.json"
+
+
+def metadados_post(prop: dict) -> dict:
+    return dict(
+        numero_pec=prop['Proposições'],
+        autor=prop['Autor'],
+        partido=prop['Partido'],
+        uf=prop['UF'],
+        link=prop['Link']
+    )
+
+
+def submeter(event: dict) -> dict:
+    """
+    Lê o manifesto do dia, resolve o que já está no cache/índice e envia o restante
+    em um único batch para a OpenAI. Retorna o dia da submissão ("dia_submissao"),
+    que a Step Function repassa ao collect para os posts entrarem nos pendentes desse dia.
+    """
+    dia_submissao = dia_pendente()
+    propositions = ler_manifesto(event.get("bucket", S3_BUCKET_NAME), event["manifest_key"])
+
+    requisicoes = []
+    pendentes = {}
+    reaproveitados = 0
+
+    for prop in propositions:
+        proposition_key = prop.get('inteiro_teor_key')
+        if not proposition_key:
+            continue
+
+        slug = prop.get('Proposições_slugified') or slug_proposicao(prop['Proposições'])
+        if ja_processado(S3_BUCKET_NAME, ETAPA_GENERATE, slug):
+            continue
+
+        s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=proposition_key)
+        full_text = s3_object['Body'].read().decode('utf-8')
+        chave = chave_resumo(prop['Ementa'], full_text)
+
+        # ♻️ Resposta já em cache: salva o post direto, sem passar pelo batch
+        em_cache = ler_cache(S3_BUCKET_NAME, chave)
+        if em_cache:
+            parsed = ThreadFormattedResponse.model_construct(**em_cache)
+            post = montar_post(parsed, **metadados_post(prop)).model_dump()
+            post_data_key = salvar_post(proposition_key, post)
+            marcar_processado(S3_BUCKET_NAME, ETAPA_GENERATE, slug, {"tweet_key": post_data_key})
+            reaproveitados += 1
+            continue
+
+        requisicoes.append(montar_requisicao(slug, prop['Ementa'], full_text))
+        pendentes[slug] = {**metadados_post(prop), "inteiro_teor_key": proposition_key, "chave": chave}
+
+    print(f"{len(requisicoes)} proposições para o batch, {reaproveitados} reaproveitadas do cache.")
+    if not requisicoes:
+        return {"status": "completed", "batch_id": None, "reaproveitados": reaproveitados, "dia_submissao": dia_submissao}
+
+    client = cliente_openai(get_openai_key())
+    batch = submeter_batch(client, requisicoes, metadados={"manifest_key": event["manifest_key"]})
+
+    s3_client.put_object(
+        Bucket=S3_BUCKET_NAME,
+        Key=pendentes_key(batch.id),
+        Body=json.dumps(pendentes, ensure_ascii=False).encode('utf-8'),
+        ContentType="application/json"
+    )
+    return {"status": batch.status, "batch_id": batch.id, "reaproveitados": reaproveitados, "dia_submissao": dia_submissao}
+
+
+def consultar(event: dict) -> dict:
+    """Consulta o status do batch (usado no loop Wait/Choice da Step Function)."""
+    if not event.get("batch_id"):
+        return {**event, "status": "completed"}
+
+    client = cliente_openai(get_openai_key())
+    batch = consultar_batch(client, event["batch_id"])
+    return {**event, "status": batch.status, "finalizado": batch.status in STATUS_FINAIS}
+
+
+def coletar(event: dict) -> dict:
+    """
+    Baixa os resultados do batch e distribui em um post_data.json por proposição.
+    Os posts são registrados nos pendentes do dia da submissão, e não do dia da coleta:
+    um batch que termina depois do horário do scheduler ainda entra no agendamento
+    daquele dia (ou do próximo ciclo que ler esse dia).
+    """
+    if not event.get("batch_id"):
+        return {"statusCode": 200, "posts": 0, "erros": 0}
+    dia_submissao = date.fromisoformat(event["dia_submissao"]) if event.get("dia_submissao") else None
+
+    client = cliente_openai(get_openai_key())
+    batch = consultar_batch(client, event["batch_id"])
+
+    s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=pendentes_key(batch.id))
+    pendentes = json.loads(s3_object['Body'].read().decode('utf-8'))
+    resultados = ler_resultados(client, batch)
+
+    posts, erros = 0, 0
+    for slug, pendente in pendentes.items():
+        parsed = resultados.get(slug)
+        if parsed is None or isinstance(parsed, Exception):
+            print(f"Erro ao gerar post de {slug}: {parsed or 'sem resultado no batch'}")
+            erros += 1
+            continue
+
+        post = montar_post(
+            parsed,
+            **{k: pendente[k] for k in ("numero_pec", "autor", "partido", "uf", "link")}
+        ).model_dump()
+        post_data_key = salvar_post(pendente["inteiro_teor_key"], post, dia_submissao)
+        salvar_cache(S3_BUCKET_NAME, pendente["chave"], post, {"modelo": MODELO, "prompt_version": PROMPT_VERSION})
+        marcar_processado(S3_BUCKET_NAME, ETAPA_GENERATE, slug, {"tweet_key": post_data_key})
+        posts += 1
+
+    print(f"Batch {batch.id}: {posts} posts salvos, {erros} erros.")
+    return {"statusCode": 200, "batch_id": batch.id, "posts": posts, "erros": erros}
+
+
+@metricas_lambda
+@relatar_cache
+def lambda_handler(event, context):
+    """
+    Modo batch da geração de posts, em três ações (campo 'action' do evento):
+    - "submit": recebe {"bucket", "manifest_key"} e cria o batch com todas as proposições do dia
+    - "status": recebe {"batch_id", "dia_submissao"} e retorna o status atual
+    - "collect": recebe {"batch_id", "dia_submissao"} e salva um post_data.json por proposição
+    """
+    print(f"Recebido evento para processamento em batch: {event}")
+
+    acoes = {"submit": submeter, "status": consultar, "collect": coletar}
+    try:
+        return acoes[event["action"]](event)
+    except Exception as e:
+        print(f"Erro no modo batch ({event.get('action')}): {str(e)}")
+        raise e
@@ -1,28 +1,28 @@
 import os
-import boto3
 import json
 import logging
-import tweepy
-from services.post_tweet_service import create_bluesky_post
+from services.fanout_service import publicar_em_plataformas, duracao_maxima
+from services.post_journal_service import JournalPost
+from services.post_queue_service import obter_fila, drenar_fila
 from datetime import datetime, timezone
+from services.resource_cache_service import cliente_boto3, obter_segredo, relatar_cache
+from services.metrics_service import metricas_lambda
 
 print(datetime.now(timezone.utc))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
-secrets_manager_client = boto3.client("secretsmanager")
-s3_client = boto3.client("s3")
+s3_client = cliente_boto3("s3")
 
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 X_SECRET_NAME = os.getenv("X_SECRET_NAME")
 BLUESKY_SECRET_NAME = os.getenv("BLUESKY_SECRET_NAME")
 
 def get_x_credentials() -> dict:
-    """Busca as credenciais do X no Secrets Manager e retorna como um dicionário."""
+    """Busca as credenciais do X no Secrets Manager (em cache entre invocações) e retorna como um dicionário."""
     try:
-        response = secrets_manager_client.get_secret_value(SecretId=X_SECRET_NAME)
-        secrets = json.loads(response['SecretString'])
+        secrets = obter_segredo(X_SECRET_NAME)
         logger.info("Credenciais do X obtidas do Secrets Manager com sucesso.")
         return secrets
     except Exception as e:
@@ -31,35 +31,74 @@ def get_x_credentials() -> dict:
 
 
 def get_bluesky_credentials() -> dict:
-    """Busca as credenciais do Bluesky no Secrets Manager e retorna como um dicionário."""
+    """Busca as credenciais do Bluesky no Secrets Manager (em cache entre invocações) e retorna como um dicionário."""
     try:
-        response = secrets_manager_client.get_secret_value(SecretId=BLUESKY_SECRET_NAME)
-        secrets = json.loads(response['SecretString'])
+        secrets = obter_segredo(BLUESKY_SECRET_NAME)
         logger.info("Credenciais do Bluesky obtidas do Secrets Manager com sucesso.")
         return secrets
     except Exception as e:
         logger.error(f"Erro ao obter credenciais do Bluesky do Secrets Manager: {e}")
         raise
 
+# Carregadores de credenciais por plataforma (chamados só para as plataformas ativas)
+CREDENCIAIS = {"bluesky": get_bluesky_credentials, "x": get_x_credentials}
+
+
+def publicar(s3_key: str) -> dict:
+    """
+    Lê o post_data.json e publica a thread em todas as plataformas ao mesmo tempo.
+    O progresso fica no post_journal.json ao lado do post: se alguma plataforma falhar,
+    o erro é propagado para que o retry (EventBridge / fila) retome só o que faltou.
+    """
+    s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
+    post_data_json = json.loads(s3_object['Body'].read().decode('utf-8'))
+
+    result = publicar_em_plataformas(
+        content=post_data_json,
+        credenciais=CREDENCIAIS,
+        bucket=S3_BUCKET_NAME,
+        journal=JournalPost(S3_BUCKET_NAME, s3_key)
+    )
+    logger.info(f"Postagem de {s3_key} finalizada com resultado: {result}")
+    falhas = {p: r for p, r in result["plataformas"].items() if r["status"] != "ok"}
+    if falhas:
+        raise RuntimeError(f"Publicação de {s3_key} incompleta (retomável pelo journal): {falhas}")
+    return result
+
+
+def drenar(context) -> dict:
+    """
+    Modo fila: publica os posts vencidos da fila do dia, em ordem, reaproveitando
+    as mesmas credenciais e sessões para todos eles.
+    """
+    tempo_restante = (lambda: context.get_remaining_time_in_millis() / 1000) if context else (lambda: float("inf"))
+
+    result = drenar_fila(obter_fila(), publicar, tempo_restante, duracao_publicacao_seconds=duracao_maxima())
+    logger.info(f"Drenagem finalizada: {len(result['publicados'])} post(s) publicado(s).")
+    if result["erro"]:
+        raise RuntimeError(f"Falha na drenagem da fila: {result['erro']}")
+    return {"statusCode": 200, "body": json.dumps(result)}
+
+
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
+    """
+    Publica o post do evento {"s3_key": ...} (agendamento one-time) ou, com
+    {"mode": "drain"}, drena a fila de posts do dia (ver post_queue_service).
+    """
     try:
-        # 1. Obter as dependências (credenciais e conteúdo)
-        credentials = get_x_credentials()
+        if event.get("mode") == "drain":
+            return drenar(context)
+
+        # 1. Obter o post do evento (as credenciais são carregadas por plataforma)
         s3_key = event.get("s3_key")
         
         if not s3_key:
             raise ValueError("O evento não contém a chave 's3_key'.")
             
-        s3_object = s3_client.get_object(Bucket=S3_BUCKET_NAME, Key=s3_key)
-        post_data_json = json.loads(s3_object['Body'].read().decode('utf-8'))
-        
-        # 2. Injetar as dependências no serviço
-        result = create_bluesky_post(
-            credentials=credentials, 
-            content=post_data_json
-        )
-        
-        logger.info(f"Postagem finalizada com resultado: {result}")
+        # 2. Publicar em todas as plataformas
+        result = publicar(s3_key)
         return {"statusCode": 200, "body": json.dumps(result)}
 
     except Exception as e:
@@ -0,0 +1,27 @@
+import os
+from services.manifest_service import ler_manifesto
+from services.history_service import salvar_historico
+from services.resource_cache_service import relatar_cache
+from services.metrics_service import metricas_lambda
+
+BUCKET = os.getenv("S3_BUCKET_NAME")
+
+
+@metricas_lambda
+@relatar_cache
+def lambda_handler(event, context):
+    """
+    Grava no histórico colunar (history/proposicoes/dt=YYYY-MM-DD/) as proposições
+    limpas do manifesto do CleanCSV. Função separada porque só ela carrega o pyarrow
+    (build próprio, ver Makefile); as demais continuam sem essa dependência.
+    Recebe: {"bucket": BUCKET, "manifest_key": manifest_key}
+    Retorna: {"bucket": BUCKET, "gravadas": {data: linhas}}
+    """
+    try:
+        bucket = event.get("bucket", BUCKET)
+        linhas = ler_manifesto(bucket, event["manifest_key"])
+        return {"bucket": bucket, "gravadas": salvar_historico(bucket, linhas)}
+
+    except Exception as e:
+        print(f"❌ Erro no handler save_history: {e}")
+        raise e
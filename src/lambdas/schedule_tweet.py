@@ -4,7 +4,11 @@ import os
 import logging
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from services.schedule_tweet_service import list_pending_tweets_for_date, create_schedules
+from services.schedule_tweet_service import list_pending_tweets_for_date, scan_pending_tweets_for_date, create_schedules
+from services.post_queue_service import obter_fila, enfileirar_posts
+from services.idempotency_service import ja_processado, marcar_processado, ETAPA_SCHEDULE
+from services.resource_cache_service import relatar_cache
+from services.metrics_service import metricas_lambda
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
@@ -13,10 +17,26 @@ logger = logging.getLogger()
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 POSTER_LAMBDA_ARN = os.getenv("POSTER_LAMBDA_ARN")
 SCHEDULER_ROLE_ARN = os.getenv("SCHEDULER_ROLE_ARN")
+# "schedules": um agendamento one-time por post; "queue": fila drenada pela PosterLambda
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "schedules")
+POST_INTERVAL_MINUTES = int(os.getenv("POST_INTERVAL_MINUTES", "15"))
+# Dias anteriores cujos pendentes ainda não agendados também entram (ex: batch coletado depois das 9h)
+PENDING_LOOKBACK_DAYS = int(os.getenv("PENDING_LOOKBACK_DAYS", "1"))
 
+def slug_da_key(key: str) -> str:
+    """Extrai o slug da proposição de 'propositions/<slug>/post_data.json'."""
+    return key.split("/")[1]
+
+
+@metricas_lambda
+@relatar_cache
 def lambda_handler(event, context):
     """
     Handler invocado diariamente para encontrar e agendar tweets do dia anterior.
+    O evento pode trazer "date" (YYYY-MM-DD) para agendar outro dia e "fullScan": true
+    para varrer propositions/ em vez do índice de pendentes (posts anteriores ao índice).
+    Sem "date", os pendentes dos PENDING_LOOKBACK_DAYS dias anteriores que ainda não foram
+    agendados também entram (posts de um batch coletado depois da execução do dia).
     """
     logger.info("SchedulerLambda iniciada.")
     
@@ -29,6 +49,8 @@ def lambda_handler(event, context):
         
         # Calcula a data de ontem TODO: ajustar para o dia presente
         yesterday_local = today_local 
+        if event and event.get("date"):
+            yesterday_local = datetime.strptime(event["date"], "%Y-%m-%d").date()
         
         # 2. Calcular o início e o fim do dia de ONTEM no fuso local
         start_of_yesterday_local = datetime(
@@ -40,12 +62,29 @@ def lambda_handler(event, context):
         start_utc = start_of_yesterday_local.astimezone(ZoneInfo("UTC"))
         end_utc = end_of_yesterday_local.astimezone(ZoneInfo("UTC"))
         
-        # 2. Encontrar tweets pendentes do dia anterior
-        pending_tweets = list_pending_tweets_for_date(
-            bucket_name=S3_BUCKET_NAME,
-            start_utc=start_utc,
-            end_utc=end_utc
-        )
+        # 2. Encontrar tweets pendentes do dia anterior (índice do dia; varredura só sob demanda)
+        if event and event.get("fullScan"):
+            pending_tweets = scan_pending_tweets_for_date(
+                bucket_name=S3_BUCKET_NAME,
+                start_utc=start_utc,
+                end_utc=end_utc
+            )
+        else:
+            # Sem data explícita, relê também os dias anteriores: posts registrados depois
+            # da execução daquele dia ainda não têm marcador e são agendados agora
+            dias_anteriores = 0 if event and event.get("date") else PENDING_LOOKBACK_DAYS
+            pending_tweets = []
+            for atraso in range(dias_anteriores, -1, -1):
+                pending_tweets.extend(list_pending_tweets_for_date(
+                    bucket_name=S3_BUCKET_NAME,
+                    target_date=yesterday_local - timedelta(days=atraso)
+                ))
+
+        # Remove posts já agendados por uma execução anterior (evita postagens duplicadas)
+        pending_tweets = [
+            key for key in pending_tweets
+            if not ja_processado(S3_BUCKET_NAME, ETAPA_SCHEDULE, slug_da_key(key))
+        ]
 
         if not pending_tweets:
             print("Nenhum tweet novo para agendar. Finalizando.")
@@ -58,15 +97,26 @@ def lambda_handler(event, context):
         start_time_local = now_local + timedelta(minutes=5)
         print(f"Hora atual: {now_local.isoformat()}. O primeiro agendamento começará a partir de {start_time_local.isoformat()}")
         
-        # 4. Chamar o serviço para criar os agendamentos
-        result = create_schedules(
-            tweet_keys=pending_tweets,
-            start_time=start_time_local,
-            interval_minutes=15, # Postar a cada X minutos 
-            poster_lambda_arn=POSTER_LAMBDA_ARN,
-            scheduler_role_arn=SCHEDULER_ROLE_ARN
-        )
+        # 4. Chamar o serviço para criar os agendamentos (ou enfileirar os posts)
+        if SCHEDULER_MODE == "queue":
+            result = {"agendados": enfileirar_posts(
+                obter_fila(),
+                pending_tweets,
+                start_time=start_time_local,
+                interval_minutes=POST_INTERVAL_MINUTES
+            )}
+        else:
+            result = create_schedules(
+                tweet_keys=pending_tweets,
+                start_time=start_time_local,
+                interval_minutes=POST_INTERVAL_MINUTES, # Postar a cada X minutos 
+                poster_lambda_arn=POSTER_LAMBDA_ARN,
+                scheduler_role_arn=SCHEDULER_ROLE_ARN
+            )
         
+        for key in result["agendados"]:
+            marcar_processado(S3_BUCKET_NAME, ETAPA_SCHEDULE, slug_da_key(key), {"s3_key": key})
+
         print(f"Processo de agendamento finalizado: {result}")
         return {"status": "success", "body": result}
 
@@ -0,0 +1,86 @@
+import time
+import random
+import struct
+import base64
+import hashlib
+import threading
+
+# CID v1 de registros do atproto: codec dag-cbor (0x71) + multihash sha2-256 (0x12, 32 bytes)
+CID_VERSAO = 0x01
+CODEC_DAG_CBOR = 0x71
+MULTIHASH_SHA2_256 = 0x12
+
+ALFABETO_TID = "234567abcdefghijklmnopqrstuvwxyz"
+
+_ultimo_tid = 0
+_clock_id = random.getrandbits(10)
+_lock_tid = threading.Lock()
+
+
+def _cabecalho(tipo_maior: int, valor: int) -> bytes:
+    """Cabeçalho CBOR (major type + argumento) no menor tamanho possível, como exige o DAG-CBOR."""
+    if valor < 24:
+        return bytes([tipo_maior << 5 | valor])
+    if valor < 0x100:
+        return bytes([tipo_maior << 5 | 24, valor])
+    if valor < 0x10000:
+        return bytes([tipo_maior << 5 | 25]) + struct.pack(">H", valor)
+    if valor < 0x100000000:
+        return bytes([tipo_maior << 5 | 26]) + struct.pack(">I", valor)
+    return bytes([tipo_maior << 5 | 27]) + struct.pack(">Q", valor)
+
+
+def codificar_dag_cbor(valor) -> bytes:
+    """
+    Codifica um registro (dict/list/str/int/bool/None/bytes) em DAG-CBOR canônico:
+    inteiros e tamanhos no menor formato e chaves de mapa ordenadas por tamanho e
+    depois bytewise. Floats não são aceitos no modelo de dados do atproto.
+    """
+    if valor is None:
+        return b"\xf6"
+    if valor is True:
+        return b"\xf5"
+    if valor is False:
+        return b"\xf4"
+    if isinstance(valor, int):
+        return _cabecalho(0, valor) if valor >= 0 else _cabecalho(1, -1 - valor)
+    if isinstance(valor, bytes):
+        return _cabecalho(2, len(valor)) + valor
+    if isinstance(valor, str):
+        dados = valor.encode("utf-8")
+        return _cabecalho(3, len(dados)) + dados
+    if isinstance(valor, (list, tuple)):
+        return _cabecalho(4, len(valor)) + b"".join(codificar_dag_cbor(item) for item in valor)
+    if isinstance(valor, dict):
+        chaves = sorted((k.encode("utf-8"), k) for k in valor)
+        chaves.sort(key=lambda par: len(par[0]))
+        return _cabecalho(5, len(valor)) + b"".join(
+            codificar_dag_cbor(k) + codificar_dag_cbor(valor[k]) for _, k in chaves
+        )
+    raise TypeError(f"Tipo não suportado em DAG-CBOR: {type(valor).__name__}")
+
+
+def cid_registro(registro: dict) -> str:
+    """CID (v1, dag-cbor, sha2-256) do registro, em base32 minúsculo com prefixo multibase 'b'."""
+    digest = hashlib.sha256(codificar_dag_cbor(registro)).digest()
+    cid = bytes([CID_VERSAO, CODEC_DAG_CBOR, MULTIHASH_SHA2_256, len(digest)]) + digest
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
+
+
+def gerar_tid() -> str:
+    """
+    TID (timestamp identifier) para usar como rkey: 53 bits de microssegundos desde a
+    epoch + 10 bits de clock id, em base32 ordenável (13 caracteres).
+    Estritamente crescente dentro do processo, para a ordem da thread ser preservada.
+    """
+    global _ultimo_tid
+    with _lock_tid:
+        micros = max(time.time_ns() // 1000, _ultimo_tid + 1)
+        _ultimo_tid = micros
+
+    valor = (micros << 10) | _clock_id
+    caracteres = []
+    for _ in range(13):
+        caracteres.append(ALFABETO_TID[valor & 0x1F])
+        valor >>= 5
+    return "".join(reversed(caracteres))
@@ -0,0 +1,138 @@
+import io
+import json
+from openai import OpenAI
+from services.generate_tweet_service import (
+    MODELO,
+    TEMPERATURA,
+    SYSTEM_PROMPT,
+    ThreadFormattedResponse,
+    montar_user_prompt,
+)
+from services.metrics_service import registrar_uso_openai
+
+ENDPOINT = "/v1/responses"
+# Status finais de um batch na OpenAI
+STATUS_FINAIS = {"completed", "failed", "expired", "cancelled"}
+
+
+def schema_estrito(schema: dict) -> dict:
+    """
+    Ajusta um JSON schema do pydantic às regras do structured output em modo strict:
+    todo objeto fecha additionalProperties e lista todas as propriedades em required.
+    """
+    if isinstance(schema, list):
+        return [schema_estrito(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    schema = {chave: schema_estrito(valor) for chave, valor in schema.items()}
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema["properties"])
+    return schema
+
+
+def formato_resposta() -> dict:
+    """
+    Structured output equivalente ao text_format=ThreadFormattedResponse do responses.parse,
+    montado a partir do schema do próprio modelo, para o batch e o modo síncrono pedirem
+    o mesmo formato.
+    """
+    return {"format": {
+        "type": "json_schema",
+        "name": ThreadFormattedResponse.__name__,
+        "schema": schema_estrito(ThreadFormattedResponse.model_json_schema()),
+        "strict": True,
+    }}
+
+
+def montar_requisicao(custom_id: str, ementa: str, text: str) -> dict:
+    """Uma linha do arquivo JSONL do batch, equivalente a uma chamada de gerar_resumo."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": MODELO,
+            "input": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": montar_user_prompt(ementa, text)},
+            ],
+            "text": formato_resposta(),
+            "temperature": TEMPERATURA,
+        },
+    }
+
+
+def submeter_batch(client: OpenAI, requisicoes: list[dict], metadados: dict = None):
+    """
+    Envia o arquivo JSONL com todas as requisições e cria o batch.
+    Retorna o objeto Batch da OpenAI.
+    """
+    conteudo = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in requisicoes)
+    arquivo = client.files.create(
+        file=("batch_resumos.jsonl", io.BytesIO(conteudo.encode("utf-8"))),
+        purpose="batch",
+    )
+    batch = client.batches.create(
+        input_file_id=arquivo.id,
+        endpoint=ENDPOINT,
+        completion_window="24h",
+        metadata=metadados,
+    )
+    print(f"📤 Batch {batch.id} criado com {len(requisicoes)} requisições.")
+    return batch
+
+
+def consultar_batch(client: OpenAI, batch_id: str):
+    """Retorna o objeto Batch atualizado."""
+    batch = client.batches.retrieve(batch_id)
+    contagem = batch.request_counts
+    if contagem:
+        print(f"⏳ Batch {batch_id}: {batch.status} ({contagem.completed}/{contagem.total} concluídas)")
+    return batch
+
+
+def _texto_da_resposta(body: dict) -> str:
+    """Extrai o texto (output_text) do corpo de uma resposta da Responses API."""
+    for item in body.get("output", []):
+        if item.get("type") != "message":
+            continue
+        for conteudo in item.get("content", []):
+            if conteudo.get("type") == "output_text":
+                return conteudo["text"]
+    raise ValueError("Resposta sem output_text.")
+
+
+def ler_resultados(client: OpenAI, batch) -> dict:
+    """
+    Baixa o arquivo de saída (e o de erros) do batch.
+    Retorna {custom_id: ThreadFormattedResponse | Exception}.
+    """
+    resultados = {}
+
+    if batch.output_file_id:
+        saida = client.files.content(batch.output_file_id).text
+        for linha in saida.splitlines():
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            custom_id = registro["custom_id"]
+            try:
+                resposta = registro.get("response") or {}
+                if registro.get("error") or resposta.get("status_code") != 200:
+                    raise RuntimeError(registro.get("error") or resposta.get("body"))
+                registrar_uso_openai(resposta["body"].get("usage"))
+                resultados[custom_id] = ThreadFormattedResponse.model_validate_json(
+                    _texto_da_resposta(resposta["body"])
+                )
+            except Exception as e:
+                resultados[custom_id] = e
+
+    if batch.error_file_id:
+        erros = client.files.content(batch.error_file_id).text
+        for linha in erros.splitlines():
+            if linha.strip():
+                registro = json.loads(linha)
+                resultados[registro["custom_id"]] = RuntimeError(registro.get("error") or registro.get("response"))
+
+    return resultados
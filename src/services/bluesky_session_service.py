@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import base64
+import threading
+from botocore.exceptions import ClientError
+from services.resource_cache_service import cliente_boto3, sessao_http
+
+s3_client = cliente_boto3("s3")
+
+BLUESKY_PDS_URL = os.getenv("BLUESKY_PDS_URL", "https://bsky.social")
+# Sessão (accessJwt/refreshJwt) persistida no bucket, junto do restante do estado em state/
+SESSION_KEY = "state/bluesky/session.json"
+# Renova o token um pouco antes de expirar, para não falhar no meio de uma thread
+MARGEM_EXPIRACAO_SECONDS = 60
+# Timeout padrão das chamadas HTTP ao PDS
+TIMEOUT_SECONDS = 30
+
+# Sessão em memória, compartilhada entre invocações da mesma instância (warm start)
+_sessao = None
+_lock = threading.Lock()
+
+
+class SessaoExpiradaError(Exception):
+    """O PDS recusou o token da sessão (ExpiredToken/InvalidToken)."""
+
+
+def expiracao_jwt(token: str) -> float:
+    """Lê o 'exp' (epoch) do payload do JWT, sem validar a assinatura. 0 se não conseguir."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except Exception:
+        return 0
+
+
+def token_valido(token: str) -> bool:
+    return bool(token) and expiracao_jwt(token) - MARGEM_EXPIRACAO_SECONDS > time.time()
+
+
+def token_expirado(resposta) -> bool:
+    """Respostas do PDS que indicam token vencido ou revogado."""
+    if resposta.status_code == 401:
+        return True
+    if resposta.status_code == 400:
+        try:
+            return resposta.json().get("error") in ("ExpiredToken", "InvalidToken")
+        except ValueError:
+            return False
+    return False
+
+
+def carregar_sessao(bucket: str) -> dict | None:
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=SESSION_KEY)
+    except ClientError:
+        return None
+    return json.loads(s3_object["Body"].read().decode("utf-8"))
+
+
+def salvar_sessao(bucket: str, sessao: dict):
+    campos = ("did", "handle", "accessJwt", "refreshJwt")
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=SESSION_KEY,
+        Body=json.dumps({k: sessao.get(k) for k in campos}).encode("utf-8"),
+        ContentType="application/json",
+        ServerSideEncryption="AES256",
+    )
+
+
+def criar_sessao_bluesky(handle: str, app_password: str, timeout: float = TIMEOUT_SECONDS) -> dict:
+    """Login com com.atproto.server.createSession (rate limit baixo: usar só sem refreshJwt válido)."""
+    resp = sessao_http("bluesky").post(
+        f"{BLUESKY_PDS_URL}/xrpc/com.atproto.server.createSession",
+        json={"identifier": handle, "password": app_password},
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    print("🔐 Nova sessão do Bluesky criada (createSession).")
+    return resp.json()
+
+
+def renovar_sessao_bluesky(refresh_jwt: str, timeout: float = TIMEOUT_SECONDS) -> dict:
+    """
+    Troca o refreshJwt por um novo par de tokens (com.atproto.server.refreshSession).
+    O refreshJwt antigo é revogado pelo PDS, por isso a nova sessão precisa ser persistida.
+    """
+    resp = sessao_http("bluesky").post(
+        f"{BLUESKY_PDS_URL}/xrpc/com.atproto.server.refreshSession",
+        headers={"Authorization": f"Bearer {refresh_jwt}"},
+        timeout=timeout,
+    )
+    if token_expirado(resp):
+        raise SessaoExpiradaError(resp.text)
+    resp.raise_for_status()
+    print("♻️ Sessão do Bluesky renovada (refreshSession).")
+    return resp.json()
+
+
+def obter_sessao(credentials: dict, bucket: str = None, forcar_renovacao: bool = False, timeout: float = TIMEOUT_SECONDS) -> dict:
+    """
+    Retorna uma sessão com accessJwt válido, na ordem mais barata:
+    memória (warm start) → sessão salva no S3 → refreshSession → createSession.
+    Sem 'bucket', a sessão fica só em memória.
+    """
+    global _sessao
+
+    with _lock:
+        if _sessao and not forcar_renovacao and token_valido(_sessao.get("accessJwt")):
+            return _sessao
+
+        candidata = _sessao
+        salva = carregar_sessao(bucket) if bucket else None
+        # Outra instância pode ter renovado a sessão: prefere a mais recente
+        if salva and (not candidata or expiracao_jwt(salva.get("refreshJwt", "")) >= expiracao_jwt(candidata.get("refreshJwt", ""))):
+            candidata = salva
+
+        if candidata and not forcar_renovacao and token_valido(candidata.get("accessJwt")):
+            _sessao = candidata
+            return _sessao
+
+        sessao = None
+        if candidata and token_valido(candidata.get("refreshJwt")):
+            try:
+                sessao = renovar_sessao_bluesky(candidata["refreshJwt"], timeout)
+            except SessaoExpiradaError as e:
+                print(f"⚠️ refreshJwt recusado ({e}), fazendo login de novo.")
+
+        if sessao is None:
+            sessao = criar_sessao_bluesky(credentials["BLUESKY_APP_HANDLE"], credentials["BLUESKY_PASSWORD"], timeout)
+
+        if bucket:
+            salvar_sessao(bucket, sessao)
+        _sessao = sessao
+        return _sessao
+
+
+def xrpc_post(nsid: str, body: dict, credentials: dict, bucket: str = None, timeout: float = TIMEOUT_SECONDS) -> dict:
+    """
+    Chamada XRPC autenticada ao PDS. Se o accessJwt for recusado (expirado/revogado),
+    renova a sessão uma vez e repete a chamada.
+    """
+    for tentativa in (1, 2):
+        sessao = obter_sessao(credentials, bucket, forcar_renovacao=tentativa == 2, timeout=timeout)
+        resp = sessao_http("bluesky").post(
+            f"{BLUESKY_PDS_URL}/xrpc/{nsid}",
+            headers={"Authorization": f"Bearer {sessao['accessJwt']}"},
+            json={"repo": sessao["did"], **body},
+            timeout=timeout,
+        )
+        if tentativa == 1 and token_expirado(resp):
+            print("⌛ accessJwt recusado pelo PDS, renovando a sessão.")
+            continue
+        resp.raise_for_status()
+        return resp.json()
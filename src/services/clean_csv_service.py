@@ -1,38 +1,138 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
-from slugify import slugify
+import csv
+from datetime import datetime, timedelta, date
+from services.slug_service import slug_proposicao, slug_proposicoes
+from services.metrics_service import etapa
 
-def clean_csv(caminho_arquivo: str):
+# Colunas usadas pelas etapas seguintes (fetch, geração de tweets)
+COLUNAS_NECESSARIAS = ["Proposições", "Ementa", "Autor", "UF", "Partido", "Apresentação", "Situação", "Link"]
+COLUNA_DATA = "Apresentação"
+LINHAS_METADADOS = 3
+CHUNK_SIZE = 500
+# O export é ordenado por data, mas traz algumas linhas antigas fora de ordem;
+# só paramos de ler depois de tantas linhas seguidas anteriores à data buscada
+TOLERANCIA_FORA_DE_ORDEM = 20
+
+
+def data_busca_padrao() -> date:
+    """Data buscada por padrão: ontem."""
+    return (datetime.today() - timedelta(days=1)).date()
+
+
+@etapa("limpar_csv")
+def clean_csv(caminho_arquivo: str, data_busca: date = None):
     """
     Limpa o CSV da Câmara e retorna as proposições apresentadas hoje.
+    Lê apenas as colunas necessárias, em blocos, e para de ler assim que
+    passa da data buscada (o export é ordenado por data).
     """
+    # Import tardio: o modo streaming (clean_csv_stream) não depende do pandas
+    import pandas as pd
+    import numpy as np
+
     try:
-        # 📥 Lê o CSV, pulando as 3 primeiras linhas (metadados)
-        df = pd.read_csv(caminho_arquivo, skiprows=3, sep=";", encoding="utf-8")
+        data_busca = data_busca or data_busca_padrao()
+        alvo = pd.Timestamp(data_busca)
+
+        # 📥 Lê o CSV em blocos, pulando as 3 primeiras linhas (metadados)
+        chunks = pd.read_csv(
+            caminho_arquivo,
+            skiprows=LINHAS_METADADOS,
+            sep=";",
+            encoding="utf-8",
+            usecols=COLUNAS_NECESSARIAS,
+            dtype=str,
+            chunksize=CHUNK_SIZE,
+        )
+
+        partes = []
+        for chunk in chunks:
+            # 🧹 Remove linhas completamente vazias
+            chunk = chunk.dropna(how="all")
 
-        # 🧹 Remove linhas completamente vazias
-        df = df.dropna(how="all")
+            # 🗓️ Converte a data (dd/mm/yyyy) uma única vez por bloco
+            datas = pd.to_datetime(chunk[COLUNA_DATA], format="%d/%m/%Y", errors="coerce")
 
-        # 🗓️ Data no formato dd/mm/yyyy
-        search_date = (datetime.today() - timedelta(days=1)).strftime("%d/%m/%Y")
+            # 🔎 Filtra proposições apresentadas na data buscada
+            partes.append(chunk[datas == alvo])
 
-        # TODO: 
+            # ⏹️ Export ordenado por data: o restante do arquivo é mais antigo
+            if (datas < alvo).sum() >= TOLERANCIA_FORA_DE_ORDEM:
+                break
+
+        # TODO:
         # 1. Tratar autores: podem vir mais de um separados por ';'
-        # 📊 Remove colunas desnecessárias
-        
-        # 🔎 Filtra proposições apresentadas hoje
-        df_hoje = df[df["Apresentação"] == search_date]
+        df_hoje = pd.concat(partes) if partes else pd.DataFrame(columns=COLUNAS_NECESSARIAS)
 
         # Slugify
-        df_hoje['Proposições_slugified'] = df_hoje['Proposições'].apply(slugify)
+        df_hoje = df_hoje.assign(Proposições_slugified=slug_proposicoes(df_hoje["Proposições"]))
 
         # Remove NaN
         df_hoje = df_hoje.replace({np.nan: None})
 
-        print(f"📊 {len(df_hoje)} proposições encontradas com data {search_date}.")
+        print(f"📊 {len(df_hoje)} proposições encontradas com data {data_busca:%d/%m/%Y}.")
         return df_hoje
 
     except Exception as e:
         print(f"❌ Erro ao limpar CSV: {e}")
         raise e
+
+
+@etapa("limpar_csv")
+def clean_csv_stream(caminho_arquivo: str, data_busca: date = None) -> list[dict]:
+    """
+    Versão sem pandas do clean_csv: lê o CSV linha a linha com o módulo csv,
+    mantém só as colunas necessárias e para ao passar da data buscada.
+    Retorna a lista de proposições (dicts) no mesmo formato de df.to_dict(orient="records").
+    """
+    try:
+        data_busca = data_busca or data_busca_padrao()
+        linhas = []
+        anteriores = 0
+
+        with open(caminho_arquivo, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f, delimiter=";")
+
+            for _ in range(LINHAS_METADADOS):
+                next(reader, None)
+
+            cabecalho = next(reader, None) or []
+            indices = [(coluna, cabecalho.index(coluna)) for coluna in COLUNAS_NECESSARIAS]
+            idx_data = cabecalho.index(COLUNA_DATA)
+
+            for linha in reader:
+                # Ignora linhas vazias e o rodapé ("Fonte", "Total de resultados"...)
+                if len(linha) != len(cabecalho):
+                    continue
+                try:
+                    data_linha = datetime.strptime(linha[idx_data], "%d/%m/%Y").date()
+                except ValueError:
+                    continue
+
+                if data_linha < data_busca:
+                    # ⏹️ Export ordenado por data: o restante do arquivo é mais antigo
+                    anteriores += 1
+                    if anteriores >= TOLERANCIA_FORA_DE_ORDEM:
+                        break
+                    continue
+                anteriores = 0
+                if data_linha != data_busca:
+                    continue
+
+                registro = {coluna: (linha[i] or None) for coluna, i in indices}
+                registro["Proposições_slugified"] = slug_proposicao(registro["Proposições"] or "")
+                linhas.append(registro)
+
+        print(f"📊 {len(linhas)} proposições encontradas com data {data_busca:%d/%m/%Y}.")
+        return linhas
+
+    except Exception as e:
+        print(f"❌ Erro ao limpar CSV: {e}")
+        raise e
+
+
+def escrever_csv(linhas: list[dict], saida):
+    """Escreve as proposições limpas em 'saida' (stream de texto) no formato CSV."""
+    colunas = COLUNAS_NECESSARIAS + ["Proposições_slugified"]
+    writer = csv.DictWriter(saida, fieldnames=colunas, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(linhas)
@@ -0,0 +1,199 @@
+import os
+import time
+import random
+import logging
+import threading
+import requests
+import tweepy
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from services.post_tweet_service import create_bluesky_post, create_x_post, textos_thread
+from services.metrics_service import etapa
+
+# Plataformas em que cada post é publicado (ex: "bluesky,x")
+POST_PLATFORMS = [p.strip() for p in os.getenv("POST_PLATFORMS", "bluesky").split(",") if p.strip()]
+# Timeout de cada requisição HTTP (limitado ao que resta do prazo da plataforma)
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("POST_REQUEST_TIMEOUT_SECONDS", "15"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 10.0
+
+# Prazo total (incluindo retentativas) e número de tentativas, por plataforma
+POLITICAS = {
+    "bluesky": {
+        "prazo": float(os.getenv("BLUESKY_POST_DEADLINE_SECONDS", "40")),
+        "tentativas": int(os.getenv("BLUESKY_POST_MAX_ATTEMPTS", "3")),
+        "publicar": create_bluesky_post,
+    },
+    "x": {
+        "prazo": float(os.getenv("X_POST_DEADLINE_SECONDS", "40")),
+        "tentativas": int(os.getenv("X_POST_MAX_ATTEMPTS", "3")),
+        "publicar": create_x_post,
+    },
+}
+
+
+def erro_transitorio(e: Exception) -> bool:
+    """Falhas que valem nova tentativa: rede, timeout, 429 e 5xx."""
+    if isinstance(e, (requests.Timeout, requests.ConnectionError, tweepy.TooManyRequests, tweepy.TwitterServerError)):
+        return True
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code == 429 or e.response.status_code >= 500
+    return False
+
+
+def espera_retentativa(e: Exception, tentativa: int) -> float:
+    """Respeita o reset do rate limit quando a plataforma informa; senão, backoff com full jitter."""
+    resposta = getattr(e, "response", None)
+    if resposta is not None and getattr(resposta, "status_code", None) == 429:
+        # X: x-rate-limit-reset / Bluesky: ratelimit-reset (epoch em segundos)
+        reset = resposta.headers.get("x-rate-limit-reset") or resposta.headers.get("ratelimit-reset")
+        if reset:
+            return max(0.0, float(reset) - time.time())
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** tentativa))
+
+
+def publicar_na_plataforma(
+    plataforma: str,
+    carregar_credenciais,
+    content: dict,
+    textos: list[str],
+    bucket: str,
+    estado: dict,
+    journal=None
+) -> dict:
+    """
+    Publica a thread em uma plataforma dentro do prazo dela, repetindo só falhas transitórias.
+    'estado' é compartilhado com quem chamou (tentativas e progresso da thread),
+    para que o relatório saia mesmo se o prazo estourar com a chamada em andamento.
+    Com 'journal', o progresso é persistido a cada post publicado e a conclusão é registrada.
+    Se quem chamou sinalizar estado["cancelado"] (prazo estourado), a publicação para no
+    próximo ponto de progresso, depois de registrar o que já foi publicado.
+    """
+    politica = POLITICAS[plataforma]
+    prazo = estado["inicio"] + politica["prazo"]
+    credentials = carregar_credenciais()
+
+    def ao_progredir():
+        if journal:
+            journal.registrar(plataforma, estado["progresso"])
+        if estado["cancelado"].is_set():
+            raise TimeoutError(f"{plataforma}: prazo de {politica['prazo']:.0f}s excedido, publicação interrompida.")
+
+    for tentativa in range(1, politica["tentativas"] + 1):
+        estado["tentativas"] = tentativa
+        restante = prazo - time.monotonic()
+        try:
+            with etapa(f"publicar_{plataforma}"):
+                resultado = politica["publicar"](
+                    credentials=credentials,
+                    content=content,
+                    textos=textos,
+                    progresso=estado["progresso"],
+                    ao_progredir=ao_progredir,
+                    timeout=max(1.0, min(REQUEST_TIMEOUT_SECONDS, restante)),
+                    **({"bucket": bucket} if plataforma == "bluesky" else {}),
+                )
+            if journal:
+                journal.concluir(plataforma, resultado)
+            return resultado
+        except Exception as e:
+            if estado["cancelado"].is_set() or not erro_transitorio(e) or tentativa == politica["tentativas"]:
+                raise
+            espera = espera_retentativa(e, tentativa)
+            if time.monotonic() + espera >= prazo:
+                raise
+            logging.warning(f"⏳ {plataforma}: falha transitória ({e}), nova tentativa em {espera:.1f}s.")
+            time.sleep(espera)
+
+
+def duracao_maxima(plataformas: list[str] = None) -> float:
+    """
+    Pior caso de publicar_em_plataformas: o maior prazo entre as plataformas (publicadas
+    em paralelo), mais a requisição em andamento esperada depois do prazo.
+    """
+    prazos = [POLITICAS[p]["prazo"] for p in (plataformas or POST_PLATFORMS) if p in POLITICAS]
+    return max(prazos, default=0.0) + REQUEST_TIMEOUT_SECONDS
+
+
+def publicar_em_plataformas(
+    content: dict,
+    credenciais: dict,
+    plataformas: list[str] = None,
+    bucket: str = None,
+    journal=None
+) -> dict:
+    """
+    Publica o mesmo post_data em todas as plataformas ao mesmo tempo, uma thread por
+    plataforma. Cada uma tem prazo, tentativas e limite de caracteres próprios: uma
+    plataforma lenta ou com erro não atrasa nem cancela as outras.
+    'credenciais' mapeia plataforma -> função que carrega as credenciais dela.
+    Retorna {"publicado_em": [...], "plataformas": {nome: {"status", "latencia_ms",
+    "tentativas", "resultado" | "erro"}}}, com status "ok", "erro" ou "timeout".
+    Uma plataforma que estoura o prazo é interrompida e esperada antes do retorno (ver
+    duracao_maxima): nenhuma publicação continua em segundo plano.
+    Com 'journal' (JournalPost), plataformas já concluídas em uma tentativa anterior
+    são puladas ("retomado": true) e as parciais continuam do último post publicado.
+    """
+    plataformas = plataformas or POST_PLATFORMS
+    relatorio, futuros = {}, {}
+    executor = ThreadPoolExecutor(max_workers=len(plataformas) or 1)
+
+    for plataforma in plataformas:
+        if journal and journal.concluido(plataforma):
+            resultado = journal.progresso(plataforma).get("resultado")
+            relatorio[plataforma] = {"status": "ok", "resultado": resultado, "latencia_ms": 0, "tentativas": 0, "retomado": True}
+            print(f"📓 {plataforma}: já publicado em uma tentativa anterior, pulando.")
+            continue
+
+        progresso = journal.progresso(plataforma) if journal else {}
+        estado = {"inicio": time.monotonic(), "tentativas": 0, "progresso": progresso, "cancelado": threading.Event()}
+        try:
+            if plataforma not in POLITICAS:
+                raise ValueError(f"Plataforma desconhecida: '{plataforma}'.")
+            # Renderiza a thread uma vez por plataforma, no limite de caracteres dela
+            textos = textos_thread(content, plataforma)
+        except Exception as e:
+            relatorio[plataforma] = {"status": "erro", "latencia_ms": 0, "tentativas": 0, "erro": str(e)}
+            continue
+        futuro = executor.submit(
+            publicar_na_plataforma, plataforma, credenciais[plataforma], content, textos, bucket, estado, journal
+        )
+        # Latência medida na conclusão de cada plataforma, não na ordem em que os resultados são lidos
+        futuro.add_done_callback(lambda _, estado=estado: estado.setdefault("fim", time.monotonic()))
+        futuros[plataforma] = (estado, futuro)
+
+    for plataforma, (estado, futuro) in futuros.items():
+        prazo = estado["inicio"] + POLITICAS[plataforma]["prazo"]
+        try:
+            futuro.result(timeout=max(0.0, prazo - time.monotonic()))
+        except FuturesTimeoutError:
+            estado["cancelado"].set()
+        except Exception:
+            pass
+
+    # Uma plataforma que estourou o prazo para no próximo ponto de progresso; espera a
+    # requisição em andamento (no máximo REQUEST_TIMEOUT_SECONDS) para que nenhuma thread
+    # continue publicando ou gravando o journal depois do retorno: o retry parte do journal
+    # completo e não duplica posts
+    executor.shutdown(wait=True)
+
+    for plataforma, (estado, futuro) in futuros.items():
+        try:
+            status = {"status": "ok", "resultado": futuro.result()}
+        except Exception as e:
+            if estado["cancelado"].is_set():
+                status = {"status": "timeout", "erro": f"Prazo de {POLITICAS[plataforma]['prazo']:.0f}s excedido."}
+            else:
+                status = {"status": "erro", "erro": str(e)}
+
+        relatorio[plataforma] = {
+            **status,
+            "latencia_ms": round((estado["fim"] - estado["inicio"]) * 1000),
+            "tentativas": estado["tentativas"],
+        }
+        icone = "✅" if status["status"] == "ok" else "❌"
+        print(f"{icone} {plataforma}: {status['status']} em {relatorio[plataforma]['latencia_ms']} ms ({estado['tentativas']} tentativa(s)).")
+
+    return {
+        "publicado_em": [p for p in plataformas if relatorio[p]["status"] == "ok"],
+        "plataformas": {p: relatorio[p] for p in plataformas},
+    }
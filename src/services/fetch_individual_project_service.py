@@ -1,45 +1,337 @@
+import os
+import re
+import html
+import uuid
+import hashlib
+import threading
 import requests
-from io import BytesIO
+from contextlib import contextmanager
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from PyPDF2 import PdfReader
-from bs4 import BeautifulSoup
+from services.resource_cache_service import sessao_http
+from services.metrics_service import etapa, registrar
 
-def fetch_individual_project(prop: dict):
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:143.0) Gecko/20100101 Firefox/143.0",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+# Limite de requisições simultâneas por host (ex: www.camara.leg.br)
+MAX_POR_HOST = int(os.getenv("FETCH_MAX_PER_HOST", "4"))
+
+# Limites do download/extração do PDF, para não estourar a memória da Lambda
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(50 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))
+CHUNK_SIZE = 64 * 1024
+TMP_DIR = os.getenv("FETCH_TMP_DIR", "/tmp")
+
+_semaforos_host = {}
+_semaforos_lock = threading.Lock()
+
+
+def criar_sessao(pool_size: int = 10) -> requests.Session:
     """
-    Recebe uma proposição (dict) contendo a chave 'Link'.
-    Retorna um dicionário com o HTML da página e o texto do inteiro teor (se existir).
+    Cria uma sessão HTTP com pool de conexões, para ser compartilhada entre threads.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@contextmanager
+def limite_host(url: str):
+    """
+    Garante que no máximo MAX_POR_HOST requisições rodem ao mesmo tempo para o host da URL.
+    """
+    host = urlparse(url).hostname or ""
+    with _semaforos_lock:
+        semaforo = _semaforos_host.get(host)
+        if semaforo is None:
+            semaforo = threading.BoundedSemaphore(MAX_POR_HOST)
+            _semaforos_host[host] = semaforo
+    with semaforo:
+        yield
+
+
+class PdfMuitoGrandeError(ValueError):
+    """PDF maior que o limite configurado em PDF_MAX_BYTES."""
+
+
+@etapa("baixar_pdf")
+def baixar_pdf(http, pdf_url: str, destino: str, max_bytes: int = PDF_MAX_BYTES, cache: dict = None) -> dict:
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:143.0) Gecko/20100101 Firefox/143.0",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    Baixa o PDF em blocos direto para 'destino' (sem manter o arquivo em memória).
+    Se 'cache' tiver ETag/Last-Modified, faz um GET condicional.
+    Retorna bytes gravados, hash sha256, ETag/Last-Modified e se o servidor respondeu 304.
+    """
+    headers = dict(HEADERS)
+    if cache:
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    total = 0
+    sha256 = hashlib.sha256()
+    with limite_host(pdf_url):
+        with http.get(pdf_url, headers=headers, timeout=30, stream=True) as response:
+            if response.status_code == 304:
+                return {"bytes": 0, "sha256": cache.get("sha256"), "etag": cache.get("etag"),
+                        "last_modified": cache.get("last_modified"), "nao_modificado": True}
+            response.raise_for_status()
+
+            tamanho = response.headers.get("Content-Length")
+            if tamanho and tamanho.isdigit() and int(tamanho) > max_bytes:
+                raise PdfMuitoGrandeError(f"PDF com {tamanho} bytes excede o limite de {max_bytes}.")
+
+            try:
+                with open(destino, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        total += len(chunk)
+                        if total > max_bytes:
+                            raise PdfMuitoGrandeError(f"PDF excede o limite de {max_bytes} bytes.")
+                        sha256.update(chunk)
+                        f.write(chunk)
+            finally:
+                registrar("bytes_baixados", total)
+
+            return {"bytes": total, "sha256": sha256.hexdigest(), "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"), "nao_modificado": False}
+
+
+@etapa("extrair_texto_pdf")
+def extrair_texto_pdf(caminho_pdf: str, saida, max_paginas: int = PDF_MAX_PAGES) -> int:
+    """
+    Extrai o texto do PDF página por página, escrevendo em 'saida' (stream de texto).
+    Retorna o número de páginas processadas.
+    """
+    reader = PdfReader(caminho_pdf)
+    total_paginas = len(reader.pages)
+
+    paginas = 0
+    for page in reader.pages:
+        if paginas >= max_paginas:
+            print(f"⚠️ PDF com {total_paginas} páginas truncado em {max_paginas}.")
+            break
+        # Quebra de linha entre páginas, para cabeçalhos/rodapés não grudarem no texto
+        if paginas:
+            saida.write("\n")
+        saida.write(page.extract_text() or "")
+        paginas += 1
+    registrar("paginas_pdf", paginas)
+    return paginas
+
+
+# Atributos de uma tag: nome="valor", nome='valor' ou nome=valor
+ATRIBUTO_RE = re.compile(rb"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""")
+# Trechos da página de tramitação com os metadados: (início, fim)
+TRECHO_SITUACAO = (b'id="subSecaoSituacaoOrigemAcessoria"', b"</div>")
+TRECHO_AUTORES = (b'id="colunaPrimeiroAutor"', b"</p>")
+
+
+def _bytes(html_content) -> bytes:
+    return html_content.encode("utf-8") if isinstance(html_content, str) else html_content
+
+
+def _atributos(tag: bytes) -> dict:
+    return {
+        nome.lower(): duplas or simples or sem_aspas
+        for nome, duplas, simples, sem_aspas in ATRIBUTO_RE.findall(tag)
     }
 
+
+def encontrar_link_teor(html_content, encoding: str = "utf-8") -> str | None:
+    """
+    URL do inteiro teor: href do primeiro link <a> com a classe 'linkDownloadTeor'.
+    Em vez de montar a árvore da página inteira, procura o nome da classe nos bytes
+    e só interpreta a tag em volta de cada ocorrência.
+    """
+    conteudo = _bytes(html_content)
+    posicao = conteudo.find(b"linkDownloadTeor")
+    while posicao != -1:
+        inicio = conteudo.rfind(b"<", 0, posicao)
+        fim = conteudo.find(b">", posicao)
+        tag = conteudo[inicio:fim + 1]
+        if inicio != -1 and fim != -1 and tag[:3].lower() in (b"<a ", b"<a\t", b"<a\n"):
+            atributos = _atributos(tag)
+            if b"linkDownloadTeor" in atributos.get(b"class", b"").split() and atributos.get(b"href"):
+                return html.unescape(atributos[b"href"].decode(encoding, errors="replace"))
+        posicao = conteudo.find(b"linkDownloadTeor", posicao + 1)
+    return None
+
+
+class _CamposRotulados(HTMLParser):
+    """
+    Lê um trecho curto da página com parágrafos no formato
+    <p><strong>Rótulo</strong> texto <a>link</a>...</p> e guarda, por rótulo,
+    o texto que vem depois dele e os textos dos links.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.campos = []
+        self._em_rotulo = self._em_link = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "strong":
+            self._em_rotulo = True
+            self.campos.append({"rotulo": "", "texto": "", "links": []})
+        elif tag == "a" and self.campos:
+            self._em_link = True
+            self.campos[-1]["links"].append("")
+
+    def handle_endtag(self, tag):
+        if tag == "strong":
+            self._em_rotulo = False
+        elif tag == "a":
+            self._em_link = False
+
+    def handle_data(self, data):
+        if not self.campos:
+            return
+        campo = self.campos[-1]
+        if self._em_rotulo:
+            campo["rotulo"] += data
+        else:
+            campo["texto"] += data
+            if self._em_link:
+                campo["links"][-1] += data
+
+    def rotulados(self) -> dict:
+        """{rótulo normalizado (minúsculo, sem ':'): {"texto", "links"}} com espaços colapsados."""
+        limpar = lambda texto: " ".join(texto.split())
+        return {
+            limpar(c["rotulo"]).rstrip(":").strip().lower(): {
+                "texto": limpar(c["texto"]),
+                "links": [limpar(link) for link in c["links"] if limpar(link)],
+            }
+            for c in self.campos
+        }
+
+
+def _campos_do_trecho(conteudo: bytes, trecho: tuple, encoding: str) -> dict:
+    """Interpreta só o trecho entre os marcadores (alguns KB), não a página inteira."""
+    inicio = conteudo.find(trecho[0])
+    if inicio == -1:
+        return {}
+    fim = conteudo.find(trecho[1], inicio)
+    parser = _CamposRotulados()
+    parser.feed(conteudo[inicio:fim if fim != -1 else None].decode(encoding, errors="replace"))
+    parser.close()
+    return parser.rotulados()
+
+
+def extrair_dados_pagina(html_content, encoding: str = "utf-8") -> dict:
+    """
+    Extrai da página de tramitação só o que a pipeline usa:
+    {"link_teor": str | None, "autores": [...], "situacao": str | None, "apensados": [...]}.
+    Autores vêm do parágrafo 'colunaPrimeiroAutor' (links ou, sem links, o texto);
+    situação e apensados, dos rótulos do quadro 'subSecaoSituacaoOrigemAcessoria'.
+    """
+    conteudo = _bytes(html_content)
+    situacao = _campos_do_trecho(conteudo, TRECHO_SITUACAO, encoding)
+    autores = next(iter(_campos_do_trecho(conteudo, TRECHO_AUTORES, encoding).values()), None)
+    apensados = [
+        nome
+        for rotulo, campo in situacao.items() if rotulo.startswith("apensad")
+        for nome in (campo["links"] or [campo["texto"]]) if nome
+    ]
+    return {
+        "link_teor": encontrar_link_teor(conteudo, encoding),
+        "autores": (autores["links"] or ([autores["texto"]] if autores["texto"] else [])) if autores else [],
+        "situacao": (situacao.get("situação") or {}).get("texto") or None,
+        "apensados": apensados,
+    }
+
+
+def fetch_individual_project(prop: dict, session: requests.Session = None, cache: dict = None):
+    """
+    Recebe uma proposição (dict) contendo a chave 'Link'.
+    Retorna um dicionário com o HTML bruto da página ('html', em bytes), os dados extraídos
+    dela ('pagina': link do teor, autores, situação e apensados), o caminho local
+    ('texto_path') do texto do inteiro teor (se existir), os bytes/páginas processados
+    do PDF e os 'metadados' do cache (URL do PDF, ETag, Last-Modified e sha256).
+    O chamador é responsável por remover o arquivo em 'texto_path'.
+    Se 'session' não for informada, usa a sessão compartilhada "camara" do cache de recursos.
+    Se 'cache' (metadados de uma execução anterior) for informado e o PDF não tiver mudado,
+    retorna 'inalterado': True sem extrair o texto de novo.
+    """
+    http = session or sessao_http("camara", criar_sessao)
+    vazio = {"texto_path": None, "bytes_pdf": 0, "paginas": 0, "metadados": None, "inalterado": False, "pagina": None}
+
     nome = prop.get("Proposições", "desconhecida")
     url = prop.get("Link")
 
     if not url:
         print(f"⚠️ Proposição {nome} sem link.")
-        return {"html": None, "texto": None}
+        return {"html": None, **vazio}
 
     # 🔹 1. Acessar página HTML
-    response = requests.get(url, headers=headers, timeout=30)
+    with etapa("pagina_html"), limite_host(url):
+        response = http.get(url, headers=HEADERS, timeout=30)
     response.raise_for_status()
-    html_content = response.text
+    html_content = response.content
+    registrar("bytes_baixados", len(html_content))
 
-    # 🔹 2. Tentar encontrar o link do inteiro teor
-    soup = BeautifulSoup(html_content, "html.parser")
-    link_inteiro_teor = soup.find("a", class_="linkDownloadTeor")
+    # 🔹 2. Extrair o link do inteiro teor e os metadados direto dos bytes (sem decodificar a página toda)
+    # Sem charset no Content-Type o requests assume ISO-8859-1; a página da Câmara é UTF-8
+    encoding = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else "utf-8"
+    with etapa("extrair_dados_pagina"):
+        pagina = extrair_dados_pagina(html_content, encoding)
+    vazio["pagina"] = pagina
+    pdf_url = pagina["link_teor"]
 
-    if not link_inteiro_teor or not link_inteiro_teor.get("href"):
+    if not pdf_url:
         print(f"⚠️ Nenhum inteiro teor encontrado para {nome}.")
-        return {"html": html_content, "texto": None}
+        return {"html": html_content, **vazio}
 
-    pdf_url = link_inteiro_teor["href"]
+    # O cache só vale para o mesmo documento (chaveado pela URL do PDF)
+    if cache and cache.get("pdf_url") != pdf_url:
+        cache = None
     print(f"📄 Baixando PDF do inteiro teor de {nome}: {pdf_url}")
 
-    # 🔹 3. Baixar e extrair texto do PDF
-    pdf_response = requests.get(pdf_url, headers=headers, timeout=30)
-    pdf_response.raise_for_status()
-    reader = PdfReader(BytesIO(pdf_response.content))
-    texto = "".join(page.extract_text() or "" for page in reader.pages)
+    # 🔹 3. Baixar o PDF para /tmp e extrair o texto para um arquivo, página por página
+    base = os.path.join(TMP_DIR, f"inteiro_teor_{uuid.uuid4().hex}")
+    pdf_path, texto_path = f"{base}.pdf", f"{base}.txt"
+
+    try:
+        download = baixar_pdf(http, pdf_url, pdf_path, cache=cache)
+        metadados = {
+            "link": url,
+            "pdf_url": pdf_url,
+            "etag": download["etag"],
+            "last_modified": download["last_modified"],
+            "sha256": download["sha256"],
+        }
+
+        # ♻️ 304 ou mesmo conteúdo: reaproveita o texto extraído anteriormente
+        if download["nao_modificado"] or (cache and cache.get("sha256") == download["sha256"]):
+            print(f"♻️ Inteiro teor de {nome} inalterado, extração ignorada.")
+            metadados["paginas"] = cache.get("paginas", 0)
+            return {"html": html_content, **vazio, "bytes_pdf": download["bytes"],
+                    "metadados": metadados, "inalterado": True}
+
+        with open(texto_path, "w", encoding="utf-8") as saida:
+            paginas = extrair_texto_pdf(pdf_path, saida)
+        metadados["paginas"] = paginas
+    except PdfMuitoGrandeError as e:
+        print(f"⚠️ Inteiro teor de {nome} ignorado: {e}")
+        if os.path.exists(texto_path):
+            os.remove(texto_path)
+        return {"html": html_content, **vazio}
+    except Exception:
+        if os.path.exists(texto_path):
+            os.remove(texto_path)
+        raise
+    finally:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
 
-    return {"html": html_content, "texto": texto}
+    print(f"📊 {nome}: {download['bytes']} bytes de PDF, {paginas} páginas extraídas.")
+    return {"html": html_content, "texto_path": texto_path, "bytes_pdf": download["bytes"],
+            "paginas": paginas, "metadados": metadados, "inalterado": False, "pagina": pagina}
@@ -1,16 +1,30 @@
+import os
+import csv
 import requests
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from services.resource_cache_service import sessao_http
+from services.metrics_service import etapa, registrar
 
-def fetch_projects_csv(
-    tipos="PEC,PL",
-    pagina=1,
-    ordem="data",
-    termo_busca="",
-    caminho_arquivo="proposicoes_all.csv"
-):
+URL = "https://www.camara.leg.br/busca-download/api/v1/arquivo/proposicoes"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:143.0) Gecko/20100101 Firefox/143.0",
+    "Accept": "application/json, text/plain, */*"
+}
+CHUNK_SIZE = 64 * 1024
+# Linhas de metadados antes do cabeçalho do CSV exportado
+LINHAS_METADADOS = 3
+COLUNA_DATA = "Apresentação"
+# O export traz algumas linhas antigas fora de ordem; só consideramos que a janela
+# acabou depois de tantas linhas seguidas anteriores a data_inicio
+TOLERANCIA_FORA_DE_ORDEM = 20
+
+@etapa("baixar_pagina_csv")
+def baixar_pagina(http, caminho_arquivo: str, tipos: str, pagina: int, ordem: str, termo_busca: str) -> int:
     """
-    Envia requisição à API da Câmara e baixa o CSV de proposições.
+    Baixa uma página do CSV de proposições em streaming direto para o disco.
+    Retorna o número de bytes gravados.
     """
-    url = "https://www.camara.leg.br/busca-download/api/v1/arquivo/proposicoes"
     payload = {
         "data": {
             "order": ordem,
@@ -21,19 +35,152 @@ def fetch_projects_csv(
         "formato": "csv"
     }
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:143.0) Gecko/20100101 Firefox/143.0",
-        "Accept": "application/json, text/plain, */*"
-    }
+    total = 0
+    with http.post(URL, json=payload, headers=HEADERS, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        with open(caminho_arquivo, "wb") as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                total += len(chunk)
+                f.write(chunk)
+    registrar("bytes_baixados", total)
+    return total
+
+
+def filtrar_pagina(caminho_pagina: str, data_inicio: date, data_fim: date, writer, escrever_cabecalho: bool):
+    """
+    Lê uma página baixada e escreve no 'writer' apenas as linhas dentro da janela de datas.
+    Retorna (linhas escritas, se a página chegou em linhas anteriores a data_inicio, se a página tinha dados).
+    """
+    escritas = 0
+    anteriores = 0
+    passou_da_janela = False
+    tinha_dados = False
+
+    with open(caminho_pagina, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+
+        for _ in range(LINHAS_METADADOS):
+            linha = next(reader, None)
+            if linha is not None and escrever_cabecalho:
+                writer.writerow(linha)
+
+        cabecalho = next(reader, None)
+        if not cabecalho or COLUNA_DATA not in cabecalho:
+            return escritas, passou_da_janela, tinha_dados
+        if escrever_cabecalho:
+            writer.writerow(cabecalho)
+        idx_data = cabecalho.index(COLUNA_DATA)
+
+        for linha in reader:
+            # Ignora linhas de rodapé ("Fonte", "Total de resultados"...) e linhas quebradas
+            if len(linha) != len(cabecalho):
+                continue
+            try:
+                data_linha = datetime.strptime(linha[idx_data], "%d/%m/%Y").date()
+            except ValueError:
+                continue
+
+            tinha_dados = True
+            if data_linha < data_inicio:
+                # O export é ordenado por data (decrescente): nada mais relevante daqui em diante
+                anteriores += 1
+                if anteriores >= TOLERANCIA_FORA_DE_ORDEM:
+                    passou_da_janela = True
+                    break
+                continue
+            anteriores = 0
+            if data_linha <= data_fim:
+                writer.writerow(linha)
+                escritas += 1
+
+    return escritas, passou_da_janela, tinha_dados
+
+
+def fetch_projects_csv_incremental(
+    data_inicio: date = None,
+    data_fim: date = None,
+    tipos="PEC,PL",
+    termo_busca="",
+    caminho_arquivo="proposicoes_all.csv",
+    max_paginas=10,
+    paginas_paralelas=3
+):
+    """
+    Baixa apenas as proposições apresentadas entre data_inicio e data_fim (padrão: ontem).
+    As páginas são baixadas em streaming para o disco; se a primeira página não alcançar
+    o início da janela, as seguintes são buscadas em paralelo, em lotes, até encontrar
+    linhas mais antigas que a janela. O arquivo final mantém o layout do export original.
+    """
+    ontem = date.today() - timedelta(days=1)
+    data_inicio = data_inicio or ontem
+    data_fim = data_fim or data_inicio
+    pasta = os.path.dirname(os.path.abspath(caminho_arquivo))
+
+    def caminho_pagina(pagina):
+        return os.path.join(pasta, f"proposicoes_pagina_{pagina}.csv")
+
+    print(f"📡 Baixando proposições de {data_inicio:%d/%m/%Y} a {data_fim:%d/%m/%Y} ({tipos})...")
 
+    # Sessão compartilhada entre invocações (warm start): reaproveita as conexões TLS com a Câmara
+    session = sessao_http("camara-csv")
+    total_linhas = 0
+    total_bytes = 0
     try:
-        print(f"📡 Baixando CSV da página {pagina} ({tipos})...")
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
+        with open(caminho_arquivo, "w", encoding="utf-8", newline="") as saida, \
+                ThreadPoolExecutor(max_workers=paginas_paralelas) as executor:
+            writer = csv.writer(saida, delimiter=";", quoting=csv.QUOTE_ALL)
 
-        with open(caminho_arquivo, "wb") as f:
-            f.write(response.content)
+            # A primeira página costuma bastar; as demais só são buscadas se necessário
+            lotes = [[1]] + [
+                list(range(inicio, min(inicio + paginas_paralelas, max_paginas + 1)))
+                for inicio in range(2, max_paginas + 1, paginas_paralelas)
+            ]
+
+            terminou = False
+            for lote in lotes:
+                tamanhos = executor.map(
+                    lambda p: baixar_pagina(session, caminho_pagina(p), tipos, p, "data", termo_busca),
+                    lote
+                )
+                total_bytes += sum(tamanhos)
+
+                # Processa as páginas do lote em ordem, para manter a ordenação do export
+                for pagina in lote:
+                    if not terminou:
+                        escritas, passou, tinha_dados = filtrar_pagina(
+                            caminho_pagina(pagina), data_inicio, data_fim, writer,
+                            escrever_cabecalho=(pagina == 1)
+                        )
+                        total_linhas += escritas
+                        terminou = passou or not tinha_dados
+                    os.remove(caminho_pagina(pagina))
+
+                if terminou:
+                    break
+            else:
+                print(f"⚠️ Limite de {max_paginas} páginas atingido antes do início da janela.")
+
+        print(f"✅ {total_linhas} proposições ({total_bytes} bytes baixados) salvas em: {caminho_arquivo}")
+        return total_linhas
+
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Erro ao baixar CSV: {e}")
+        raise e
 
+
+def fetch_projects_csv(
+    tipos="PEC,PL",
+    pagina=1,
+    ordem="data",
+    termo_busca="",
+    caminho_arquivo="proposicoes_all.csv"
+):
+    """
+    Envia requisição à API da Câmara e baixa o CSV de proposições.
+    """
+    try:
+        print(f"📡 Baixando CSV da página {pagina} ({tipos})...")
+        baixar_pagina(sessao_http("camara-csv"), caminho_arquivo, tipos, pagina, ordem, termo_busca)
         print(f"✅ Arquivo salvo em: {caminho_arquivo}")
 
     except requests.exceptions.RequestException as e:
@@ -1,65 +1,16 @@
-from openai import OpenAI
+import asyncio
 from pydantic import BaseModel, Field, ValidationError
+from services.llm_cache_service import chave_cache, ler_cache, salvar_cache
+from services.resource_cache_service import cliente_openai
+from services.metrics_service import etapa, registrar, registrar_uso_openai
+from services.token_budget_service import aplicar_orcamento, TOKEN_BUDGET
 
-class ThreadFormattedResponse(BaseModel):
-    ementa_post: str = Field(min_length=50, max_length=200)
-    pontos_post: str = Field(min_length=50, max_length=240)
-    justificativa_post: str = Field(min_length=30, max_length=180)
-
-
-class ProjetoLeiPost(BaseModel):
-    numero: str
-    autor: str
-    partido: str
-    uf: str
-    link: str
-
-    ementa_post: str
-    pontos_post: str
-    justificativa_post: str
-
-def resumir_ementa(api_key: str, ementa: str, max_chars: int = 300) -> str:
-    """Se a ementa for longa, resume-a para até 300 caracteres usando IA."""    
-    if len(ementa) <= max_chars:
-        return ementa
-
-    class ResumoEmenta(BaseModel):
-        resumo: str = Field(..., min_length=1, max_length=max_chars)
-    
-    client = OpenAI(api_key=api_key)
-
-    response = client.responses.parse(
-        model="gpt-4o-mini",
-        input=[
-            {
-                "role": "system", 
-                "content": f"Resuma o texto abaixo para no máximo {max_chars} caracteres, mantendo o sentido e a clareza."
-            },
-            {
-                "role": "user", 
-                "content": ementa
-            }
-        ],
-        text_format=ResumoEmenta,
-        temperature=0.4,
-    )
+MODELO = "gpt-4o-mini"
+TEMPERATURA = 0.4
+# Incrementar sempre que o prompt ou o formato da resposta mudar (invalida o cache)
+PROMPT_VERSION = "v1"
 
-    return response.output_parsed.resumo
-
-def gerar_resumo(
-    api_key: str,
-    text: str,
-    numero_pec: str,
-    autor: str,
-    partido: str,
-    uf: str,
-    ementa: str,
-    link: str
-) -> dict:
-
-    client = OpenAI(api_key=api_key)
-
-    system_prompt = """
+SYSTEM_PROMPT = """
     Você é um assistente especializado em resumir Projetos de Lei da Câmara dos Deputados.
 
     Seu objetivo é gerar conteúdo OTIMIZADO para threads no X (Twitter).
@@ -91,31 +42,71 @@ def gerar_resumo(
     7. Seja direto e objetivo
     """
 
-    user_prompt = f"""
+
+class ThreadFormattedResponse(BaseModel):
+    ementa_post: str = Field(min_length=50, max_length=200)
+    pontos_post: str = Field(min_length=50, max_length=240)
+    justificativa_post: str = Field(min_length=30, max_length=180)
+
+
+class ProjetoLeiPost(BaseModel):
+    numero: str
+    autor: str
+    partido: str
+    uf: str
+    link: str
+
+    ementa_post: str
+    pontos_post: str
+    justificativa_post: str
+
+def montar_user_prompt(ementa: str, text: str) -> str:
+    """
+    Prompt do usuário com a ementa e o texto completo da proposição,
+    já sem boilerplate e dentro do orçamento de tokens (OPENAI_INPUT_TOKEN_BUDGET).
+    """
+    return f"""
     Ementa:
     {ementa}
 
     Texto completo:
-    {text}
+    {aplicar_orcamento(text)}
     """
 
-    response = client.responses.parse(
-        model="gpt-4o-mini",
+
+def chave_resumo(ementa: str, text: str) -> str:
+    """Chave do cache de respostas para a ementa/texto com o modelo e prompt atuais."""
+    return chave_cache(
+        ementa=ementa,
+        text=text,
+        modelo=MODELO,
+        temperatura=TEMPERATURA,
+        system_prompt=SYSTEM_PROMPT,
+        prompt_version=PROMPT_VERSION,
+        token_budget=TOKEN_BUDGET,
+    )
+
+
+def parametros_resumo(ementa: str, text: str) -> dict:
+    """Parâmetros do responses.parse que gera a thread (mesmos no modo síncrono e assíncrono)."""
+    return dict(
+        model=MODELO,
         input=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": montar_user_prompt(ementa, text)},
         ],
         text_format=ThreadFormattedResponse,
-        temperature=0.4,
+        temperature=TEMPERATURA,
     )
 
-    parsed = response.output_parsed
 
+def montar_post(parsed: ThreadFormattedResponse, numero_pec: str, autor: str, partido: str, uf: str, link: str) -> ProjetoLeiPost:
+    """Junta a resposta do modelo com os dados da proposição."""
     # fallback defensivo (ESSENCIAL)
     def truncate(text, limit):
         return text if len(text) <= limit else text[:limit - 3] + "..."
 
-    result = ProjetoLeiPost(
+    return ProjetoLeiPost(
         numero=numero_pec,
         autor=autor,
         partido=partido,
@@ -126,4 +117,85 @@ def gerar_resumo(
         justificativa_post=truncate(parsed.justificativa_post, 180),
     )
 
-    return result.model_dump()
\ No newline at end of file
+
+def gerar_resumo(
+    api_key: str,
+    text: str,
+    numero_pec: str,
+    autor: str,
+    partido: str,
+    uf: str,
+    ementa: str,
+    link: str,
+    bucket: str = None
+) -> dict:
+    """
+    Gera o conteúdo da thread para uma proposição.
+    Se 'bucket' for informado, usa o cache de respostas no S3 (chaveado pelo hash de
+    ementa, texto, modelo, prompt e PROMPT_VERSION): um acerto não chama a OpenAI.
+    """
+    chave = chave_resumo(ementa, text)
+
+    if bucket:
+        em_cache = ler_cache(bucket, chave)
+        if em_cache:
+            print(f"♻️ Resumo de {numero_pec} encontrado no cache ({chave[:12]}).")
+            registrar("cache_llm_acertos")
+            parsed = ThreadFormattedResponse.model_construct(**em_cache)
+            return montar_post(parsed, numero_pec, autor, partido, uf, link).model_dump()
+
+    client = cliente_openai(api_key)
+    with etapa("openai_resumo"):
+        response = client.responses.parse(**parametros_resumo(ementa, text))
+    registrar_uso_openai(response.usage)
+
+    result = montar_post(response.output_parsed, numero_pec, autor, partido, uf, link)
+
+    if bucket:
+        salvar_cache(bucket, chave, result.model_dump(), {"modelo": MODELO, "prompt_version": PROMPT_VERSION})
+
+    return result.model_dump()
+
+
+async def gerar_resumo_async(
+    client,
+    controle,
+    text: str,
+    numero_pec: str,
+    autor: str,
+    partido: str,
+    uf: str,
+    ementa: str,
+    link: str,
+    bucket: str = None
+) -> dict:
+    """
+    Versão assíncrona de gerar_resumo, para gerar várias proposições na mesma invocação.
+    'client' é um AsyncOpenAI e 'controle' o ControleAIMD compartilhado entre as chamadas;
+    o acesso ao cache no S3 roda em threads para não bloquear o event loop.
+    """
+    chave = chave_resumo(ementa, text)
+
+    if bucket:
+        em_cache = await asyncio.to_thread(ler_cache, bucket, chave)
+        if em_cache:
+            print(f"♻️ Resumo de {numero_pec} encontrado no cache ({chave[:12]}).")
+            registrar("cache_llm_acertos")
+            parsed = ThreadFormattedResponse.model_construct(**em_cache)
+            return montar_post(parsed, numero_pec, autor, partido, uf, link).model_dump()
+
+    parametros = parametros_resumo(ementa, text)
+    # Inclui a espera por uma vaga no ControleAIMD
+    with etapa("openai_resumo"):
+        raw = await controle.executar(lambda: client.responses.with_raw_response.parse(**parametros))
+    response = raw.parse()
+    registrar_uso_openai(response.usage)
+
+    result = montar_post(response.output_parsed, numero_pec, autor, partido, uf, link)
+
+    if bucket:
+        await asyncio.to_thread(
+            salvar_cache, bucket, chave, result.model_dump(), {"modelo": MODELO, "prompt_version": PROMPT_VERSION}
+        )
+
+    return result.model_dump()
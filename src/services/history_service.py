@@ -0,0 +1,135 @@
+import io
+import json
+from datetime import datetime, date
+from botocore.exceptions import ClientError
+from services.slug_service import slug_proposicao, PADRAO_CANONICO
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+HISTORY_PREFIX = "history/proposicoes"
+# Índice slug -> data da partição, dividido pelo ano da proposição (o ano do "PL 5111/2025"):
+# cada execução só reescreve os anos das proposições do dia, e cada arquivo tem tamanho limitado
+INDEX_PREFIX = f"{HISTORY_PREFIX}/_index"
+
+COLUNAS_TEXTO = ["Proposições", "Ementa", "Autor", "UF", "Partido", "Situação", "Link", "Proposições_slugified", "tipo"]
+
+
+def _schema():
+    """Schema tipado do histórico (import tardio: pyarrow só é carregado aqui)."""
+    import pyarrow as pa
+
+    return pa.schema(
+        [(coluna, pa.string()) for coluna in COLUNAS_TEXTO]
+        + [("numero", pa.int32()), ("ano", pa.int16()), ("Apresentação", pa.date32())]
+    )
+
+
+def particao_key(data: date) -> str:
+    """Key da partição de um dia (layout estilo Hive: dt=YYYY-MM-DD)."""
+    return f"{HISTORY_PREFIX}/dt={data.isoformat()}/proposicoes.parquet"
+
+
+def indice_key(ano) -> str:
+    """Key do índice de um ano ('sem_ano' para identificadores fora da forma canônica)."""
+    return f"{INDEX_PREFIX}/ano={ano or 'sem_ano'}.json"
+
+
+def ano_do_slug(slug: str):
+    """Ano da proposição a partir do slug canônico ("pl-5111-2025" -> 2025)."""
+    ultimo = slug.rsplit("-", 1)[-1]
+    return int(ultimo) if ultimo.isdigit() and len(ultimo) == 4 else None
+
+
+def carregar_indice(bucket: str, ano) -> dict:
+    """Lê o índice de um ano: {slug: data}. Vazio se ainda não existir."""
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=indice_key(ano))
+        return json.loads(s3_object["Body"].read().decode("utf-8"))
+    except ClientError:
+        return {}
+
+
+def _tipar(linha: dict) -> dict:
+    """Converte uma proposição limpa para os tipos do schema."""
+    registro = {coluna: linha.get(coluna) for coluna in COLUNAS_TEXTO}
+    registro["Proposições_slugified"] = registro["Proposições_slugified"] or slug_proposicao(linha.get("Proposições") or "")
+    registro["Apresentação"] = datetime.strptime(linha["Apresentação"], "%d/%m/%Y").date()
+
+    match = PADRAO_CANONICO.match(linha.get("Proposições") or "")
+    registro["tipo"], registro["numero"], registro["ano"] = (
+        (match.group(1).upper(), int(match.group(2)), int(match.group(3))) if match else (None, None, None)
+    )
+    return registro
+
+
+def salvar_historico(bucket: str, linhas: list[dict]) -> dict:
+    """
+    Grava as proposições limpas no histórico colunar (Parquet), uma partição por data
+    de apresentação, e atualiza o índice dos anos envolvidos. Reexecuções do mesmo dia sobrescrevem a partição.
+    Retorna {data: linhas gravadas}.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    por_data = {}
+    for linha in linhas:
+        registro = _tipar(linha)
+        por_data.setdefault(registro["Apresentação"], []).append(registro)
+
+    if not por_data:
+        return {}
+
+    novos = {}
+    gravadas = {}
+
+    for data, registros in sorted(por_data.items()):
+        tabela = pa.Table.from_pylist(registros, schema=_schema())
+        buffer = io.BytesIO()
+        pq.write_table(tabela, buffer, compression="zstd")
+
+        key = particao_key(data)
+        s3_client.put_object(Bucket=bucket, Key=key, Body=buffer.getvalue(), ContentType="application/vnd.apache.parquet")
+
+        for registro in registros:
+            novos.setdefault(ano_do_slug(registro["Proposições_slugified"]), {})[registro["Proposições_slugified"]] = data.isoformat()
+        gravadas[data.isoformat()] = len(registros)
+        print(f"🗄️ {len(registros)} proposições gravadas no histórico em s3://{bucket}/{key}")
+
+    # Só os índices dos anos presentes no lote são lidos e reescritos
+    for ano, slugs in novos.items():
+        indice = carregar_indice(bucket, ano)
+        indice.update(slugs)
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=indice_key(ano),
+            Body=json.dumps(indice, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            ContentType="application/json"
+        )
+    return gravadas
+
+
+def ler_particao(bucket: str, data: date) -> list[dict]:
+    """Lê as proposições de um único dia do histórico."""
+    import pyarrow.parquet as pq
+
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=particao_key(data))
+    except ClientError:
+        return []
+    return pq.read_table(io.BytesIO(s3_object["Body"].read())).to_pylist()
+
+
+def buscar_proposicao(bucket: str, slug: str):
+    """
+    Busca uma proposição no histórico pelo slug, lendo apenas o índice do ano dela
+    e a partição indicada nele. Retorna None se ela não estiver no histórico.
+    """
+    data = carregar_indice(bucket, ano_do_slug(slug)).get(slug)
+    if not data:
+        return None
+
+    for registro in ler_particao(bucket, date.fromisoformat(data)):
+        if registro["Proposições_slugified"] == slug:
+            return registro
+    return None
@@ -0,0 +1,59 @@
+import os
+import json
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+IDEMPOTENCY_PREFIX = "state/processed"
+# Ignora o índice e reprocessa tudo (ex: depois de mudar o prompt)
+FORCAR_REPROCESSAMENTO = os.getenv("IDEMPOTENCY_FORCE", "false").lower() == "true"
+
+# Etapas registradas no índice
+ETAPA_FETCH = "fetch_individual_project"
+ETAPA_GENERATE = "generate_tweet"
+ETAPA_SCHEDULE = "schedule_tweet"
+
+# Marcadores já vistos nesta instância da Lambda (warm start)
+_processados = {}
+
+
+def marcador_key(etapa: str, slug: str) -> str:
+    """Key do marcador de uma proposição em uma etapa: state/processed/<etapa>/<slug>.json"""
+    return f"{IDEMPOTENCY_PREFIX}/{etapa}/{slug}.json"
+
+
+def ja_processado(bucket: str, etapa: str, slug: str):
+    """
+    Consulta o índice de proposições processadas (um objeto por slug + etapa, leitura O(1)).
+    Retorna os detalhes gravados no marcador, ou None se a proposição ainda não passou pela etapa.
+    """
+    if FORCAR_REPROCESSAMENTO:
+        return None
+
+    chave = (etapa, slug)
+    if chave in _processados:
+        return _processados[chave]
+
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=marcador_key(etapa, slug))
+    except ClientError:
+        # Sem s3:ListBucket o S3 devolve AccessDenied em vez de NoSuchKey
+        return None
+
+    detalhes = json.loads(s3_object["Body"].read().decode("utf-8"))
+    _processados[chave] = detalhes
+    return detalhes
+
+
+def marcar_processado(bucket: str, etapa: str, slug: str, detalhes: dict = None):
+    """Registra que a proposição concluiu a etapa, com detalhes para reaproveitar o resultado."""
+    detalhes = {**(detalhes or {}), "processado_em": datetime.now(timezone.utc).isoformat()}
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=marcador_key(etapa, slug),
+        Body=json.dumps(detalhes, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json"
+    )
+    _processados[(etapa, slug)] = detalhes
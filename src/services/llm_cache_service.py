@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+LLM_CACHE_PREFIX = "cache/llm"
+# Validade das respostas em cache; o lifecycle do bucket expira o prefixo com o mesmo
+# valor (parâmetro LLMCacheTTLDays do template)
+LLM_CACHE_TTL_DAYS = int(os.getenv("LLM_CACHE_TTL_DAYS", "30"))
+
+
+def chave_cache(**partes) -> str:
+    """
+    Hash sha256 (content-addressed) das entradas da chamada ao modelo:
+    ementa, texto, modelo, prompts, versão do prompt, temperatura...
+    """
+    conteudo = json.dumps(partes, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def cache_key(chave: str) -> str:
+    return f"{LLM_CACHE_PREFIX}/{chave[:2]}/{chave}.json"
+
+
+def ler_cache(bucket: str, chave: str):
+    """
+    Retorna o valor em cache para a chave, ou None se não existir ou tiver expirado.
+    """
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=cache_key(chave))
+    except ClientError:
+        return None
+
+    entrada = json.loads(s3_object["Body"].read().decode("utf-8"))
+    if datetime.fromisoformat(entrada["expira_em"]) <= datetime.now(timezone.utc):
+        print(f"⌛ Cache LLM expirado para {chave[:12]}.")
+        return None
+    return entrada["valor"]
+
+
+def salvar_cache(bucket: str, chave: str, valor: dict, metadados: dict = None, ttl_days: int = LLM_CACHE_TTL_DAYS):
+    """
+    Grava o valor no cache com metadados de criação/expiração. A expiração vale pelo
+    campo expira_em (conferido em ler_cache) e vai também nos metadados do objeto;
+    quem apaga o objeto é o lifecycle do bucket.
+    """
+    agora = datetime.now(timezone.utc)
+    expira_em = (agora + timedelta(days=ttl_days)).isoformat()
+    entrada = {
+        **(metadados or {}),
+        "criado_em": agora.isoformat(),
+        "expira_em": expira_em,
+        "valor": valor,
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=cache_key(chave),
+        Body=json.dumps(entrada, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json",
+        Metadata={"expira-em": expira_em},
+    )
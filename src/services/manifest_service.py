@@ -0,0 +1,47 @@
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+MANIFEST_PREFIX = "manifests"
+
+
+def manifesto_key(etapa: str, data: str = None) -> str:
+    """
+    Key do manifesto de uma etapa da pipeline, particionada pela data da execução.
+    Ex: manifests/2025-10-14/clean_csv.jsonl
+    """
+    data = data or datetime.now(ZoneInfo("America/Sao_Paulo")).strftime("%Y-%m-%d")
+    return f"{MANIFEST_PREFIX}/{data}/{etapa}.jsonl"
+
+
+def salvar_manifesto(bucket: str, key: str, registros: list[dict]) -> int:
+    """
+    Salva os registros como JSON Lines compacto no S3 (um objeto por linha).
+    Apenas a key trafega pelo estado da Step Function (claim-check).
+    Retorna o número de registros gravados.
+    """
+    corpo = "".join(
+        json.dumps(registro, ensure_ascii=False, separators=(",", ":")) + "\n"
+        for registro in registros
+    )
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=corpo.encode("utf-8"),
+        ContentType="application/x-ndjson"
+    )
+    print(f"🧾 Manifesto com {len(registros)} registros salvo em s3://{bucket}/{key}")
+    return len(registros)
+
+
+def ler_manifesto(bucket: str, key: str) -> list[dict]:
+    """Lê um manifesto JSON Lines do S3, linha a linha."""
+    s3_object = s3_client.get_object(Bucket=bucket, Key=key)
+    return [
+        json.loads(linha)
+        for linha in s3_object["Body"].iter_lines()
+        if linha.strip()
+    ]
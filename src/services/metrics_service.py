@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlparse
+
+# Métricas estruturadas no formato EMF (Embedded Metric Format): cada linha JSON
+# impressa no stdout vira métrica no CloudWatch, sem chamadas extras à API.
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "XBot")
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# O EMF aceita até 100 valores por métrica em um registro
+MAX_AMOSTRAS = 100
+
+# Unidade de cada métrica somada com registrar()
+UNIDADES = {
+    "bytes_baixados": "Bytes",
+    "bytes_enviados": "Bytes",
+    "paginas_pdf": "Count",
+    "tokens_entrada": "Count",
+    "tokens_saida": "Count",
+    "tokens_cache": "Count",
+    "falhas": "Count",
+    "s3_ausentes": "Count",
+}
+
+# Leituras no S3 em que 403/404 é resposta esperada (cache, marcador ou arquivo que
+# ainda não existe): contam como s3_ausentes, não como http_erros
+LEITURAS_S3 = ("GetObject", "HeadObject")
+
+_INICIO_PROCESSO = time.monotonic()
+_cold_start = True
+_lock = threading.Lock()
+
+
+def _novo_coletor() -> dict:
+    # {"totais": {métrica: valor}, "etapas": {etapa: [ms]}, "hosts": {host: {"latencias": [ms], "erros": n}}}
+    return {"totais": {}, "etapas": {}, "hosts": {}}
+
+
+# Coletor da invocação atual, criado a cada lambda_handler. As threads de um
+# ThreadPoolExecutor não herdam o contexto e usam o da última invocação iniciada
+# (na Lambda há uma invocação por vez no processo).
+_coletor = ContextVar("metricas", default=None)
+_ultimo = _novo_coletor()
+
+
+def _atual() -> dict:
+    return _coletor.get() or _ultimo
+
+
+def registrar(metrica: str, valor: float = 1, unidade: str = None):
+    """Soma 'valor' à métrica da invocação atual (ex: bytes_baixados, paginas_pdf)."""
+    if unidade:
+        UNIDADES.setdefault(metrica, unidade)
+    with _lock:
+        totais = _atual()["totais"]
+        totais[metrica] = totais.get(metrica, 0) + valor
+
+
+def registrar_http(url: str, latencia_ms: float, status: int = None, erro: bool = None):
+    """
+    Latência de uma requisição, agrupada pelo host da URL; status >= 400 conta como erro,
+    a menos que 'erro' diga o contrário.
+    """
+    host = urlparse(url).hostname or "desconhecido"
+    if erro is None:
+        erro = status is None or status >= 400
+    with _lock:
+        dados = _atual()["hosts"].setdefault(host, {"latencias": [], "erros": 0})
+        dados["latencias"].append(latencia_ms)
+        if erro:
+            dados["erros"] += 1
+
+
+def registrar_uso_openai(usage):
+    """Tokens de entrada, saída e de entrada servidos do cache de prompt (objeto do SDK ou dict do batch)."""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump()
+    registrar("tokens_entrada", usage.get("input_tokens") or 0)
+    registrar("tokens_saida", usage.get("output_tokens") or 0)
+    registrar("tokens_cache", (usage.get("input_tokens_details") or {}).get("cached_tokens") or 0)
+
+
+@contextmanager
+def etapa(nome: str):
+    """
+    Mede a duração de uma etapa (ms). Funciona como context manager ou decorator:
+        with etapa("baixar_pdf"): ...
+        @etapa("limpar_csv")
+    Etapas repetidas na mesma invocação (ex: uma por proposição) acumulam amostras.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        with _lock:
+            _atual()["etapas"].setdefault(nome, []).append(duracao_ms)
+
+
+def instrumentar_sessao(session):
+    """Adiciona à sessão do requests um hook que registra a latência de cada resposta por host."""
+    def medir(response, *args, **kwargs):
+        registrar_http(response.url, response.elapsed.total_seconds() * 1000, response.status_code)
+
+    session.hooks["response"].append(medir)
+    return session
+
+
+def _tamanho_corpo(corpo) -> int:
+    if corpo is None:
+        return 0
+    if isinstance(corpo, (bytes, bytearray, str)):
+        return len(corpo)
+    try:
+        # Arquivo (upload_file): tamanho restante a partir da posição atual
+        posicao = corpo.tell()
+        corpo.seek(0, os.SEEK_END)
+        fim = corpo.tell()
+        corpo.seek(posicao)
+        return fim - posicao
+    except Exception:
+        return 0
+
+
+def instrumentar_cliente(client):
+    """
+    Registra nos eventos do botocore a latência de cada chamada por host (endpoint)
+    e, no S3, os bytes enviados (PutObject/UploadPart) e baixados (GetObject).
+    403/404 em GetObject/HeadObject conta como s3_ausentes, não como erro.
+    """
+    host = client.meta.endpoint_url
+
+    def antes(params=None, context=None, model=None, **kwargs):
+        context["metricas_inicio"] = time.perf_counter()
+        if model.name in ("PutObject", "UploadPart"):
+            registrar("bytes_enviados", _tamanho_corpo((params or {}).get("body")))
+
+    def depois(http_response=None, parsed=None, context=None, model=None, **kwargs):
+        inicio = context.get("metricas_inicio")
+        if inicio is not None:
+            status = getattr(http_response, "status_code", None)
+            ausente = model.name in LEITURAS_S3 and status in (403, 404)
+            if ausente:
+                registrar("s3_ausentes")
+            registrar_http(host, (time.perf_counter() - inicio) * 1000, status, erro=False if ausente else None)
+        if model.name == "GetObject" and parsed:
+            registrar("bytes_baixados", parsed.get("ContentLength") or 0)
+
+    client.meta.events.register("before-call.*.*", antes)
+    client.meta.events.register("after-call.*.*", depois)
+    return client
+
+
+def _registro(dimensoes: dict, metricas: dict, unidades: dict, propriedades: dict = None) -> dict:
+    """Um registro EMF: dimensões e métricas no topo do JSON, declaradas em _aws."""
+    return {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": METRICS_NAMESPACE,
+                "Dimensions": [list(dimensoes)],
+                "Metrics": [{"Name": nome, "Unit": unidades[nome]} for nome in metricas],
+            }],
+        },
+        **dimensoes,
+        **metricas,
+        **(propriedades or {}),
+    }
+
+
+def registros(funcao: str, duracao_ms: float, cold_start: bool, propriedades: dict = None) -> list[dict]:
+    """
+    Registros EMF da invocação atual: um com os totais da função (duração, cold start,
+    bytes, páginas, tokens), um por etapa (Etapa) e um por host (Host).
+    """
+    coletor = _atual()
+    with _lock:
+        totais = dict(coletor["totais"])
+        etapas = {nome: list(amostras) for nome, amostras in coletor["etapas"].items()}
+        hosts = {host: {"latencias": list(d["latencias"]), "erros": d["erros"]} for host, d in coletor["hosts"].items()}
+
+    metricas = {"duracao_ms": round(duracao_ms, 1), "cold_start": int(cold_start), **totais}
+    unidades = {"duracao_ms": "Milliseconds", "cold_start": "Count",
+                **{nome: UNIDADES.get(nome, "Count") for nome in totais}}
+    saida = [_registro({"Funcao": funcao}, metricas, unidades, propriedades)]
+
+    for nome, amostras in etapas.items():
+        saida.append(_registro(
+            {"Funcao": funcao, "Etapa": nome},
+            {"etapa_ms": [round(a, 1) for a in amostras[:MAX_AMOSTRAS]]},
+            {"etapa_ms": "Milliseconds"},
+            {"execucoes": len(amostras), "total_ms": round(sum(amostras), 1)},
+        ))
+
+    for host, dados in hosts.items():
+        saida.append(_registro(
+            {"Funcao": funcao, "Host": host},
+            {"http_latencia_ms": [round(a, 1) for a in dados["latencias"][:MAX_AMOSTRAS]],
+             "http_requisicoes": len(dados["latencias"]), "http_erros": dados["erros"]},
+            {"http_latencia_ms": "Milliseconds", "http_requisicoes": "Count", "http_erros": "Count"},
+        ))
+    return saida
+
+
+def metricas_lambda(handler):
+    """
+    Decorator para lambda_handler: começa um coletor novo a cada invocação e, no fim
+    (com sucesso ou erro), imprime os registros EMF com a duração, se foi cold start
+    (e o tempo de inicialização do processo até a primeira invocação) e o que os
+    services registraram.
+    """
+    funcao = handler.__module__.rsplit(".", 1)[-1]
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _cold_start, _ultimo
+        cold_start, _cold_start = _cold_start, False
+        propriedades = {"request_id": getattr(context, "aws_request_id", None)}
+        if cold_start:
+            propriedades["inicializacao_ms"] = round((time.monotonic() - _INICIO_PROCESSO) * 1000, 1)
+
+        _ultimo = _novo_coletor()
+        token = _coletor.set(_ultimo)
+        # Sempre presente (0 ou 1), para alarmes sobre a taxa de falhas
+        registrar("falhas", 0)
+        inicio = time.perf_counter()
+        try:
+            return handler(event, context)
+        except Exception as e:
+            registrar("falhas", 1)
+            propriedades["erro"] = type(e).__name__
+            raise
+        finally:
+            if METRICS_ENABLED:
+                duracao_ms = (time.perf_counter() - inicio) * 1000
+                linhas = [json.dumps(r, ensure_ascii=False) for r in registros(funcao, duracao_ms, cold_start, propriedades)]
+                # Uma única escrita: registros de invocações concorrentes (execução local) não se misturam
+                sys.stdout.write("\n".join(linhas) + "\n")
+            _coletor.reset(token)
+
+    return wrapper
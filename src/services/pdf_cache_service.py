@@ -0,0 +1,56 @@
+import os
+import json
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+# Por quanto tempo um inteiro teor já extraído é reaproveitado sem nenhuma requisição
+CACHE_TTL_SECONDS = int(os.getenv("FETCH_CACHE_TTL_SECONDS", "86400"))
+
+
+def metadados_key(nome: str) -> str:
+    """Key dos metadados do cache, salva ao lado do inteiro_teor.txt."""
+    return f"propositions/{nome}/inteiro_teor.meta.json"
+
+
+def carregar_metadados(bucket: str, nome: str):
+    """
+    Lê os metadados do cache (ETag, Last-Modified, hash do PDF...) da proposição.
+    Retorna None se não existirem.
+    """
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=metadados_key(nome))
+        return json.loads(s3_object["Body"].read().decode("utf-8"))
+    except ClientError:
+        # Sem s3:ListBucket o S3 devolve AccessDenied em vez de NoSuchKey
+        return None
+
+
+def salvar_metadados(bucket: str, nome: str, metadados: dict):
+    """Grava os metadados do cache, marcando o horário da última verificação."""
+    metadados = {**metadados, "verificado_em": datetime.now(timezone.utc).isoformat()}
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=metadados_key(nome),
+        Body=json.dumps(metadados, ensure_ascii=False).encode("utf-8"),
+        ContentType="application/json"
+    )
+
+
+def cache_fresco(metadados: dict, link: str, ttl_seconds: int = CACHE_TTL_SECONDS) -> bool:
+    """
+    Indica se o texto em cache pode ser reaproveitado sem tocar na rede:
+    mesma página de origem, texto já salvo e verificação dentro do TTL.
+    """
+    if not metadados or not metadados.get("inteiro_teor_key"):
+        return False
+    if metadados.get("link") != link:
+        return False
+
+    verificado_em = metadados.get("verificado_em")
+    if not verificado_em:
+        return False
+    idade = datetime.now(timezone.utc) - datetime.fromisoformat(verificado_em)
+    return idade.total_seconds() < ttl_seconds
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime, date
+from zoneinfo import ZoneInfo
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+# Um objeto por post gerado, particionado pelo dia da geração (horário de Brasília):
+# state/pending/2025-10-14/<slug>.json -> {"s3_key": "propositions/<slug>/post_data.json", ...}
+PENDING_PREFIX = "state/pending"
+FUSO = ZoneInfo("America/Sao_Paulo")
+
+
+def dia_pendente(data: date = None) -> str:
+    return (data or datetime.now(FUSO).date()).strftime("%Y-%m-%d")
+
+
+def pendente_key(post_data_key: str, data: date = None) -> str:
+    """state/pending/<dia>/<slug>.json, com o slug de 'propositions/<slug>/post_data.json'."""
+    return f"{PENDING_PREFIX}/{dia_pendente(data)}/{post_data_key.split('/')[1]}.json"
+
+
+def post_do_registro(registro_key: str) -> str:
+    """Caminho inverso de pendente_key: o nome do registro já identifica o post_data.json."""
+    slug = registro_key.rsplit("/", 1)[1].removesuffix(".json")
+    return f"propositions/{slug}/post_data.json"
+
+
+def registrar_pendente(bucket: str, post_data_key: str, data: date = None) -> str:
+    """
+    Registra o post_data.json no índice do dia. Um objeto por post (e não um manifesto
+    único) para que invocações concorrentes do Map não sobrescrevam umas às outras.
+    Retorna a key do registro.
+    """
+    key = pendente_key(post_data_key, data)
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps({
+            "s3_key": post_data_key,
+            "registrado_em": datetime.now(FUSO).isoformat(),
+        }).encode("utf-8"),
+        ContentType="application/json"
+    )
+    return key
+
+
+def listar_pendentes(bucket: str, data: date) -> list[str]:
+    """
+    Keys dos post_data.json registrados no dia, listando apenas o prefixo daquele dia:
+    o custo é proporcional aos posts do dia, não ao histórico do bucket.
+    Os registros não precisam ser lidos, o nome de cada um já aponta para o post.
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    registros = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{PENDING_PREFIX}/{dia_pendente(data)}/"):
+        registros.extend(obj["Key"] for obj in page.get("Contents", []))
+    return [post_do_registro(key) for key in sorted(registros)]
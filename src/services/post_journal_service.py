@@ -0,0 +1,76 @@
+import copy
+import json
+import threading
+from datetime import datetime, timezone
+from botocore.exceptions import ClientError
+from services.resource_cache_service import cliente_boto3
+
+s3_client = cliente_boto3("s3")
+
+# Journal ao lado do post: propositions/<slug>/post_journal.json
+# {"s3_key": ..., "plataformas": {"bluesky": {"posts": [...], "publicado": true, ...}, "x": {"ids": [...], ...}}}
+JOURNAL_FILENAME = "post_journal.json"
+
+
+def journal_key(post_data_key: str) -> str:
+    return post_data_key.rsplit("/", 1)[0] + f"/{JOURNAL_FILENAME}"
+
+
+class JournalPost:
+    """
+    Progresso da publicação de um post, por plataforma, persistido no S3 a cada
+    registro publicado. Uma nova tentativa (retry do EventBridge, fila) carrega o
+    journal e continua de onde parou: plataformas concluídas são puladas e threads
+    parciais continuam a partir do último post confirmado.
+    """
+
+    def __init__(self, bucket: str, post_data_key: str):
+        self.bucket = bucket
+        self.key = journal_key(post_data_key)
+        self._lock = threading.Lock()
+        self.dados = self._carregar() or {"s3_key": post_data_key, "plataformas": {}}
+
+    def _carregar(self) -> dict | None:
+        try:
+            s3_object = s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError:
+            # Sem s3:ListBucket o S3 devolve AccessDenied em vez de NoSuchKey
+            return None
+        dados = json.loads(s3_object["Body"].read().decode("utf-8"))
+        print(f"📓 Journal encontrado em {self.key}: retomando a publicação.")
+        return dados
+
+    def progresso(self, plataforma: str) -> dict:
+        """
+        Cópia do progresso da plataforma. Cada plataforma trabalha na própria cópia e a
+        devolve com registrar(): 'dados' só é alterado (e serializado) sob o lock.
+        """
+        with self._lock:
+            return copy.deepcopy(self.dados["plataformas"].get(plataforma, {}))
+
+    def concluido(self, plataforma: str) -> bool:
+        with self._lock:
+            return bool(self.dados["plataformas"].get(plataforma, {}).get("publicado"))
+
+    def registrar(self, plataforma: str, progresso: dict):
+        """
+        Grava o progresso da plataforma. Chamado pela thread dona de 'progresso', que é
+        copiado antes de entrar no journal (a thread continua alterando o original).
+        """
+        retrato = copy.deepcopy(progresso)
+        with self._lock:
+            self.dados["plataformas"].setdefault(plataforma, {}).update(retrato)
+            self._gravar()
+
+    def concluir(self, plataforma: str, resultado: dict):
+        """Marca a plataforma como publicada: novas tentativas não chamam mais a API dela."""
+        with self._lock:
+            self.dados["plataformas"].setdefault(plataforma, {}).update(publicado=True, resultado=copy.deepcopy(resultado))
+            self._gravar()
+
+    def _gravar(self):
+        # Chamado com o lock: ninguém altera 'dados' durante a serialização, e as
+        # gravações de plataformas diferentes chegam ao S3 na ordem em que foram feitas
+        self.dados["atualizado_em"] = datetime.now(timezone.utc).isoformat()
+        corpo = json.dumps(self.dados, ensure_ascii=False).encode("utf-8")
+        s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=corpo, ContentType="application/json")
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import uuid
+import fcntl
+from datetime import datetime, timedelta, timezone
+from services.resource_cache_service import cliente_boto3
+from services.metrics_service import etapa
+from services.slug_service import slug
+
+# Fila FIFO no SQS (produção) ou arquivo local (testes / execução offline)
+POST_QUEUE_URL = os.getenv("POST_QUEUE_URL")
+POST_QUEUE_LOCAL_PATH = os.getenv("POST_QUEUE_LOCAL_PATH")
+# Tempo que a mensagem fica invisível enquanto o post é publicado
+VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("POST_QUEUE_VISIBILITY_SECONDS", "120"))
+# Recebimentos até a mensagem ir para a DLQ (mesmo valor do maxReceiveCount da fila)
+MAX_RECEIVES = int(os.getenv("POST_QUEUE_MAX_RECEIVES", "10"))
+# Maior visibility timeout aceito pelo SQS (12 horas)
+MAX_VISIBILITY_SECONDS = 12 * 60 * 60
+MESSAGE_GROUP_ID = "posts"
+
+
+class FilaSQS:
+    """
+    Fila FIFO do SQS com um único MessageGroupId: as mensagens saem estritamente
+    na ordem de envio, e uma mensagem em processamento bloqueia as seguintes.
+    """
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self.sqs = cliente_boto3("sqs")
+
+    def enviar(self, mensagens: list[dict]):
+        for inicio in range(0, len(mensagens), 10):
+            lote = mensagens[inicio:inicio + 10]
+            resposta = self.sqs.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {
+                        "Id": str(i),
+                        "MessageBody": json.dumps(mensagem),
+                        "MessageGroupId": MESSAGE_GROUP_ID,
+                        # Reenviar o mesmo post na janela de deduplicação (5 min) não duplica
+                        "MessageDeduplicationId": slug(mensagem["s3_key"])[:128],
+                    }
+                    for i, mensagem in enumerate(lote)
+                ],
+            )
+            if resposta.get("Failed"):
+                raise RuntimeError(f"Falha ao enfileirar posts: {resposta['Failed']}")
+
+    def proxima(self):
+        """Recebe a mensagem da frente da fila. Retorna (mensagem, recibo) ou None."""
+        resposta = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=1,
+            VisibilityTimeout=VISIBILITY_TIMEOUT_SECONDS,
+            WaitTimeSeconds=1,
+        )
+        mensagens = resposta.get("Messages", [])
+        if not mensagens:
+            return None
+        return json.loads(mensagens[0]["Body"]), mensagens[0]["ReceiptHandle"]
+
+    def confirmar(self, recibo: str):
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=recibo)
+
+    def devolver(self, recibo: str, atraso_seconds: float = 0):
+        """
+        Devolve a mensagem para a frente da fila, invisível por 'atraso_seconds'.
+        Cada recebimento conta para o maxReceiveCount: um post que ainda não venceu
+        fica escondido até o horário dele, em vez de ser recebido a cada despertar.
+        """
+        visibilidade = int(min(max(0, atraso_seconds), MAX_VISIBILITY_SECONDS))
+        self.sqs.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=recibo, VisibilityTimeout=visibilidade)
+
+
+class FilaLocal:
+    """
+    Stand-in local da fila: um arquivo JSON com a lista ordenada de mensagens,
+    protegido por flock para poder ser compartilhado entre processos.
+    Mensagens recebidas ficam reservadas até serem confirmadas ou devolvidas.
+    Como no SQS, cada recebimento é contado e, passado 'max_recebimentos', a
+    mensagem sai da fila para a lista "dlq" do mesmo arquivo.
+    """
+
+    def __init__(self, caminho: str, max_recebimentos: int = MAX_RECEIVES):
+        self.caminho = caminho
+        self.max_recebimentos = max_recebimentos
+
+    def _alterar(self, funcao):
+        with open(self.caminho, "a+", encoding="utf-8") as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            arquivo.seek(0)
+            conteudo = arquivo.read()
+            dados = json.loads(conteudo) if conteudo else {}
+            # Formato antigo: só a lista de mensagens
+            dados = {"mensagens": dados, "dlq": []} if isinstance(dados, list) else {"mensagens": [], "dlq": [], **dados}
+            resultado = funcao(dados["mensagens"], dados["dlq"])
+            arquivo.seek(0)
+            arquivo.truncate()
+            json.dump(dados, arquivo, ensure_ascii=False)
+            return resultado
+
+    def enviar(self, mensagens: list[dict]):
+        def adicionar(estado, dlq):
+            existentes = {item["mensagem"]["s3_key"] for item in estado}
+            for mensagem in mensagens:
+                if mensagem["s3_key"] not in existentes:
+                    estado.append({"id": uuid.uuid4().hex, "mensagem": mensagem, "reservada_ate": 0, "recebimentos": 0})
+        self._alterar(adicionar)
+
+    def proxima(self):
+        def receber(estado, dlq):
+            while estado:
+                # FIFO com um único grupo: só a cabeça da fila pode ser entregue
+                cabeca = estado[0]
+                if cabeca["reservada_ate"] > time.time():
+                    return None
+                if cabeca.get("recebimentos", 0) >= self.max_recebimentos:
+                    dlq.append(estado.pop(0))
+                    continue
+                cabeca["recebimentos"] = cabeca.get("recebimentos", 0) + 1
+                cabeca["reservada_ate"] = time.time() + VISIBILITY_TIMEOUT_SECONDS
+                return cabeca["mensagem"], cabeca["id"]
+            return None
+        return self._alterar(receber)
+
+    def confirmar(self, recibo: str):
+        def remover(estado, dlq):
+            estado[:] = [item for item in estado if item["id"] != recibo]
+        self._alterar(remover)
+
+    def devolver(self, recibo: str, atraso_seconds: float = 0):
+        def liberar(estado, dlq):
+            for item in estado:
+                if item["id"] == recibo:
+                    item["reservada_ate"] = time.time() + max(0, atraso_seconds)
+        self._alterar(liberar)
+
+
+def obter_fila():
+    """Fila configurada no ambiente: POST_QUEUE_URL (SQS) ou POST_QUEUE_LOCAL_PATH (arquivo)."""
+    if POST_QUEUE_URL:
+        return FilaSQS(POST_QUEUE_URL)
+    if POST_QUEUE_LOCAL_PATH:
+        return FilaLocal(POST_QUEUE_LOCAL_PATH)
+    raise ValueError("Defina POST_QUEUE_URL ou POST_QUEUE_LOCAL_PATH para usar a fila de posts.")
+
+
+@etapa("enfileirar_posts")
+def enfileirar_posts(fila, tweet_keys: list[str], start_time: datetime, interval_minutes: int) -> list[str]:
+    """
+    Enfileira os posts do dia na ordem recebida, cada um com o horário mínimo de
+    publicação ('nao_antes_de'): o mesmo espaçamento dos agendamentos one-time.
+    """
+    if start_time.tzinfo is None:
+        raise ValueError("Erro: O start_time deve ter um fuso horário definido (timezone-aware).")
+
+    fila.enviar([
+        {
+            "s3_key": key,
+            "nao_antes_de": (start_time + timedelta(minutes=interval_minutes * i)).astimezone(timezone.utc).isoformat(),
+        }
+        for i, key in enumerate(tweet_keys)
+    ])
+    print(f"📬 {len(tweet_keys)} posts enfileirados a cada {interval_minutes} min a partir de {start_time.isoformat()}.")
+    return list(tweet_keys)
+
+
+def drenar_fila(
+    fila,
+    publicar,
+    tempo_restante=lambda: float("inf"),
+    margem_seconds: float = 30,
+    duracao_publicacao_seconds: float = 0
+) -> dict:
+    """
+    Publica, em ordem, os posts cujo 'nao_antes_de' já passou. Se o próximo post vence
+    a tempo de ser publicado nesta invocação (e dentro do visibility timeout), espera por ele;
+    caso contrário devolve a mensagem, invisível até o horário dela, e encerra até o próximo despertar.
+    'duracao_publicacao_seconds' é o pior caso de um publicar() (o maior prazo entre as plataformas):
+    um post só começa se ainda restar esse tempo além da margem, para a Lambda não ser
+    encerrada no meio da publicação.
+    'publicar(s3_key)' recebe cada post; uma falha interrompe a drenagem para preservar
+    a ordem (a mensagem volta a ficar visível após o visibility timeout).
+    """
+    publicados, erro = [], None
+
+    def limite_atual() -> float:
+        # Tempo que ainda dá para esperar por um post e publicá-lo inteiro nesta invocação
+        return min(tempo_restante(), VISIBILITY_TIMEOUT_SECONDS) - margem_seconds - duracao_publicacao_seconds
+
+    while True:
+        # Sem tempo nem para um post já vencido: encerra antes de receber (cada recebimento conta para a DLQ)
+        if limite_atual() < 0:
+            print("⏭️ Sem tempo para publicar mais um post nesta invocação, fica para o próximo ciclo.")
+            break
+        recebida = fila.proxima()
+        if recebida is None:
+            break
+        mensagem, recibo = recebida
+
+        # Post atrasado (espera negativa) não ganha tempo extra: conta como espera zero
+        espera = max(0.0, (datetime.fromisoformat(mensagem["nao_antes_de"]) - datetime.now(timezone.utc)).total_seconds())
+        if espera > limite_atual():
+            # Sem recebimentos extras até o horário do post (cada um conta para a DLQ)
+            fila.devolver(recibo, espera)
+            print(f"⏭️ Próximo post ({mensagem['s3_key']}) só em {espera:.0f}s, aguardando o próximo ciclo.")
+            break
+        if espera > 0:
+            time.sleep(espera)
+
+        try:
+            publicar(mensagem["s3_key"])
+        except Exception as e:
+            erro = f"{mensagem['s3_key']}: {e}"
+            print(f"❌ Falha ao publicar {mensagem['s3_key']}, drenagem interrompida: {e}")
+            break
+
+        fila.confirmar(recibo)
+        publicados.append(mensagem["s3_key"])
+
+    return {"publicados": publicados, "erro": erro}
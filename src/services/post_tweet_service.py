@@ -1,28 +1,44 @@
-import requests
+import re
 import logging
 import json
+import requests
+import tweepy
 from datetime import datetime, timezone
+from services.bluesky_session_service import obter_sessao, xrpc_post, TIMEOUT_SECONDS, BLUESKY_PDS_URL
+from services.resource_cache_service import sessao_http
+from services.metrics_service import instrumentar_sessao
+from services.atproto_service import cid_registro, gerar_tid
+
+COLECAO_POST = "app.bsky.feed.post"
+ORDEM_THREAD = ('root_post', 'reply_one', 'reply_two', 'reply_three')
+
+# Limite de caracteres por post em cada plataforma
+LIMITES_POST = {"bluesky": 300, "x": 280}
+# O X conta todo link como um t.co de 23 caracteres, e caracteres fora dos
+# intervalos latinos/pontuação comuns (CJK, emoji...) valem 2
+TAMANHO_LINK_X = 23
+URL_RE = re.compile(r"https?://\S+")
+INTERVALOS_PESO_1_X = ((0, 4351), (8192, 8205), (8208, 8223), (8242, 8247))
 
 # TODO:
 # Formatar link para bluesky
 
-def get_bluesky_session(BLUESKY_HANDLE: str, BLUESKY_APP_PASSWORD: str):
-    resp = requests.post(
-        "https://bsky.social/xrpc/com.atproto.server.createSession",
-        json={"identifier": BLUESKY_HANDLE, "password": BLUESKY_APP_PASSWORD},
-    )
-    resp.raise_for_status()
-    session = resp.json()
-    return session
+def tamanho_post(texto: str, plataforma: str = "bluesky") -> int:
+    """Tamanho do texto como a plataforma conta para o limite."""
+    if plataforma != "x":
+        return len(texto)
+    sem_links = URL_RE.sub("", texto)
+    peso = sum(1 if any(a <= ord(c) <= b for a, b in INTERVALOS_PESO_1_X) else 2 for c in sem_links)
+    return peso + TAMANHO_LINK_X * len(URL_RE.findall(texto))
+
 
-def format_posts(json_content: dict):
-    POST_LIMIT = 300
+def format_posts(json_content: dict, plataforma: str = "bluesky"):
+    POST_LIMIT = LIMITES_POST[plataforma]
 
     root_post = f"{json_content['numero']}\n{json_content['autor']} ({json_content['partido']})"
-    reply_one = f"{json_content['ementa_resumida']}"
-    points_text = "\n".join([f"- {p}" for p in json_content["pontos_chave"]])
-    reply_two = "Resumo: \n" + points_text
-    reply_three = f"Justificativa: {json_content['justificativa']}\n{json_content['link']}"
+    reply_one = f"{json_content['ementa_post']}"
+    reply_two = "Resumo: \n" + json_content["pontos_post"]
+    reply_three = f"Justificativa: {json_content['justificativa_post']}\n{json_content['link']}"
 
     formatted_posts = {
         'root_post': root_post,
@@ -32,14 +48,20 @@ def format_posts(json_content: dict):
     }
 
     for post_name, post_text in formatted_posts.items():
-        if len(post_text) > POST_LIMIT:
+        if tamanho_post(post_text, plataforma) > POST_LIMIT:
             # Lança uma exceção se qualquer post for muito longo
             raise ValueError(
-                f"O post '{post_name}' excedeu o limite de {POST_LIMIT} caracteres. "
-                f"Tamanho atual: {len(post_text)}"
+                f"O post '{post_name}' excedeu o limite de {POST_LIMIT} caracteres ({plataforma}). "
+                f"Tamanho atual: {tamanho_post(post_text, plataforma)}"
             )
     return formatted_posts
 
+
+def textos_thread(json_content: dict, plataforma: str = "bluesky") -> list[str]:
+    """Textos da thread na ordem de publicação, já validados no limite da plataforma."""
+    formatted_posts = format_posts(json_content, plataforma)
+    return [formatted_posts[k] for k in ORDEM_THREAD]
+
 def reply_payload(content: str, root_uri: str, root_cid: str, parent_uri: str, parent_cid: str):
     now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
@@ -59,87 +81,175 @@ def reply_payload(content: str, root_uri: str, root_cid: str, parent_uri: str, p
         }
     }
 
+def montar_thread(did: str, textos: list[str]) -> list[dict]:
+    """
+    Monta os registros da thread com rkey (TID) e CID calculados localmente, para que
+    cada reply já aponte para o uri/cid do post anterior antes de qualquer chamada à API.
+    Retorna [{"rkey", "uri", "cid", "record"}] na ordem da thread.
+    """
+    posts = []
+    for texto in textos:
+        if posts:
+            root, parent = posts[0], posts[-1]
+            record = reply_payload(texto, root["uri"], root["cid"], parent["uri"], parent["cid"])
+        else:
+            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+            record = {"$type": COLECAO_POST, "text": texto, "createdAt": now}
+
+        rkey = gerar_tid()
+        posts.append({
+            "rkey": rkey,
+            "uri": f"at://{did}/{COLECAO_POST}/{rkey}",
+            "cid": cid_registro(record),
+            "record": record,
+        })
+    return posts
+
+
+def registro_existe(uri: str, cid: str, timeout: float = TIMEOUT_SECONDS) -> bool:
+    """
+    Consulta o registro no PDS (com.atproto.repo.getRecord, sem autenticação).
+    Usado na retomada: se a escrita anterior foi aplicada mas a resposta se perdeu,
+    o registro já existe com o mesmo CID e não deve ser criado de novo.
+    """
+    did, colecao, rkey = uri.removeprefix("at://").split("/")
+    resp = sessao_http("bluesky").get(
+        f"{BLUESKY_PDS_URL}/xrpc/com.atproto.repo.getRecord",
+        params={"repo": did, "collection": colecao, "rkey": rkey},
+        timeout=timeout,
+    )
+    if resp.status_code == 400 and resp.json().get("error") == "RecordNotFound":
+        return False
+    resp.raise_for_status()
+    return resp.json().get("cid") == cid
+
+
 # 🐦 Função de postagem agora recebe as credenciais e as repassa
-def create_bluesky_post(credentials: dict, content: dict):
+def create_bluesky_post(
+    credentials: dict,
+    content: dict,
+    bucket: str = None,
+    timeout: float = TIMEOUT_SECONDS,
+    textos: list[str] = None,
+    progresso: dict = None,
+    ao_progredir=None
+):
     """
-    Publica um tweet na API do X usando as credenciais fornecidas.
-    Return format:
+    Publica a thread no Bluesky usando as credenciais fornecidas, em uma única chamada
+    com.atproto.repo.applyWrites (atômica: ou a thread inteira é criada, ou nada).
+    A sessão (accessJwt/refreshJwt) é reaproveitada entre posts e invocações:
+    login só acontece quando não há refreshJwt válido (ver bluesky_session_service).
+    'textos' evita reformatar a thread; 'progresso' (dict) guarda os registros montados,
+    para que uma nova tentativa reenvie as mesmas rkeys em vez de criar uma segunda thread.
+    'ao_progredir()' é chamado assim que os registros são montados (antes da escrita),
+    para persistir as rkeys/CIDs: se a escrita foi aplicada e só a resposta se perdeu,
+    a retomada encontra a thread no PDS e não escreve de novo.
+    Return format (último post da thread, mais a thread completa):
     {
         "uri": "string",
-        "cid": "string"
+        "cid": "string",
+        "thread": [{"uri": "string", "cid": "string"}, ...]
     }
     
     """
     try:
-        #session = get_bluesky_session(credentials["BLUESKY_HANDLE"], credentials["BLUESKY_APP_PASSWORD"])
-        now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-
-        formatted_posts = format_posts(content)
-
-        # Root post
-        post = {
-            "$type": "app.bsky.feed.post",
-            "text": formatted_posts['root_post'],
-            "createdAt": now,
-        }
-
-        res = requests.post(
-            "https://bsky.social/xrpc/com.atproto.repo.createRecord",
-            headers={"Authorization": "Bearer " + session["accessJwt"]},
-            json={
-                "repo": session["did"],
-                "collection": "app.bsky.feed.post",
-                "record": post,
+        textos = textos or textos_thread(content, "bluesky")
+        progresso = {} if progresso is None else progresso
+
+        did = obter_sessao(credentials, bucket, timeout=timeout)["did"]
+        if "posts" not in progresso:
+            progresso["posts"] = montar_thread(did, textos)
+            if ao_progredir:
+                ao_progredir()
+        elif registro_existe(progresso["posts"][0]["uri"], progresso["posts"][0]["cid"], timeout):
+            # applyWrites é atômico: se a raiz existe, a thread inteira foi criada
+            print(f"📓 Thread já publicada em {progresso['posts'][0]['uri']}, nada a reenviar.")
+            thread = [{"uri": post["uri"], "cid": post["cid"]} for post in progresso["posts"]]
+            return {**thread[-1], "thread": thread}
+        posts = progresso["posts"]
+
+        res = xrpc_post(
+            "com.atproto.repo.applyWrites",
+            {
+                "validate": True,
+                "writes": [
+                    {
+                        "$type": "com.atproto.repo.applyWrites#create",
+                        "collection": COLECAO_POST,
+                        "rkey": post["rkey"],
+                        "value": post["record"],
+                    }
+                    for post in posts
+                ],
             },
+            credentials,
+            bucket,
+            timeout,
         )
 
-        root_uri = res.json()["uri"]
-        root_cid = res.json()["cid"]
-        # Reply one
-        post = reply_payload(formatted_posts['reply_one'], root_uri, root_cid, root_uri, root_cid)
-        res = requests.post(
-            "https://bsky.social/xrpc/com.atproto.repo.createRecord",
-            headers={"Authorization": "Bearer " + session["accessJwt"]},
-            json={
-                "repo": session["did"],
-                "collection": "app.bsky.feed.post",
-                "record": post,
-            },
-        )
-        parent_uri = res.json()["uri"]
-        parent_cid = res.json()["cid"]
-        # Reply two
-        post = reply_payload(formatted_posts['reply_two'], root_uri, root_cid, parent_uri, parent_cid)
-        res = requests.post(
-            "https://bsky.social/xrpc/com.atproto.repo.createRecord",
-            headers={"Authorization": "Bearer " + session["accessJwt"]},
-            json={
-                "repo": session["did"],
-                "collection": "app.bsky.feed.post",
-                "record": post,
-            },
-        )
-        parent_uri = res.json()["uri"]
-        parent_cid = res.json()["cid"]
-        # Reply three
-        post = reply_payload(formatted_posts['reply_three'], root_uri, root_cid, parent_uri, parent_cid)
-        res = requests.post(
-            "https://bsky.social/xrpc/com.atproto.repo.createRecord",
-            headers={"Authorization": "Bearer " + session["accessJwt"]},
-            json={
-                "repo": session["did"],
-                "collection": "app.bsky.feed.post",
-                "record": post,
-            },
-        )
-        
-        res.raise_for_status()
-        return res.json()
+        # O PDS devolve o uri/cid de cada registro; divergência indica erro na codificação local
+        for post, resultado in zip(posts, res.get("results", [])):
+            if resultado.get("cid") and resultado["cid"] != post["cid"]:
+                logging.warning(f"⚠️ CID calculado ({post['cid']}) difere do PDS ({resultado['cid']}) em {post['uri']}.")
+
+        thread = [{"uri": post["uri"], "cid": post["cid"]} for post in posts]
+        return {**thread[-1], "thread": thread}
 
     except Exception as e:
         logging.error(f"❌ Falha ao postar o tweet. Erro da API: {e}")
         raise
 
 
-def create_x_post(credentials: dict, content: dict):
-    pass
\ No newline at end of file
+class _SessaoComTimeout(requests.Session):
+    """O tweepy não expõe timeout: a sessão aplica um padrão a todas as requisições."""
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(*args, **kwargs)
+
+
+def create_x_post(
+    credentials: dict,
+    content: dict,
+    timeout: float = TIMEOUT_SECONDS,
+    textos: list[str] = None,
+    progresso: dict = None,
+    ao_progredir=None
+):
+    """
+    Publica a thread no X (API v2, OAuth 1.0a de usuário), um tweet por vez, cada reply
+    apontando para o tweet anterior. O X não tem escrita em lote: se uma chamada falhar,
+    os ids já publicados ficam em 'progresso["ids"]' e uma nova tentativa com o mesmo
+    dict continua do ponto em que parou, sem duplicar o começo da thread.
+    'ao_progredir()' é chamado após cada tweet publicado, para persistir o progresso.
+    Return format: {"id": "string", "thread": [{"id": "string"}, ...]}
+    """
+    try:
+        textos = textos or textos_thread(content, "x")
+        progresso = {} if progresso is None else progresso
+        ids = progresso.setdefault("ids", [])
+
+        client = tweepy.Client(
+            consumer_key=credentials["X_API_KEY"],
+            consumer_secret=credentials["X_API_SECRET"],
+            access_token=credentials["X_ACCESS_TOKEN"],
+            access_token_secret=credentials["X_ACCESS_SECRET"],
+        )
+        with _SessaoComTimeout(timeout) as sessao:
+            client.session = instrumentar_sessao(sessao)
+            for texto in textos[len(ids):]:
+                res = client.create_tweet(text=texto, in_reply_to_tweet_id=ids[-1] if ids else None)
+                ids.append(res.data["id"])
+                if ao_progredir:
+                    ao_progredir()
+
+        thread = [{"id": tweet_id} for tweet_id in ids]
+        return {**thread[-1], "thread": thread}
+
+    except Exception as e:
+        logging.error(f"❌ Falha ao postar no X. Erro da API: {e}")
+        raise
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import re
+import time
+import random
+import asyncio
+from openai import APIConnectionError
+
+# Limites da concorrência adaptativa (requisições simultâneas à OpenAI)
+CONCORRENCIA_INICIAL = int(os.getenv("OPENAI_CONCURRENCY_START", "4"))
+CONCORRENCIA_MINIMA = int(os.getenv("OPENAI_CONCURRENCY_MIN", "1"))
+CONCORRENCIA_MAXIMA = int(os.getenv("OPENAI_CONCURRENCY_MAX", "32"))
+MAX_TENTATIVAS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "6"))
+
+# AIMD: +1 de concorrência a cada "janela" de sucessos; metade a cada 429
+FATOR_REDUCAO = 0.5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Erros transitórios do servidor: nova tentativa com backoff, sem mexer no limite
+STATUS_TRANSITORIOS = {500, 502, 503, 504}
+
+PADRAO_DURACAO = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def duracao_em_segundos(valor) -> float | None:
+    """
+    Converte os formatos de duração dos headers da OpenAI em segundos:
+    "20ms", "1s", "6m0s", "1h2m3.5s" (x-ratelimit-reset-*) ou "2" (retry-after).
+    """
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    try:
+        return float(valor)
+    except ValueError:
+        pass
+
+    partes = PADRAO_DURACAO.findall(valor)
+    if not partes:
+        return None
+    multiplicadores = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(numero) * multiplicadores[unidade] for numero, unidade in partes)
+
+
+def _inteiro(valor) -> int | None:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class ControleAIMD:
+    """
+    Limita quantas chamadas rodam ao mesmo tempo e ajusta esse limite em AIMD:
+    cada sucesso aumenta o limite em 1/limite (≈ +1 por rodada de requisições),
+    cada 429 reduz pela metade e pausa todas as chamadas pelo tempo indicado
+    em retry-after / x-ratelimit-reset-*. Quando os headers mostram que a cota
+    de requisições ou tokens zerou, pausa antes de tomar o 429.
+    """
+
+    def __init__(
+        self,
+        inicial: int = CONCORRENCIA_INICIAL,
+        minimo: int = CONCORRENCIA_MINIMA,
+        maximo: int = CONCORRENCIA_MAXIMA,
+        max_tentativas: int = MAX_TENTATIVAS,
+    ):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = float(min(max(inicial, self.minimo), self.maximo))
+        self.max_tentativas = max_tentativas
+        self.em_uso = 0
+        self.pausa_ate = 0.0
+        self.ultima_reducao = 0.0
+        self.estatisticas = {"sucessos": 0, "throttles": 0, "reducoes": 0, "pico": 0}
+        self._condicao = asyncio.Condition()
+
+    async def _adquirir(self):
+        while True:
+            espera = self.pausa_ate - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+                continue
+            async with self._condicao:
+                await self._condicao.wait_for(lambda: self.em_uso < int(self.limite))
+                if self.pausa_ate > time.monotonic():
+                    continue
+                self.em_uso += 1
+                self.estatisticas["pico"] = max(self.estatisticas["pico"], self.em_uso)
+                return
+
+    async def _liberar(self):
+        async with self._condicao:
+            self.em_uso -= 1
+            self._condicao.notify_all()
+
+    def _pausar(self, segundos: float):
+        self.pausa_ate = max(self.pausa_ate, time.monotonic() + segundos)
+
+    def registrar_sucesso(self, headers):
+        """Aumento aditivo; pausa preventiva se a cota da janela atual acabou."""
+        self.estatisticas["sucessos"] += 1
+        self.limite = min(self.maximo, self.limite + 1 / self.limite)
+
+        headers = headers or {}
+        for recurso in ("requests", "tokens"):
+            restante = _inteiro(headers.get(f"x-ratelimit-remaining-{recurso}"))
+            if restante is not None and restante <= 0:
+                reset = duracao_em_segundos(headers.get(f"x-ratelimit-reset-{recurso}"))
+                if reset:
+                    print(f"⏸️ Cota de {recurso} esgotada, pausando {reset:.2f}s.")
+                    self._pausar(reset)
+
+    def registrar_throttle(self, headers, tentativa: int):
+        """Redução multiplicativa (uma vez por pausa) e pausa pelo tempo indicado nos headers."""
+        self.estatisticas["throttles"] += 1
+        headers = headers or {}
+
+        agora = time.monotonic()
+        # 429s de requisições que já estavam em voo contam como o mesmo evento
+        if agora >= self.ultima_reducao:
+            self.limite = max(self.minimo, self.limite * FATOR_REDUCAO)
+            self.estatisticas["reducoes"] += 1
+
+        retry_after_ms = duracao_em_segundos(headers.get("retry-after-ms"))
+        espera = (retry_after_ms / 1000 if retry_after_ms else None) or duracao_em_segundos(headers.get("retry-after")) or max(
+            duracao_em_segundos(headers.get("x-ratelimit-reset-requests")) or 0,
+            duracao_em_segundos(headers.get("x-ratelimit-reset-tokens")) or 0,
+        )
+        if not espera:
+            espera = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (tentativa - 1))
+        # Jitter para as chamadas pausadas não voltarem todas no mesmo instante
+        espera *= random.uniform(1.0, 1.25)
+
+        self._pausar(espera)
+        self.ultima_reducao = self.pausa_ate
+        print(f"🐢 429 recebido: concorrência {self.limite:.1f}, pausa de {espera:.2f}s (tentativa {tentativa}).")
+
+    async def executar(self, chamada):
+        """
+        Executa 'chamada' (função sem argumentos que retorna uma coroutine) respeitando
+        o limite atual. Em 429, ajusta o limite e tenta de novo até max_tentativas;
+        em 5xx, erro de conexão ou timeout (APIConnectionError/APITimeoutError), só espera
+        o backoff desta chamada. Use o client com max_retries=0,
+        para os 429 chegarem aqui em vez de serem repetidos pelo SDK.
+        A resposta precisa expor 'headers' (ex: client.responses.with_raw_response).
+        """
+        for tentativa in range(1, self.max_tentativas + 1):
+            await self._adquirir()
+            espera_transitoria = 0
+            try:
+                resposta = await chamada()
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                # APITimeoutError é subclasse de APIConnectionError; nenhuma das duas tem status
+                conexao = isinstance(e, APIConnectionError)
+                if not (conexao or status in STATUS_TRANSITORIOS | {429}) or tentativa == self.max_tentativas:
+                    raise
+                if status == 429:
+                    self.registrar_throttle(getattr(getattr(e, "response", None), "headers", None), tentativa)
+                else:
+                    espera_transitoria = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (tentativa - 1))
+                    motivo = type(e).__name__ if conexao else f"Erro {status}"
+                    print(f"⚠️ {motivo} na API, nova tentativa em {espera_transitoria:.0f}s.")
+                continue
+            finally:
+                await self._liberar()
+                if espera_transitoria:
+                    await asyncio.sleep(espera_transitoria * random.uniform(1.0, 1.25))
+
+            self.registrar_sucesso(getattr(resposta, "headers", None))
+            return resposta
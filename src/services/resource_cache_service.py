@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import threading
+import functools
+from concurrent.futures import Future
+import boto3
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics_service import instrumentar_cliente, instrumentar_sessao
+
+# Tempo que um segredo fica em memória antes de ser buscado de novo no Secrets Manager
+SECRET_TTL_SECONDS = int(os.getenv("RESOURCE_SECRET_TTL_SECONDS", "300"))
+HTTP_POOL_SIZE = int(os.getenv("RESOURCE_HTTP_POOL_SIZE", "10"))
+
+# Recursos guardados no escopo do módulo: sobrevivem entre invocações da mesma
+# instância (warm start) e são compartilhados por todos os services do processo.
+_recursos = {}
+# Recursos sendo criados agora: (tipo, chave) -> Future com o resultado de fabrica()
+_construindo = {}
+_contadores = {}
+_lock = threading.Lock()
+
+
+def _contar(tipo: str, evento: str):
+    contador = _contadores.setdefault(tipo, {"hits": 0, "misses": 0})
+    contador[evento] += 1
+
+
+def _valido(entrada, ttl_seconds: int = None) -> bool:
+    return bool(entrada) and (ttl_seconds is None or time.monotonic() - entrada[1] < ttl_seconds)
+
+
+def _obter(tipo: str, chave, fabrica, ttl_seconds: int = None):
+    """
+    Retorna o recurso (tipo, chave) do cache; cria com fabrica() no primeiro uso
+    ou quando o TTL venceu. Conta hits e misses por tipo.
+    fabrica() roda fora do lock global (pode ir à rede, ex: Secrets Manager), então
+    chaves diferentes não esperam umas pelas outras; threads que pedem a mesma chave
+    durante a criação esperam pelo Future de quem está criando, sem criar outra cópia.
+    """
+    with _lock:
+        entrada = _recursos.get((tipo, chave))
+        if _valido(entrada, ttl_seconds):
+            _contar(tipo, "hits")
+            return entrada[0]
+        futuro = _construindo.get((tipo, chave))
+        criar = futuro is None
+        if criar:
+            futuro = _construindo[(tipo, chave)] = Future()
+        _contar(tipo, "misses" if criar else "hits")
+
+    if not criar:
+        # Outra thread está criando: o erro dela (se houver) também vale para esta
+        return futuro.result()
+
+    try:
+        recurso = fabrica()
+    except Exception as e:
+        with _lock:
+            _construindo.pop((tipo, chave), None)
+        futuro.set_exception(e)
+        raise
+
+    with _lock:
+        _recursos[(tipo, chave)] = (recurso, time.monotonic())
+        _construindo.pop((tipo, chave), None)
+    futuro.set_result(recurso)
+    return recurso
+
+
+def cliente_boto3(servico: str):
+    """Client boto3 compartilhado (os clients são thread-safe), com latência e bytes medidos."""
+    return _obter("boto3", servico, lambda: instrumentar_cliente(boto3.client(servico)))
+
+
+def obter_segredo(secret_id: str, ttl_seconds: int = SECRET_TTL_SECONDS) -> dict:
+    """
+    SecretString (JSON) do Secrets Manager, mantido em memória por ttl_seconds.
+    Depois do TTL o segredo é buscado de novo, então rotações são percebidas sem redeploy.
+    """
+    def buscar():
+        response = cliente_boto3("secretsmanager").get_secret_value(SecretId=secret_id)
+        return json.loads(response["SecretString"])
+
+    return _obter("segredo", secret_id, buscar, ttl_seconds)
+
+
+def invalidar_segredo(secret_id: str):
+    """Descarta o segredo em memória (ex: após um 401), forçando nova busca no próximo uso."""
+    with _lock:
+        _recursos.pop(("segredo", secret_id), None)
+
+
+def cliente_openai(api_key: str):
+    """Client da OpenAI por chave de API, reaproveitando o pool de conexões do SDK."""
+    from openai import OpenAI
+    return _obter("openai", api_key, lambda: OpenAI(api_key=api_key))
+
+
+def sessao_http(nome: str = "padrao", fabrica=None) -> requests.Session:
+    """
+    Sessão HTTP com pool de conexões, compartilhada por nome (ex: "camara", "bluesky").
+    'fabrica' permite customizar headers/pool na criação; por padrão usa HTTP_POOL_SIZE.
+    A latência de cada resposta é registrada por host (metrics_service).
+    """
+    def criar():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    return _obter("http", nome, lambda: instrumentar_sessao((fabrica or criar)()))
+
+
+def estatisticas() -> dict:
+    """Hits/misses acumulados por tipo de recurso desde o cold start."""
+    with _lock:
+        return {tipo: dict(contador) for tipo, contador in _contadores.items()}
+
+
+def relatar_cache(handler):
+    """
+    Decorator para lambda_handler: ao fim de cada invocação, registra os hits/misses
+    do cache de recursos, mostrando quanto trabalho de cold start foi evitado.
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            resumo = ", ".join(
+                f"{tipo} {c['hits']} hit(s)/{c['misses']} miss(es)" for tipo, c in estatisticas().items()
+            )
+            print(f"🧊 Cache de recursos: {resumo or 'sem uso'}")
+
+    return wrapper
@@ -1,20 +1,54 @@
-import boto3
+import os
 import json
+import time
+import random
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
 from zoneinfo import ZoneInfo
-from slugify import slugify
+from services.slug_service import nome_agendamento
+from services.pending_posts_service import listar_pendentes
 from datetime import datetime, timedelta, timezone, date
+from services.resource_cache_service import cliente_boto3
+from services.metrics_service import etapa
 
 # Configuração de logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client("s3")
-scheduler_client = boto3.client("scheduler")
+s3_client = cliente_boto3("s3")
+scheduler_client = cliente_boto3("scheduler")
 
-def list_pending_tweets_for_date(bucket_name: str, start_utc: datetime, end_utc: datetime) -> list[str]:
+# Chamadas simultâneas ao EventBridge Scheduler e retentativas em throttling
+SCHEDULER_MAX_WORKERS = int(os.getenv("SCHEDULER_MAX_WORKERS", "8"))
+SCHEDULER_MAX_ATTEMPTS = int(os.getenv("SCHEDULER_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 10.0
+ERROS_THROTTLING = {"ThrottlingException", "TooManyRequestsException", "RequestLimitExceeded"}
+
+def list_pending_tweets_for_date(bucket_name: str, target_date: date) -> list[str]:
     """
-    Lista os arquivos 'tweet.txt' em um bucket S3 que foram criados em uma data específica (UTC).
+    Lista os post_data.json gerados em uma data (horário de Brasília) pelo índice
+    state/pending/<data>/, sem percorrer o histórico de propositions/.
+
+    Args:
+        bucket_name (str): O nome do bucket S3.
+        target_date (date): A data de geração dos posts.
+
+    Returns:
+        Uma lista de S3 keys para os tweets pendentes.
+    """
+    logger.info(f"Buscando tweets pendentes de {target_date.isoformat()} no índice do dia")
+    pending_tweets = listar_pendentes(bucket_name, target_date)
+    logger.info(f"Encontrados {len(pending_tweets)} posts para agendar.")
+    return pending_tweets
+
+
+def scan_pending_tweets_for_date(bucket_name: str, start_utc: datetime, end_utc: datetime) -> list[str]:
+    """
+    Lista os arquivos 'post_data.json' em um bucket S3 que foram criados em uma data específica (UTC).
+    Percorre todo o prefixo propositions/: usar só para posts gerados antes do índice de pendentes.
 
     Args:
         bucket_name (str): O nome do bucket S3.
@@ -38,40 +72,65 @@ def list_pending_tweets_for_date(bucket_name: str, start_utc: datetime, end_utc:
     return pending_tweets
 
 
+def _upsert_schedule(schedule_name: str, params: dict) -> tuple[str, int]:
+    """
+    Cria o agendamento; se já existir, atualiza com os mesmos parâmetros (upsert idempotente).
+    Throttling é repetido com backoff exponencial e full jitter.
+    Retorna (status, tentativas), com status "created" ou "updated".
+    """
+    operacao, status = scheduler_client.create_schedule, "created"
+    for tentativa in range(1, SCHEDULER_MAX_ATTEMPTS + 1):
+        try:
+            operacao(Name=schedule_name, **params)
+            return status, tentativa
+        except scheduler_client.exceptions.ConflictException:
+            if status == "updated":
+                raise
+            # Já existe: troca para update_schedule e tenta de novo imediatamente
+            operacao, status = scheduler_client.update_schedule, "updated"
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ERROS_THROTTLING or tentativa == SCHEDULER_MAX_ATTEMPTS:
+                raise
+            espera = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** tentativa))
+            logger.warning(f"Throttling ao agendar '{schedule_name}', nova tentativa em {espera:.2f}s.")
+            time.sleep(espera)
+    raise RuntimeError(f"Agendamento '{schedule_name}' não concluído após {SCHEDULER_MAX_ATTEMPTS} tentativas.")
+
+
+@etapa("criar_agendamentos")
 def create_schedules(
     tweet_keys: list[str],
     start_time: datetime, # Espera-se um datetime com fuso horário (aware)
     interval_minutes: int,
     poster_lambda_arn: str,
-    scheduler_role_arn: str
+    scheduler_role_arn: str,
+    max_workers: int = SCHEDULER_MAX_WORKERS
 ) -> dict:
     """
-    Cria agendamentos one-time no EventBridge Scheduler para uma lista de tweets.
+    Cria (ou atualiza, se já existirem) agendamentos one-time no EventBridge Scheduler
+    para uma lista de tweets, com até 'max_workers' chamadas em paralelo.
     Garante que todos os horários são convertidos para UTC antes de agendar.
+    Os horários seguem a ordem de 'tweet_keys', independente da ordem de conclusão.
+    Retorna os totais, as keys agendadas e um relatório por key
+    ({"status", "schedule_name", "horario_utc", "tentativas", "erro"}).
     """
     # Validação importante: garante que a função não receba datetimes "ingênuos"
     if start_time.tzinfo is None:
         raise ValueError("Erro: O start_time deve ter um fuso horário definido (timezone-aware).")
 
     logger.info(f"Criando {len(tweet_keys)} agendamentos, começando em {start_time.isoformat()} com intervalo de {interval_minutes} min.")
-    
-    schedules_created = 0
-    current_schedule_time = start_time
 
-    for key in tweet_keys:
-        sanitized_key = slugify(key) # Supondo que você tenha a função slugify
-        schedule_name = f"post-{sanitized_key}"
+    def agendar(indice_key):
+        indice, key = indice_key
+        schedule_name = nome_agendamento(key)
 
-        # 1. Garante que o horário atual do loop esteja em UTC
-        utc_schedule_time = current_schedule_time.astimezone(timezone.utc)
-        
-        # 2. Formata a string a partir do objeto UTC garantido
+        # Horário calculado pela posição da key, em UTC
+        utc_schedule_time = (start_time + timedelta(minutes=interval_minutes * indice)).astimezone(timezone.utc)
         schedule_time_str = utc_schedule_time.strftime('%Y-%m-%dT%H:%M:%S')
-        # ---------------------
+        relatorio = {"schedule_name": schedule_name, "horario_utc": schedule_time_str}
 
         try:
-            scheduler_client.create_schedule(
-                Name=schedule_name,
+            status, tentativas = _upsert_schedule(schedule_name, dict(
                 GroupName='default',
                 ScheduleExpression=f"at({schedule_time_str})",
                 Target={
@@ -81,14 +140,22 @@ def create_schedules(
                 },
                 FlexibleTimeWindow={'Mode': 'OFF'},
                 ActionAfterCompletion='DELETE'
-            )
-            logger.info(f"Agendamento '{schedule_name}' criado para as {schedule_time_str} UTC.")
-            schedules_created += 1
-        except scheduler_client.exceptions.ConflictException:
-            logger.warning(f"Agendamento '{schedule_name}' já existe. Ignorando.")
+            ))
+            acao = "criado" if status == "created" else "atualizado"
+            logger.info(f"Agendamento '{schedule_name}' {acao} para as {schedule_time_str} UTC.")
+            return key, {**relatorio, "status": status, "tentativas": tentativas}
         except Exception as e:
             logger.error(f"Falha ao criar agendamento para a chave '{key}'. Erro: {e}")
-            
-        current_schedule_time += timedelta(minutes=interval_minutes)
-        
-    return {"schedules_created": schedules_created}
\ No newline at end of file
+            return key, {**relatorio, "status": "error", "erro": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tweet_keys) or 1))) as executor:
+        resultados = dict(executor.map(agendar, enumerate(tweet_keys)))
+
+    contagem = Counter(r["status"] for r in resultados.values())
+    return {
+        "schedules_created": contagem["created"],
+        "schedules_updated": contagem["updated"],
+        "schedules_failed": contagem["error"],
+        "agendados": [key for key in tweet_keys if resultados[key]["status"] != "error"],
+        "resultados": resultados,
+    }
@@ -0,0 +1,50 @@
+import re
+from functools import lru_cache
+from slugify import slugify
+
+# Forma canônica dos identificadores da Câmara: "PL 5111/2025", "PEC 1/2025", "PLP 12/2025"...
+# Só dígitos ASCII: \d aceitaria dígitos unicode (ex: "٥"), que o slugify() transliteraria
+PADRAO_CANONICO = re.compile(r"^([A-Za-z]+) ([0-9]+)/([0-9]+)$")
+
+
+@lru_cache(maxsize=4096)
+def slug(texto: str) -> str:
+    """
+    Slugify com cache (LRU) para qualquer texto.
+    Usado para nomes de agendamentos e demais chaves fora da forma canônica.
+    """
+    return slugify(texto)
+
+
+def slug_proposicao(identificador: str) -> str:
+    """
+    Slug do identificador de uma proposição (ex: "PL 5111/2025" -> "pl-5111-2025").
+    A forma canônica 'TIPO NNNN/AAAA' é resolvida sem passar pela normalização unicode;
+    qualquer outro texto cai no slug() com cache. O resultado é sempre igual ao slugify().
+    """
+    if isinstance(identificador, str):
+        match = PADRAO_CANONICO.match(identificador)
+        if match:
+            tipo, numero, ano = match.groups()
+            return f"{tipo.lower()}-{numero}-{ano}"
+    return slug(identificador)
+
+
+def slug_proposicoes(identificadores) -> list[str]:
+    """
+    Versão vetorizada de slug_proposicao, para listas ou Series do pandas.
+    Se receber uma Series, usa as operações de string do pandas na forma canônica.
+    """
+    if hasattr(identificadores, "str"):
+        partes = identificadores.str.extract(PADRAO_CANONICO)
+        canonicos = partes.notna().all(axis=1)
+        resultado = partes[0].str.lower() + "-" + partes[1] + "-" + partes[2]
+        resultado[~canonicos] = [slug(valor) for valor in identificadores[~canonicos]]
+        return resultado.tolist()
+
+    return [slug_proposicao(valor) for valor in identificadores]
+
+
+def nome_agendamento(tweet_key: str) -> str:
+    """Nome do agendamento no EventBridge Scheduler para a key de um post_data.json."""
+    return f"post-{slug(tweet_key)}"
@@ -0,0 +1,135 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+
+# Orçamento de tokens para o texto completo enviado ao modelo
+TOKEN_BUDGET = int(os.getenv("OPENAI_INPUT_TOKEN_BUDGET", "6000"))
+# Contagem com o tiktoken só quando pedida: ele não está no requirements.txt (a Lambda usa a
+# estimativa local) e baixa a tabela de merges na primeira execução
+USAR_TIKTOKEN = os.getenv("TOKEN_COUNT_TIKTOKEN", "false").lower() == "true"
+# Fatia do orçamento reservada para a justificativa quando o texto precisa ser cortado
+FRACAO_JUSTIFICATIVA = 0.35
+
+MARCADOR_CORTE = "[...]"
+
+# Linhas de rodapé/assinatura que os PDFs da Câmara repetem em toda página
+PADROES_BOILERPLATE = [
+    re.compile(r"^\*CD\d+\*"),                          # código de autenticação
+    re.compile(r"Assinado eletronicamente", re.I),
+    re.compile(r"Para verificar a assinatura", re.I),
+    re.compile(r"^Praça dos Três Poderes", re.I),
+    re.compile(r"^Anexo [IVX]+,", re.I),
+    re.compile(r"^CEP \d{5}-?\d{3}", re.I),
+    re.compile(r"^\S+@camara\.leg\.br$", re.I),
+    re.compile(r"^Gabinete d[oa] Deputad[oa]", re.I),
+    re.compile(r"^CÂMARA DOS DEPUTADOS$", re.I),
+    re.compile(r"^\d{1,3}$"),                           # número de página
+]
+PADRAO_JUSTIFICATIVA = re.compile(r"^\s*JUSTIFICA(ÇÃO|TIVA)\s*$", re.I | re.M)
+PADRAO_DISPOSITIVO = re.compile(r"^(Art\.|§|[IVXLC]+ [–-]|[a-z]\))")
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """
+    Encoder do tiktoken (o200k_base, usado pelo gpt-4o-mini) se TOKEN_COUNT_TIKTOKEN=true
+    e ele estiver instalado; senão None, e a contagem usa a estimativa local.
+    """
+    if not USAR_TIKTOKEN:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def contar_tokens(texto: str) -> int:
+    """Conta os tokens do texto localmente (estimativa por palavras/pontuação, ou tiktoken se ativado)."""
+    encoder = _encoder()
+    if encoder:
+        return len(encoder.encode(texto))
+    # Estimativa: palavras em português ficam em ~1,3 token; pontuação conta 1
+    palavras = re.findall(r"\w+", texto)
+    pontuacao = re.findall(r"[^\w\s]", texto)
+    return int(sum(max(1, len(p) / 4.5) for p in palavras) + len(pontuacao))
+
+
+def remover_boilerplate(texto: str) -> str:
+    """
+    Remove cabeçalhos, rodapés e assinaturas dos PDFs: linhas conhecidas de rodapé,
+    linhas curtas repetidas em várias páginas e pontilhados de citação de artigos.
+    """
+    linhas = [re.sub(r"[ \t]+", " ", linha).strip() for linha in texto.splitlines()]
+    repeticoes = Counter(linha for linha in linhas if linha)
+
+    limpas = []
+    for linha in linhas:
+        if not linha:
+            continue
+        if any(padrao.search(linha) for padrao in PADROES_BOILERPLATE):
+            continue
+        if repeticoes[linha] > 1 and len(linha) < 120 and not PADRAO_DISPOSITIVO.match(linha):
+            continue
+        linha = re.sub(r"\.{4,}", "...", linha)
+        if linha.strip(". "):
+            limpas.append(linha)
+
+    return "\n".join(limpas)
+
+
+def _cortar(texto: str, orcamento: int) -> str:
+    """
+    Mantém as linhas do início até o orçamento, priorizando os dispositivos
+    (artigos, parágrafos, incisos) quando não cabe tudo.
+    """
+    if contar_tokens(texto) <= orcamento:
+        return texto
+
+    linhas = texto.splitlines()
+    custos = [contar_tokens(linha) + 1 for linha in linhas]
+    mantidas = set()
+    usados = 0
+
+    # 1ª passada: dispositivos normativos; 2ª passada: demais linhas, na ordem do texto
+    for prioritarias in (True, False):
+        for i, linha in enumerate(linhas):
+            if i in mantidas or bool(PADRAO_DISPOSITIVO.match(linha)) != prioritarias:
+                continue
+            if usados + custos[i] > orcamento:
+                continue
+            mantidas.add(i)
+            usados += custos[i]
+
+    resultado = []
+    for i, linha in enumerate(linhas):
+        if i in mantidas:
+            resultado.append(linha)
+        elif not resultado or resultado[-1] != MARCADOR_CORTE:
+            resultado.append(MARCADOR_CORTE)
+    return "\n".join(resultado)
+
+
+def aplicar_orcamento(texto: str, orcamento: int = TOKEN_BUDGET) -> str:
+    """
+    Prepara o texto completo para o prompt: remove o boilerplate dos PDFs e, se ainda
+    passar do orçamento, corta mantendo os artigos e a justificativa.
+    Registra a contagem de tokens antes e depois.
+    """
+    tokens_antes = contar_tokens(texto)
+    limpo = remover_boilerplate(texto)
+
+    match = PADRAO_JUSTIFICATIVA.search(limpo)
+    if contar_tokens(limpo) <= orcamento:
+        resultado = limpo
+    elif match:
+        orcamento_justificativa = int(orcamento * FRACAO_JUSTIFICATIVA)
+        dispositivos = _cortar(limpo[:match.start()], orcamento - orcamento_justificativa)
+        justificativa = _cortar(limpo[match.start():], orcamento_justificativa)
+        resultado = f"{dispositivos}\n{justificativa}"
+    else:
+        resultado = _cortar(limpo, orcamento)
+
+    print(f"🔢 Tokens do texto completo: {tokens_antes} -> {contar_tokens(resultado)} (orçamento {orcamento})")
+    return resultado